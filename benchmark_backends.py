@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Cross-Backend Benchmark
+
+Runs the same labelled email corpus through every available form of the
+priority classifier and compares speed and outputs:
+
+    pickle   priority_classifier.pkl (joblib, sklearn predict_proba)
+    onnx     assets/priority_classifier.onnx (onnxruntime)
+    ort      assets/models/priority_classifier.ort (onnxruntime, ORT format)
+    tflite   assets/models/priority_classifier.tflite (tf.lite.Interpreter)
+    numpy    assets/models/priority_classifier.tfidf (tfidf_artifact.py)
+
+Keep the ONNX model around with `convert_model.py --keep-intermediates` and
+build the NumPy artifact with `convert_model.py --target tfidf` and the ORT
+model with `convert_model.py --target ort`.
+
+The corpus is streamed in chunks (see email_corpus.py). For every backend the
+report records load time, artifact size, rows/sec, per-chunk latency
+percentiles, accuracy against the corpus labels and the max absolute
+difference from the pickle's predict_proba. Backends whose artifact or
+runtime is missing are reported as skipped.
+
+Usage:
+    python3 benchmark_backends.py --corpus emails.jsonl [--chunk-size 256]
+        [--backends pickle,onnx,ort,tflite,numpy] [--tolerance 1e-4]
+        [--baseline bench.json] [--max-regression 0.2]
+        [--save-baseline bench.json] [--output report.json]
+
+Exit Codes:
+    0 = All backends within tolerance and no regression against baseline
+    1 = Parity failure, regression, or bad input
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+
+
+BACKENDS = ['pickle', 'onnx', 'ort', 'tflite', 'numpy']
+
+DEFAULT_ARTIFACTS = {
+    'pickle': 'priority_classifier.pkl',
+    'onnx': 'assets/priority_classifier.onnx',
+    'ort': 'assets/models/priority_classifier.ort',
+    'tflite': 'assets/models/priority_classifier.tflite',
+    'numpy': 'assets/models/priority_classifier.tfidf',
+}
+
+# Metric name → True when larger is better
+REGRESSION_METRICS = {
+    'rows_per_sec': True,
+    'p95_ms': False,
+    'load_s': False,
+    'artifact_bytes': False,
+}
+
+
+class BackendSkipped(Exception):
+    """Raised when a backend's artifact or runtime is unavailable."""
+
+
+def _dense_features(pipeline, texts, width):
+    """Featurize texts with the pickled vectorizer for float-input models."""
+    import numpy as np
+
+    vectorizer = pipeline.steps[0][1]
+    n_terms = len(vectorizer.vocabulary_)
+    if n_terms != width:
+        raise BackendSkipped(
+            f"model input width {width} does not match vectorizer vocabulary ({n_terms})"
+        )
+    return vectorizer.transform(texts).toarray().astype(np.float32)
+
+
+def load_backend(name, artifact, pipeline):
+    """
+    Load one backend.
+    Returns score(texts) -> ndarray; raises BackendSkipped if unavailable.
+    """
+    if not Path(artifact).exists():
+        raise BackendSkipped(f"artifact not found: {artifact}")
+
+    if name == 'pickle':
+        import joblib
+        model = joblib.load(artifact)
+        return model.predict_proba
+
+    if name == 'numpy':
+        from tfidf_artifact import TfidfArtifactScorer
+        scorer = TfidfArtifactScorer(artifact)
+        return scorer.predict_proba
+
+    # onnxruntime loads .onnx and .ort files alike
+    if name in ('onnx', 'ort'):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise BackendSkipped("onnxruntime not installed")
+        import numpy as np
+
+        session = ort.InferenceSession(artifact, providers=['CPUExecutionProvider'])
+        inp = session.get_inputs()[0]
+        outputs = [o.name for o in session.get_outputs()]
+        prob_name = next((o for o in outputs if 'prob' in o), outputs[-1])
+        string_input = 'string' in inp.type
+        # The graph's own lowercasing is one character to one character;
+        # str.lower() is what the vectorizer applies
+        lowercase = getattr(pipeline.steps[0][1], 'lowercase', False)
+
+        def score(texts):
+            if string_input:
+                if lowercase:
+                    texts = [text.lower() for text in texts]
+                feed = np.array(texts, dtype=object).reshape(-1, 1)
+            else:
+                feed = _dense_features(pipeline, texts, inp.shape[1])
+            result = session.run([prob_name], {inp.name: feed})[0]
+            # ZipMap output is a list of {class: prob} dicts
+            if isinstance(result, list):
+                result = np.array([[row[k] for k in sorted(row)] for row in result])
+            return np.asarray(result)
+
+        return score
+
+    if name == 'tflite':
+        try:
+            import tensorflow as tf
+        except ImportError:
+            raise BackendSkipped("tensorflow not installed")
+
+        interpreter = tf.lite.Interpreter(model_path=str(artifact))
+        input_details = interpreter.get_input_details()
+        output_details = interpreter.get_output_details()
+        if len(input_details[0]['shape']) != 2:
+            raise BackendSkipped("not a dense [batch, features] model")
+        width = int(input_details[0]['shape'][1])
+
+        allocated = []
+
+        def score(texts):
+            features = _dense_features(pipeline, texts, width)
+            # Re-allocate only when the batch shape changes
+            if allocated != list(features.shape):
+                interpreter.resize_tensor_input(input_details[0]['index'], list(features.shape))
+                interpreter.allocate_tensors()
+                allocated[:] = features.shape
+            interpreter.set_tensor(input_details[0]['index'], features)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_details[0]['index']).copy()
+
+        return score
+
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def _drop_stats(entry):
+    """Remove partial measurements from a backend that stopped mid-run."""
+    for key in ('_timings', 'rows', 'correct', 'labelled', 'max_abs_diff'):
+        entry.pop(key, None)
+
+
+def run_suite(corpus, backends, artifacts, chunk_size, tolerance):
+    """
+    Stream the corpus through every backend.
+    Returns a dict of per-backend results.
+    """
+    import joblib
+    import numpy as np
+    from email_corpus import iter_batches
+
+    pipeline = joblib.load(artifacts['pickle'])
+    classes = [str(c) for c in pipeline.classes_]
+
+    results = {}
+    scorers = {}
+    for name in backends:
+        artifact = artifacts[name]
+        entry = {'status': 'ok', 'artifact': artifact}
+        start = time.perf_counter()
+        try:
+            scorers[name] = load_backend(name, artifact, pipeline)
+        except BackendSkipped as e:
+            entry.update(status='skipped', reason=str(e))
+            print(f"  - {name}: skipped ({e})", file=sys.stderr)
+        except Exception as e:
+            entry.update(status='error', reason=str(e))
+            print(f"  ✗ {name}: load failed ({e})", file=sys.stderr)
+        else:
+            entry['load_s'] = round(time.perf_counter() - start, 4)
+            entry['artifact_bytes'] = Path(artifact).stat().st_size
+            entry.update(_timings=[], rows=0, correct=0, labelled=0, max_abs_diff=0.0)
+        results[name] = entry
+
+    for _, texts, labels in iter_batches(corpus, chunk_size):
+        reference = pipeline.predict_proba(texts)
+        labelled = [i for i, label in enumerate(labels) if label is not None]
+        truth = np.array([str(labels[i]) for i in labelled])
+
+        for name, score in list(scorers.items()):
+            entry = results[name]
+            try:
+                start = time.perf_counter()
+                proba = np.asarray(score(texts))
+                entry['_timings'].append(time.perf_counter() - start)
+            except BackendSkipped as e:
+                _drop_stats(entry)
+                entry.update(status='skipped', reason=str(e))
+                del scorers[name]
+                continue
+            except Exception as e:
+                _drop_stats(entry)
+                entry.update(status='error', reason=str(e))
+                del scorers[name]
+                continue
+
+            entry['rows'] += len(texts)
+            if proba.shape == reference.shape:
+                diff = float(np.abs(proba - reference).max()) if len(texts) else 0.0
+                entry['max_abs_diff'] = max(entry['max_abs_diff'], diff)
+                if labelled:
+                    predicted = np.array(classes)[proba[labelled].argmax(axis=1)]
+                    entry['correct'] += int((predicted == truth).sum())
+                    entry['labelled'] += len(labelled)
+            else:
+                entry['max_abs_diff'] = None
+
+    for name, entry in results.items():
+        timings = entry.pop('_timings', None)
+        if entry['status'] != 'ok' or timings is None:
+            continue
+        total = float(sum(timings))
+        p50, p95, p99 = (np.percentile(timings, [50, 95, 99]) * 1000.0) if timings else (0, 0, 0)
+        entry.update(
+            chunks=len(timings),
+            total_s=round(total, 4),
+            rows_per_sec=round(entry['rows'] / total, 1) if total > 0 else None,
+            p50_ms=round(float(p50), 3),
+            p95_ms=round(float(p95), 3),
+            p99_ms=round(float(p99), 3),
+        )
+        labelled = entry.pop('labelled')
+        correct = entry.pop('correct')
+        entry['accuracy'] = round(correct / labelled, 4) if labelled else None
+        if entry['max_abs_diff'] is None:
+            entry['parity'] = 'n/a (output shape differs from predict_proba)'
+        else:
+            entry['parity'] = 'ok' if entry['max_abs_diff'] <= tolerance else 'FAIL'
+
+    return results
+
+
+def compare_baseline(results, baseline, max_regression):
+    """
+    Compare results against a stored baseline.
+    Returns a list of human-readable regression messages.
+    """
+    regressions = []
+    for name, entry in results.items():
+        base = baseline.get('backends', {}).get(name)
+        if entry.get('status') != 'ok' or not base or base.get('status') != 'ok':
+            continue
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            old, new = base.get(metric), entry.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -max_regression) or \
+                    (not higher_is_better and change > max_regression):
+                regressions.append(
+                    f"{name}.{metric}: {old} → {new} ({change:+.1%}, limit ±{max_regression:.0%})"
+                )
+    return regressions
+
+
+def main():
+    """Run the cross-backend benchmark."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark classifier backends')
+    parser.add_argument('--corpus', required=True, help='Labelled email corpus (JSONL)')
+    parser.add_argument(
+        '--backends',
+        default=','.join(BACKENDS),
+        help=f'Comma-separated backends to run (default: {",".join(BACKENDS)})',
+    )
+    for name in BACKENDS:
+        parser.add_argument(
+            f'--{name}-artifact',
+            default=DEFAULT_ARTIFACTS[name],
+            help=f'Artifact for the {name} backend (default: {DEFAULT_ARTIFACTS[name]})',
+        )
+    parser.add_argument('--chunk-size', type=int, default=256, help='Rows per chunk (default: 256)')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=1e-4,
+        help='Max abs difference from predict_proba (default: 1e-4)',
+    )
+    parser.add_argument('--baseline', help='Baseline report to compare against')
+    parser.add_argument(
+        '--max-regression',
+        type=float,
+        default=0.2,
+        help='Allowed relative regression vs baseline (default: 0.2 = 20%%)',
+    )
+    parser.add_argument('--save-baseline', help='Write this run as the new baseline')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    unknown = [b for b in backends if b not in BACKENDS]
+    if unknown:
+        print(f"✗ Unknown backend(s): {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    if not Path(args.corpus).exists():
+        print(f"✗ Corpus not found: {args.corpus}", file=sys.stderr)
+        return 1
+
+    artifacts = {name: getattr(args, f'{name}_artifact') for name in BACKENDS}
+    if not Path(artifacts['pickle']).exists():
+        print(f"✗ Reference pickle not found: {artifacts['pickle']}", file=sys.stderr)
+        return 1
+
+    print(f"Benchmarking {', '.join(backends)} on {args.corpus} ...", file=sys.stderr)
+    results = run_suite(args.corpus, backends, artifacts, max(args.chunk_size, 1), args.tolerance)
+
+    report = {
+        'corpus': args.corpus,
+        'chunk_size': args.chunk_size,
+        'tolerance': args.tolerance,
+        'backends': results,
+    }
+
+    failures = [
+        f"{name}: max_abs_diff {entry['max_abs_diff']} > {args.tolerance}"
+        for name, entry in results.items() if entry.get('parity') == 'FAIL'
+    ]
+    failures.extend(
+        f"{name}: {entry['reason']}"
+        for name, entry in results.items() if entry['status'] == 'error'
+    )
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare_baseline(results, baseline, args.max_regression)
+        report['regressions'] = regressions
+        failures.extend(regressions)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    else:
+        print(text)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(text + '\n')
+        print(f"✓ Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    for name, entry in results.items():
+        if entry['status'] == 'ok':
+            print(f"  ✓ {name:<7} {entry['rows_per_sec']} rows/s  p95={entry['p95_ms']}ms  "
+                  f"load={entry['load_s']}s  parity={entry['parity']}", file=sys.stderr)
+
+    if failures:
+        for failure in failures:
+            print(f"  ✗ {failure}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
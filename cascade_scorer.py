@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Cascade Scorer
+
+PriorityClassifier.predictLabel cuts the rule score at fixed 70 (High) and
+40 (Medium), and every email takes the same path however clear-cut its
+score is. This tool:
+
+  --calibrate   fits the High/Medium cutoffs on a labelled corpus (label as
+                in email_corpus.py: 0 Low, 1 Medium, 2 High, or the names),
+                then an ambiguous band of rule scores [low, high]: the
+                narrowest band whose emails, sent to priority_classifier.pkl
+                instead, bring accuracy within --max-accuracy-loss of always
+                running the model (or the most accurate band that escalates
+                at most --max-escalation of emails)
+  --input       scores emails with the calibration: the rule engine
+                (rule_scorer.py) settles every score outside the band, and
+                emails inside it are batched through the pickle
+  --report      compares rules (70/40 and calibrated), the model alone and
+                the cascade on a labelled corpus: accuracy, macro-F1, the
+                share of emails escalated and end-to-end emails/s
+
+Both fits are exhaustive searches over prefix sums of a 101-bucket score
+histogram, so calibrating costs one rule pass and one model pass over the
+corpus. With --holdout, fitting uses the rest and the report is on the
+held-out emails (split by a hash of the id, so it is stable).
+
+The model stage uses fast_analyzer.py for the vectorizer when the pickle
+is a plain TF-IDF pipeline, and predict_proba otherwise.
+
+Usage:
+    python3 cascade_scorer.py --calibrate --corpus labelled.jsonl
+                              [--pkl priority_classifier.pkl] [--holdout 0.2]
+                              [--max-accuracy-loss 0.01] [--max-escalation <f>]
+                              [--objective accuracy] [--output cascade_calibration.json]
+    python3 cascade_scorer.py --input mail.jsonl --calibration cascade_calibration.json
+                              [--output scores.jsonl] [--batch-size 1024]
+    python3 cascade_scorer.py --report --corpus labelled.jsonl
+                              --calibration cascade_calibration.json
+"""
+
+import sys
+import json
+import time
+import hashlib
+from pathlib import Path
+
+
+LABELS = ['Low', 'Medium', 'High']
+LABEL_CLASSES = {name: index for index, name in enumerate(LABELS)}
+# PriorityClassifier.predictLabel
+APP_THRESHOLDS = {'medium': 40, 'high': 70}
+MAX_SCORE = 100
+CALIBRATION_VERSION = 1
+DEFAULT_BATCH_SIZE = 1024
+
+
+def label_class(value):
+    """Class index (0 Low, 1 Medium, 2 High) of a corpus label, or None."""
+    if value is None:
+        return None
+    if isinstance(value, str) and value in LABEL_CLASSES:
+        return LABEL_CLASSES[value]
+    try:
+        index = int(value)
+    except (TypeError, ValueError):
+        return None
+    return index if 0 <= index < len(LABELS) else None
+
+
+def threshold_classes(np, scores, medium, high):
+    """Class of each rule score under the given cutoffs, as predictLabel does."""
+    return np.where(scores >= high, 2, np.where(scores >= medium, 1, 0))
+
+
+class ModelStage:
+    """Batched predict_proba of the pickled pipeline, mapped to class indices."""
+
+    def __init__(self, pkl_path):
+        import joblib
+        import numpy as np
+
+        self.np = np
+        self.pipeline = joblib.load(pkl_path)
+        classes = [label_class(c) for c in self.pipeline.classes_]
+        if None in classes:
+            raise ValueError(f"Model classes {list(self.pipeline.classes_)} are not Low/Medium/High labels")
+        self.classes = np.array(classes)
+        self.fast = None
+        try:
+            from tfidf_artifact import split_pipeline
+            from fast_analyzer import FastAnalyzer
+
+            self.vectorizer, self.estimator = split_pipeline(self.pipeline)
+            self.fast = FastAnalyzer.from_vectorizer(self.vectorizer)
+        except (ImportError, ValueError):
+            pass
+
+    def predict(self, texts):
+        """Class index per text."""
+        if not texts:
+            return self.np.zeros(0, dtype=int)
+        if self.fast is not None:
+            from fast_analyzer import tfidf_transform
+
+            proba = self.estimator.predict_proba(tfidf_transform(self.fast, self.vectorizer, texts))
+        else:
+            proba = self.pipeline.predict_proba(texts)
+        return self.classes[proba.argmax(axis=1)]
+
+
+class CascadeScorer:
+    """
+    Rules first; emails whose rule score falls in the calibrated band go to
+    the model in batches. score() keeps input order.
+    """
+
+    def __init__(self, calibration, pkl_path=None, model=None):
+        from rule_scorer import RuleScorer
+
+        self.calibration = calibration
+        self.medium = calibration['thresholds']['medium']
+        self.high = calibration['thresholds']['high']
+        band = calibration.get('band')
+        self.band = (band['low'], band['high']) if band else None
+        self.rules = RuleScorer()
+        self.model = model
+        if self.model is None and self.band is not None:
+            self.model = ModelStage(pkl_path or calibration['pkl'])
+        self.stats = {'emails': 0, 'escalated': 0, 'rule_s': 0.0, 'model_s': 0.0}
+
+    def escalates(self, score):
+        return self.band is not None and self.band[0] <= score <= self.band[1]
+
+    def label(self, score):
+        return 'High' if score >= self.high else 'Medium' if score >= self.medium else 'Low'
+
+    def score(self, records):
+        """One {'id', 'score', 'label', 'source'} dict per record."""
+        from email_corpus import record_text
+
+        start = time.perf_counter()
+        results, pending = [], []
+        for record in records:
+            score = self.rules.score(record)
+            if self.escalates(score):
+                pending.append(len(results))
+                results.append({'id': record.get('id'), 'score': score, 'label': None,
+                                'source': 'model', '_text': record_text(record)})
+            else:
+                results.append({'id': record.get('id'), 'score': score,
+                                'label': self.label(score), 'source': 'rules'})
+        self.stats['rule_s'] += time.perf_counter() - start
+
+        if pending:
+            start = time.perf_counter()
+            predicted = self.model.predict([results[i].pop('_text') for i in pending])
+            for i, cls in zip(pending, predicted.tolist()):
+                results[i]['label'] = LABELS[cls]
+            self.stats['model_s'] += time.perf_counter() - start
+        self.stats['emails'] += len(results)
+        self.stats['escalated'] += len(pending)
+        return results
+
+    def score_stream(self, records, batch_size=DEFAULT_BATCH_SIZE):
+        from rule_scorer import iter_chunks
+
+        for chunk in iter_chunks(records, batch_size):
+            yield from self.score(chunk)
+
+
+def fit_thresholds(np, scores, truth, objective='accuracy'):
+    """
+    Cutoffs (medium, high) maximizing the objective of the rule labels.
+    Ties go to the cutoffs nearest the app's 40/70.
+    """
+    n = len(scores)
+    hist = np.zeros((MAX_SCORE + 1, len(LABELS)), dtype=np.int64)
+    np.add.at(hist, (scores, truth), 1)
+    # prefix[k, c]: emails of class c with score < k
+    prefix = np.vstack([np.zeros((1, len(LABELS)), dtype=np.int64), np.cumsum(hist, axis=0)])
+    cuts = np.arange(MAX_SCORE + 2)
+    m, h = np.meshgrid(cuts, cuts, indexing='ij')
+    total = prefix.sum(axis=1)
+    actual = hist.sum(axis=0)
+
+    tp = np.stack([prefix[m, 0],
+                   prefix[h, 1] - prefix[m, 1],
+                   actual[2] - prefix[h, 2]])
+    if objective == 'accuracy':
+        value = tp.sum(axis=0) / max(n, 1)
+    elif objective == 'macro_f1':
+        predicted = np.stack([total[m], total[h] - total[m], n - total[h]])
+        denom = predicted + actual[:, None, None]
+        value = np.where(denom > 0, 2 * tp / np.maximum(denom, 1), 0.0).mean(axis=0)
+    else:
+        raise ValueError(f"Unknown objective: {objective}")
+
+    value = np.where(m <= h, value, -1.0)
+    best = value.max()
+    distance = np.abs(m - APP_THRESHOLDS['medium']) + np.abs(h - APP_THRESHOLDS['high'])
+    candidates = np.argwhere(np.isclose(value, best))
+    i, j = min(candidates.tolist(), key=lambda c: (distance[c[0], c[1]], c[0], c[1]))
+    return int(cuts[i]), int(cuts[j]), float(best)
+
+
+def fit_band(np, scores, rule_correct, model_correct, max_accuracy_loss=0.01, max_escalation=None):
+    """
+    Rule-score band [low, high] sent to the model, or None.
+    Default: the band escalating the fewest emails whose cascade accuracy
+    is within max_accuracy_loss of the model alone (most accurate on ties).
+    With max_escalation: the most accurate band escalating at most that
+    share of emails (fewest escalated on ties).
+    """
+    n = len(scores)
+    if not n:
+        return None
+    per_score = np.zeros((3, MAX_SCORE + 1), dtype=np.int64)
+    np.add.at(per_score[0], scores, 1)
+    np.add.at(per_score[1], scores, rule_correct.astype(np.int64))
+    np.add.at(per_score[2], scores, model_correct.astype(np.int64))
+    prefix = np.hstack([np.zeros((3, 1), dtype=np.int64), np.cumsum(per_score, axis=1)])
+
+    lo, hi = np.meshgrid(np.arange(MAX_SCORE + 1), np.arange(MAX_SCORE + 1), indexing='ij')
+    valid = lo <= hi
+    hi1 = hi + 1
+    escalated = prefix[0][hi1] - prefix[0][lo]
+    correct = rule_correct.sum() - (prefix[1][hi1] - prefix[1][lo]) + (prefix[2][hi1] - prefix[2][lo])
+
+    rules_only = int(rule_correct.sum())
+    if max_escalation is not None:
+        allowed = valid & (escalated <= max_escalation * n)
+        if not allowed.any() or rules_only >= correct[allowed].max():
+            return None
+        best = correct[allowed].max()
+        choice = allowed & (correct == best)
+        key = escalated
+    else:
+        target = (model_correct.sum() / n - max_accuracy_loss) * n
+        if rules_only >= target - 1e-9:
+            return None
+        allowed = valid & (correct >= target - 1e-9)
+        if not allowed.any():
+            allowed = valid & (correct == correct[valid].max())
+        fewest = escalated[allowed].min()
+        choice = allowed & (escalated == fewest)
+        key = -correct
+    candidates = np.argwhere(choice)
+    i, j = min(candidates.tolist(), key=lambda c: (key[c[0], c[1]], c[1] - c[0], c[0]))
+    # Shrink to the scores that occur, so the band reads as observed values
+    observed = np.nonzero(per_score[0][i:j + 1])[0]
+    if observed.size:
+        i, j = i + int(observed[0]), i + int(observed[-1])
+    return {'low': int(i), 'high': int(j)}
+
+
+def _split(records, holdout):
+    """(fit, eval) lists; eval holds ~holdout of emails chosen by id hash."""
+    if not holdout:
+        return records, records
+    fit, held = [], []
+    for i, record in enumerate(records):
+        key = str(record.get('id', i)).encode('utf-8')
+        bucket = int.from_bytes(hashlib.blake2b(key, digest_size=4).digest(), 'little') % 10000
+        (held if bucket < holdout * 10000 else fit).append(record)
+    if not fit or not held:
+        return records, records
+    return fit, held
+
+
+def _labelled(path):
+    from rule_scorer import iter_records
+
+    records = [r for r in iter_records(path) if label_class(r.get('label')) is not None]
+    if not records:
+        raise ValueError(f"No labelled emails (label 0/1/2 or Low/Medium/High) in {path}")
+    return records
+
+
+def _rule_scores(np, records):
+    from rule_scorer import RuleScorer
+
+    rules = RuleScorer()
+    return np.array([rules.score(r) for r in records], dtype=np.int64)
+
+
+def _predict_all(model, records, batch_size):
+    from email_corpus import record_text
+
+    np = model.np
+    out = [model.predict([record_text(r) for r in records[i:i + batch_size]])
+           for i in range(0, len(records), batch_size)]
+    return np.concatenate(out) if out else np.zeros(0, dtype=int)
+
+
+def calibrate(corpus, pkl_path, holdout=0.2, objective='accuracy', max_accuracy_loss=0.01,
+              max_escalation=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Fit thresholds and band on a labelled corpus. Returns (calibration, eval records)."""
+    import numpy as np
+    from conversion_cache import file_sha256
+
+    records = _labelled(corpus)
+    fit, held = _split(records, holdout)
+    truth = np.array([label_class(r['label']) for r in fit])
+    scores = _rule_scores(np, fit)
+    medium, high, value = fit_thresholds(np, scores, truth, objective)
+
+    model = ModelStage(pkl_path)
+    model_correct = _predict_all(model, fit, batch_size) == truth
+    rule_correct = threshold_classes(np, scores, medium, high) == truth
+    band = fit_band(np, scores, rule_correct, model_correct, max_accuracy_loss, max_escalation)
+
+    calibration = {
+        'version': CALIBRATION_VERSION,
+        'thresholds': {'medium': medium, 'high': high},
+        'band': band,
+        'objective': objective,
+        'max_accuracy_loss': None if max_escalation is not None else max_accuracy_loss,
+        'max_escalation': max_escalation,
+        'pkl': str(pkl_path),
+        'pkl_sha256': file_sha256(pkl_path),
+        'corpus': str(corpus),
+        'fit_emails': len(fit),
+        'fit_objective': round(value, 6),
+    }
+    return calibration, held, model
+
+
+def _macro_f1(np, predicted, truth):
+    scores = []
+    for c in range(len(LABELS)):
+        tp = int(((predicted == c) & (truth == c)).sum())
+        denom = int((predicted == c).sum() + (truth == c).sum())
+        scores.append(2 * tp / denom if denom else 0.0)
+    return sum(scores) / len(scores)
+
+
+def evaluate(calibration, records, model=None, batch_size=DEFAULT_BATCH_SIZE, repeat=3):
+    """
+    Accuracy, macro-F1 and emails/s of rules (app and calibrated cutoffs),
+    the model alone and the cascade on labelled records. Times are the
+    best of `repeat` runs.
+    """
+    import numpy as np
+
+    truth = np.array([label_class(r['label']) for r in records])
+    model = model or ModelStage(calibration['pkl'])
+
+    def best_of(fn):
+        times, result = [], None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+        return result, min(times)
+
+    scores, rule_s = best_of(lambda: _rule_scores(np, records))
+    model_pred, model_s = best_of(lambda: _predict_all(model, records, batch_size))
+
+    def cascade_run():
+        scorer = CascadeScorer(calibration, model=model)
+        return list(scorer.score_stream(records, batch_size)), scorer.stats
+
+    (results, stats), cascade_s = best_of(cascade_run)
+    cascade_pred = np.array([LABEL_CLASSES[r['label']] for r in results])
+
+    n = len(records)
+    rows = {}
+    for name, predicted, seconds in (
+        ('rules_app', threshold_classes(np, scores, APP_THRESHOLDS['medium'], APP_THRESHOLDS['high']), rule_s),
+        ('rules_calibrated', threshold_classes(np, scores, calibration['thresholds']['medium'],
+                                               calibration['thresholds']['high']), rule_s),
+        ('model', model_pred, model_s),
+        ('cascade', cascade_pred, cascade_s),
+    ):
+        rows[name] = {
+            'accuracy': round(float((predicted == truth).mean()), 4) if n else None,
+            'macro_f1': round(_macro_f1(np, predicted, truth), 4) if n else None,
+            'emails_per_s': round(n / seconds) if seconds > 0 else None,
+        }
+    rows['cascade']['escalated'] = round(stats['escalated'] / n, 4) if n else 0.0
+    rows['cascade']['agreement_with_model'] = round(float((cascade_pred == model_pred).mean()), 4) if n else None
+    rows['cascade']['rule_s'] = round(stats['rule_s'], 4)
+    rows['cascade']['model_s'] = round(stats['model_s'], 4)
+    return {'emails': n, 'backends': rows}
+
+
+def print_report(report, calibration):
+    t = calibration['thresholds']
+    band = calibration['band']
+    band_text = f"[{band['low']}, {band['high']}]" if band else 'none (rules settle everything)'
+    print(f"→ Thresholds: High ≥ {t['high']}, Medium ≥ {t['medium']} (app: 70/40); "
+          f"model band: {band_text}", file=sys.stderr)
+    print(f"{'':<18} {'accuracy':>9} {'macro-F1':>9} {'emails/s':>10}", file=sys.stderr)
+    for name, row in report['backends'].items():
+        print(f"{name:<18} {row['accuracy']:>9.4f} {row['macro_f1']:>9.4f} "
+              f"{row['emails_per_s'] or 0:>10,}", file=sys.stderr)
+    cascade, model = report['backends']['cascade'], report['backends']['model']
+    speedup = cascade['emails_per_s'] / model['emails_per_s'] \
+        if cascade['emails_per_s'] and model['emails_per_s'] else 0.0
+    print(f"→ Cascade escalates {cascade['escalated']:.1%} of {report['emails']} emails, "
+          f"agrees with the model on {cascade['agreement_with_model']:.1%}, "
+          f"accuracy {cascade['accuracy'] - model['accuracy']:+.4f} vs the model, "
+          f"{speedup:.1f}x its throughput", file=sys.stderr)
+
+
+def load_calibration(path):
+    calibration = json.loads(Path(path).read_text())
+    if calibration.get('version') != CALIBRATION_VERSION:
+        raise ValueError(f"{path}: calibration version {calibration.get('version')}, "
+                         f"expected {CALIBRATION_VERSION}")
+    return calibration
+
+
+def main():
+    """Calibrate, apply or evaluate the rules → model cascade."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Calibrated rule/model cascade scorer')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--calibrate', action='store_true', help='Fit thresholds and band on --corpus')
+    mode.add_argument('--input', help='JSONL or .mbox export (or snapshot store) to score')
+    mode.add_argument('--report', action='store_true', help='Evaluate --calibration on --corpus')
+    parser.add_argument('--corpus', help='Labelled corpus (label 0/1/2 or Low/Medium/High)')
+    parser.add_argument('--pkl', default='priority_classifier.pkl',
+                        help='Model for the ambiguous band (default: priority_classifier.pkl)')
+    parser.add_argument('--calibration', default='cascade_calibration.json',
+                        help='Calibration file (default: cascade_calibration.json)')
+    parser.add_argument('--output', help='Calibration (--calibrate) or scores (--input) output')
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help='Share of --corpus held out for the report (default: 0.2; 0 uses all)')
+    parser.add_argument('--objective', choices=['accuracy', 'macro_f1'], default='accuracy',
+                        help='What the thresholds maximize (default: accuracy)')
+    parser.add_argument('--max-accuracy-loss', type=float, default=0.01,
+                        help='Allowed accuracy drop vs always running the model (default: 0.01)')
+    parser.add_argument('--max-escalation', type=float, default=None,
+                        help='Instead: escalate at most this share of emails, as accurately as possible')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Emails per model batch (default: {DEFAULT_BATCH_SIZE})")
+
+    args = parser.parse_args()
+
+    if (args.calibrate or args.report) and not args.corpus:
+        parser.error('--calibrate and --report need --corpus')
+    for path in (args.corpus, args.input):
+        if path and not Path(path).exists():
+            print(f"✗ Input file not found: {path}", file=sys.stderr)
+            return 1
+
+    try:
+        if args.calibrate:
+            if not Path(args.pkl).exists():
+                print(f"✗ Model not found: {args.pkl}", file=sys.stderr)
+                return 1
+            start = time.perf_counter()
+            calibration, held, model = calibrate(
+                args.corpus, args.pkl, args.holdout, args.objective, args.max_accuracy_loss,
+                args.max_escalation, args.batch_size,
+            )
+            print(f"✓ Calibrated on {calibration['fit_emails']} emails in "
+                  f"{time.perf_counter() - start:.2f}s", file=sys.stderr)
+            calibration['report'] = evaluate(calibration, held, model, args.batch_size)
+            calibration['report']['split'] = 'holdout' if args.holdout else 'fit'
+            output = args.output or args.calibration
+            Path(output).write_text(json.dumps(calibration, indent=2) + '\n')
+            print_report(calibration['report'], calibration)
+            print(f"✓ Calibration written to {output}", file=sys.stderr)
+            return 0
+
+        calibration = load_calibration(args.calibration)
+        if args.report:
+            records = _labelled(args.corpus)
+            report = evaluate(calibration, records, batch_size=args.batch_size)
+            print_report(report, calibration)
+            print(json.dumps(report, indent=2))
+            return 0
+
+        from conversion_cache import file_sha256
+        from rule_scorer import iter_records
+
+        pkl_path = calibration['pkl'] if args.pkl == parser.get_default('pkl') else args.pkl
+        if calibration['band'] and Path(pkl_path).exists() \
+                and file_sha256(pkl_path) != calibration.get('pkl_sha256'):
+            print(f"⚠ {pkl_path} differs from the calibrated model; recalibrate", file=sys.stderr)
+        scorer = CascadeScorer(calibration, pkl_path)
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        start = time.perf_counter()
+        try:
+            for result in scorer.score_stream(iter_records(args.input), args.batch_size):
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+        finally:
+            if args.output:
+                out.close()
+    except (ValueError, KeyError) as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+
+    elapsed = time.perf_counter() - start
+    stats = scorer.stats
+    rate = stats['emails'] / elapsed if elapsed > 0 else 0.0
+    share = stats['escalated'] / stats['emails'] if stats['emails'] else 0.0
+    print(f"✓ Scored {stats['emails']} emails in {elapsed:.2f}s ({rate:,.0f} emails/s), "
+          f"{share:.1%} escalated to the model", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Conversion Cache
+
+Content-addressed store for the intermediate artifacts of convert_model.py
+(ONNX model, SavedModel directory, TFLite flatbuffer). Each stage's key is a
+SHA-256 over its parent stage's key plus the settings and tool versions that
+affect that stage, so changing e.g. the TFLite optimizations only re-runs the
+final stage and reuses the cached ONNX model and SavedModel.
+
+Layout:
+    <cache_dir>/<stage>/<key>/artifact     (file or directory)
+    <cache_dir>/<stage>/<key>/meta.json    (key inputs and extra details)
+
+Tool versions are read from package metadata, so computing a key never
+imports TensorFlow.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+
+# Bump when a stage's conversion logic changes so stale entries miss
+CACHE_VERSION = 1
+
+TOOL_PACKAGES = [
+    'numpy',
+    'joblib',
+    'scikit-learn',
+    'skl2onnx',
+    'onnx',
+    'onnx-tf',
+    'tensorflow',
+    'tensorflow-cpu',
+]
+
+
+def tool_versions(packages=TOOL_PACKAGES):
+    """Installed version of each package, or None, without importing it."""
+    from importlib import metadata
+
+    versions = {}
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(stage, parent, settings):
+    """
+    Key for one pipeline stage.
+    parent is the upstream stage's key (or the input file hash).
+    """
+    payload = json.dumps(
+        {'v': CACHE_VERSION, 'stage': stage, 'parent': parent, 'settings': settings},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ConversionCache:
+    """Per-stage artifact cache with hit/miss accounting."""
+
+    def __init__(self, root, enabled=True):
+        self.root = Path(root)
+        self.enabled = enabled
+        self.events = []  # (stage, key, 'hit' | 'miss' | 'disabled')
+
+    def _entry(self, stage, key):
+        return self.root / stage / key
+
+    def lookup(self, stage, key):
+        """
+        Path of the cached artifact for (stage, key), or None on a miss.
+        Records the hit or miss for the report.
+        """
+        if not self.enabled:
+            self.events.append((stage, key, 'disabled'))
+            return None
+        artifact = self._entry(stage, key) / 'artifact'
+        if artifact.exists():
+            self.events.append((stage, key, 'hit'))
+            return artifact
+        self.events.append((stage, key, 'miss'))
+        return None
+
+    def peek(self, stage, key):
+        """Like lookup() but without recording an event."""
+        if not self.enabled:
+            return None
+        artifact = self._entry(stage, key) / 'artifact'
+        return artifact if artifact.exists() else None
+
+    def meta(self, stage, key):
+        """Metadata stored alongside an entry, or {}."""
+        meta_path = self._entry(stage, key) / 'meta.json'
+        if not meta_path.exists():
+            return {}
+        return json.loads(meta_path.read_text())
+
+    def store(self, stage, key, src, meta=None):
+        """
+        Copy src (file or directory) into the cache under (stage, key).
+        The entry appears atomically; returns the cached artifact path.
+        """
+        if not self.enabled:
+            return Path(src)
+
+        entry = self._entry(stage, key)
+        if (entry / 'artifact').exists():
+            return entry / 'artifact'
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f'.{key[:12]}-', dir=entry.parent))
+        try:
+            if Path(src).is_dir():
+                shutil.copytree(src, tmp / 'artifact')
+            else:
+                shutil.copy2(src, tmp / 'artifact')
+            (tmp / 'meta.json').write_text(
+                json.dumps({'stage': stage, 'key': key, **(meta or {})}, indent=2, default=str)
+            )
+            os.replace(tmp, entry)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not (entry / 'artifact').exists():
+                raise
+        return entry / 'artifact'
+
+    def restore(self, artifact, dest):
+        """Copy a cached artifact (file or directory) to dest."""
+        dest = Path(dest)
+        if dest.exists():
+            if dest.is_dir():
+                shutil.rmtree(dest)
+            else:
+                dest.unlink()
+        if Path(artifact).is_dir():
+            shutil.copytree(artifact, dest)
+        else:
+            shutil.copy2(artifact, dest)
+        return dest
+
+    def report(self):
+        """Summary of hits and misses per stage."""
+        summary = {}
+        for stage, key, outcome in self.events:
+            counts = summary.setdefault(stage, {'hit': 0, 'miss': 0, 'disabled': 0})
+            counts[outcome] += 1
+        return summary
@@ -15,18 +15,60 @@
 ║  1. [PRIMARY] scikit-learn model → ONNX → SavedModel → TFLite             ║
 ║  2. [FALLBACK] TensorFlow/Keras pickled model → SavedModel → TFLite       ║
 ║  3. [SAFETY NET] Create synthetic fallback TFLite if both fail            ║
+║     (with --distill: a small student trained to mimic the pkl instead)    ║
+║                                                                            ║
+║  ALTERNATIVE TARGET (--target tfidf):                                     ║
+║  Export vocabulary, idf and classifier weights into one memory-mapped     ║
+║  artifact scored by tfidf_artifact.py with NumPy only (no TensorFlow).    ║
+║  --target ort: whole pipeline → ONNX → optimized ORT format for the       ║
+║  desktop build (onnxruntime only, no TensorFlow or onnx-tf).              ║
 ║                                                                            ║
 ║  The script attempts each method in order and falls back if one fails.    ║
+║  With --parallel, all viable methods race in separate processes and the   ║
+║  highest-priority success is kept.                                        ║
 ║  This ensures a usable .tflite is produced for the Flutter app.           ║
 ║                                                                            ║
 ╚════════════════════════════════════════════════════════════════════════════╝
 
 Usage:
-    python3 convert_model.py [--input <pkl_file>] [--features <n>]
+    python3 convert_model.py [--input <pkl_file>] [--features <n>] [--target <t>]
 
 Arguments:
     --input <file>      Path to pickle model (default: priority_classifier.pkl)
     --features <n>      Number of input features (auto-detect if possible)
+    --target <t>        tflite (default), tfidf (memory-mapped NumPy artifact),
+                        sparse (TFLite over token ids + counts) or ort
+                        (ONNX Runtime format, string input, no TensorFlow)
+    --prune-top-k <k>   Prune the vocabulary to the K highest-weight terms first
+    --prune-fraction <f>  Prune to terms covering fraction f of total weight
+    --keep-intermediates  Keep the ONNX model and SavedModel for benchmarking
+    --cache-dir <dir>   Stage cache keyed on the pkl hash, settings and tool
+                        versions (default: .convert_cache)
+    --no-cache          Rebuild every stage
+    --parallel          Race methods A/B/C in worker processes with timeouts
+    --quantize <mode>   none, dynamic (default), float16 or int8 (builtins only)
+    --quantize-sweep    Build all modes and print a size/latency/accuracy table
+    --ops-set <s>       auto (default: each method's own), builtins (no Flex
+                        delegate) or select (allow SELECT_TF_OPS)
+    --corpus <file>     JSONL emails for int8 calibration, the sweep,
+                        --distill and --target ort validation
+    --distill           Method C trains a student on the pkl's predictions
+                        over --corpus instead of random data (see distill.py)
+    --distill-buckets <n>  Hashed token buckets of the student (default: 512)
+    --timeout <s>       Per-method timeout for --parallel
+    --fuzz              Stream large generated batches (zeros, huge values,
+                        one-hots, ...) through the model and fail on NaN/Inf,
+                        out-of-range, batch drift or (method A) monotonicity
+    --fuzz-rows <n>     Rows to generate for --fuzz (default: 200000)
+    --fuzz-budget <s>   Time budget for --fuzz in seconds (default: 30)
+    --validate <file>   Only validate an existing .tflite (with --fuzz: fuzz it)
+    --runtime <r>       Interpreter for validation: auto (default; the lightest
+                        of ai_edge_litert, tflite_runtime, tensorflow),
+                        or one of those (see lite_runtime.py)
+    --profile           Record wall/CPU time, RSS and tracemalloc peak per
+                        stage (see stage_profiler.py)
+    --profile-output <f>  Profile summary path (default: convert_profile.json;
+                        the Chrome trace goes next to it as .trace.json)
 
 Exit Codes:
     0 = Success (TFLite created and validated)
@@ -35,6 +77,11 @@ Exit Codes:
 Examples:
     python3 convert_model.py
     python3 convert_model.py --input model.pkl --features 128
+    python3 convert_model.py --target tfidf
+    python3 convert_model.py --target ort --corpus emails.jsonl
+    python3 convert_model.py --features 419 --quantize int8 --corpus emails.jsonl
+    python3 convert_model.py --corpus emails.jsonl --distill
+    python3 convert_model.py --validate assets/models/priority_classifier.tflite
 """
 
 import os
@@ -45,6 +92,17 @@ import tempfile
 import shutil
 from pathlib import Path
 
+from stage_profiler import StageProfiler
+from lite_runtime import RUNTIME_CHOICES, open_interpreter
+
+
+# Stage timings for --profile; a no-op until start() is called
+PROFILER = StageProfiler()
+
+# Outcome of the last run(): method, artifact path, validation details or
+# error (read by convert_sweep.py)
+LAST_RESULT = {}
+
 
 def print_header(msg):
     """Print section header."""
@@ -85,7 +143,8 @@ def check_and_import(module_name, package_name=None):
     """
     package_name = package_name or module_name
     try:
-        __import__(module_name)
+        with PROFILER.stage(f'import {module_name}'):
+            __import__(module_name)
         print_success(f"Module '{module_name}' is available")
         return True
     except ImportError:
@@ -101,11 +160,30 @@ def check_dependencies(required_imports):
     """
     print_header("Checking Dependencies")
     results = {}
-    for module, package in required_imports.items():
-        results[module] = check_and_import(module, package)
+    with PROFILER.stage('check_dependencies'):
+        for module, package in required_imports.items():
+            results[module] = check_and_import(module, package)
     return results
 
 
+def find_missing_dependencies(required_imports):
+    """
+    Locate modules with importlib.util.find_spec without importing them.
+    Returns a list of pip package names that are missing.
+    """
+    import importlib.util
+
+    missing = []
+    for module, package in required_imports.items():
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except (ImportError, ValueError):
+            found = False
+        if not found:
+            missing.append(package)
+    return missing
+
+
 def infer_n_features(model):
     """
     Try to infer number of input features from model attributes.
@@ -123,94 +201,462 @@ def infer_n_features(model):
     return None
 
 
-def method_a_sklearn_to_tflite(pkl_path, n_features, assets_dir):
+# Modules each method imports → pip package to suggest when missing
+METHOD_A_DEPS = {
+    'joblib': 'joblib',
+    'skl2onnx': 'skl2onnx',
+    'onnx': 'onnx',
+    'onnx_tf': 'onnx-tf',
+    'tensorflow': 'tensorflow',
+}
+METHOD_B_DEPS = {
+    'tensorflow': 'tensorflow',
+}
+METHOD_C_DEPS = {
+    'tensorflow': 'tensorflow',
+    'numpy': 'numpy',
+}
+
+# TFLiteConverter settings per method (names of tf.lite.Optimize / OpsSet members)
+METHOD_A_TFLITE_SETTINGS = {
+    'optimizations': ['DEFAULT'],
+    'supported_ops': ['TFLITE_BUILTINS', 'SELECT_TF_OPS'],
+}
+METHOD_B_TFLITE_SETTINGS = {
+    'optimizations': ['DEFAULT'],
+    'supported_ops': ['TFLITE_BUILTINS'],
+}
+METHOD_C_TFLITE_SETTINGS = METHOD_A_TFLITE_SETTINGS
+
+
+def apply_tflite_settings(converter, settings, tf, representative_dataset=None):
+    """Apply a *_TFLITE_SETTINGS dict (optionally quantized) to a TFLiteConverter."""
+    converter.optimizations = [getattr(tf.lite.Optimize, o) for o in settings['optimizations']]
+    converter.target_spec.supported_ops = [
+        getattr(tf.lite.OpsSet, o) for o in settings['supported_ops']
+    ]
+    if settings.get('supported_types'):
+        converter.target_spec.supported_types = [
+            getattr(tf, t) for t in settings['supported_types']
+        ]
+    if representative_dataset is not None:
+        converter.representative_dataset = representative_dataset
+
+
+QUANTIZE_MODES = ['none', 'dynamic', 'float16', 'int8']
+OPS_SETS = ['auto', 'builtins', 'select']
+
+
+def quantized_settings(base, mode, ops='auto'):
+    """
+    Converter settings for a --quantize mode, derived from a method's base
+    settings. 'dynamic' is the historical behaviour (Optimize.DEFAULT).
+    'int8' is builtins-only so the Flex delegate is not needed.
+    ops ('builtins' or 'select') drops or adds SELECT_TF_OPS; 'auto' keeps
+    what the method and mode chose.
+    """
+    settings = dict(base, quantize=mode)
+    if mode == 'none':
+        settings['optimizations'] = []
+    elif mode == 'dynamic':
+        settings['optimizations'] = ['DEFAULT']
+    elif mode == 'float16':
+        settings['optimizations'] = ['DEFAULT']
+        settings['supported_types'] = ['float16']
+    elif mode == 'int8':
+        settings['optimizations'] = ['DEFAULT']
+        settings['supported_ops'] = ['TFLITE_BUILTINS_INT8']
+    else:
+        raise ValueError(f"Unknown quantize mode: {mode}")
+    if ops == 'builtins':
+        settings['supported_ops'] = [o for o in settings['supported_ops'] if o != 'SELECT_TF_OPS']
+    elif ops == 'select' and 'SELECT_TF_OPS' not in settings['supported_ops']:
+        settings['supported_ops'] = settings['supported_ops'] + ['SELECT_TF_OPS']
+    elif ops not in OPS_SETS:
+        raise ValueError(f"Unknown ops set: {ops}")
+    return settings
+
+
+def featurize_corpus(corpus_path, pkl_path, width, limit=2000):
+    """
+    Turn corpus emails into model-input rows with the pickled vectorizer.
+    Returns (features float32 [n, width], labels list).
+    Raises ValueError when the vectorizer does not produce `width` columns.
+    """
+    import joblib
+    import numpy as np
+    from email_corpus import load_texts
+
+    pipeline = joblib.load(pkl_path)
+    steps = getattr(pipeline, 'steps', None)
+    vectorizer = steps[0][1] if steps else None
+    vocab = getattr(vectorizer, 'vocabulary_', None)
+    if vocab is None:
+        raise ValueError("Pickled model has no vectorizer to featurize the corpus")
+    if len(vocab) != width:
+        raise ValueError(
+            f"Model input width {width} does not match the vectorizer vocabulary "
+            f"({len(vocab)}); rerun with --features {len(vocab)}"
+        )
+
+    texts, labels = load_texts(corpus_path, limit=limit)
+    if not texts:
+        raise ValueError(f"Corpus is empty: {corpus_path}")
+    features = vectorizer.transform(texts).toarray().astype(np.float32)
+    return features, labels
+
+
+def savedmodel_input_width(tf, savedmodel_dir):
+    """Width of the SavedModel's (single) serving input."""
+    loaded = tf.saved_model.load(savedmodel_dir)
+    _, kwargs = loaded.signatures['serving_default'].structured_input_signature
+    spec = next(iter(kwargs.values()))
+    return int(spec.shape[-1])
+
+
+def corpus_features(tf, savedmodel_dir, quant):
+    """Featurized corpus for this SavedModel's width, memoized in quant."""
+    width = savedmodel_input_width(tf, savedmodel_dir)
+    memo = quant.setdefault('_features', {})
+    if width not in memo:
+        memo[width] = featurize_corpus(quant['corpus'], quant['pkl_path'], width)
+    return memo[width]
+
+
+def convert_savedmodel(tf, savedmodel_dir, base_settings, quant=None, mode=None):
+    """
+    Convert a SavedModel to TFLite bytes under the requested quantize mode.
+    int8 calibrates on featurized corpus emails, never on random data.
+    """
+    mode = mode or (quant or {}).get('mode', 'dynamic')
+    settings = quantized_settings(base_settings, mode, (quant or {}).get('ops', 'auto'))
+
+    representative_dataset = None
+    if mode == 'int8':
+        if not quant or not quant.get('corpus'):
+            raise ValueError("--quantize int8 requires --corpus for the representative dataset")
+        features, _ = corpus_features(tf, savedmodel_dir, quant)
+
+        def _calibration_rows():
+            for row in features[:500]:
+                yield [row[None, :]]
+
+        representative_dataset = _calibration_rows
+
+    with PROFILER.stage('TFLiteConverter.from_saved_model'):
+        converter = tf.lite.TFLiteConverter.from_saved_model(savedmodel_dir)
+    apply_tflite_settings(converter, settings, tf, representative_dataset)
+    with PROFILER.stage('TFLiteConverter.convert', quantize=mode):
+        return converter.convert()
+
+
+def _run_tflite_rows(tf, np, model_content, features, latency_rows=200):
+    """
+    Score every feature row one at a time.
+    Returns (outputs [n, k], per-row latencies in ms for the first rows).
+    """
+    import time
+
+    interpreter = tf.lite.Interpreter(model_content=model_content)
+    interpreter.allocate_tensors()
+    inp = interpreter.get_input_details()[0]
+    out = interpreter.get_output_details()[0]
+
+    outputs = []
+    latencies = []
+    for i, row in enumerate(features):
+        start = time.perf_counter()
+        interpreter.set_tensor(inp['index'], row[None, :].astype(inp['dtype']))
+        interpreter.invoke()
+        result = interpreter.get_tensor(out['index'])
+        if i < latency_rows:
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        if out['dtype'] != np.float32:
+            scale, zero_point = out['quantization']
+            result = (result.astype(np.float32) - zero_point) * (scale or 1.0)
+        outputs.append(result.reshape(-1))
+    return np.array(outputs), np.array(latencies)
+
+
+def quantization_sweep(tf, savedmodel_dir, base_settings, quant, assets_dir):
+    """
+    Build every quantize mode from one SavedModel and compare them.
+    Writes assets/quantized/priority_classifier.<mode>.tflite and report.json,
+    and prints a size / latency / accuracy-delta table.
+    Returns the list of per-mode result dicts.
+    """
+    import json
+    import numpy as np
+
+    out_dir = assets_dir.parent / 'quantized'
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    labels = None
+    if quant.get('corpus'):
+        features, labels = corpus_features(tf, savedmodel_dir, quant)
+        source = quant['corpus']
+    else:
+        width = savedmodel_input_width(tf, savedmodel_dir)
+        features = np.random.default_rng(0).standard_normal((256, width)).astype(np.float32)
+        source = 'random inputs (pass --corpus for real emails)'
+    print_info(f"Quantization sweep on {len(features)} rows from {source}")
+
+    classes = None
+    if labels and any(label is not None for label in labels):
+        import joblib
+        classes = np.array([str(c) for c in joblib.load(quant['pkl_path']).classes_])
+        truth = np.array([str(label) for label in labels])
+
+    rows = []
+    reference = None
+    reference_accuracy = None
+    for mode in QUANTIZE_MODES:
+        row = {'mode': mode}
+        try:
+            model_content = convert_savedmodel(tf, savedmodel_dir, base_settings, quant, mode)
+        except Exception as e:
+            row['error'] = str(e)
+            rows.append(row)
+            print_warning(f"{mode}: {e}")
+            continue
+
+        path = out_dir / f'priority_classifier.{mode}.tflite'
+        path.write_bytes(model_content)
+        outputs, latencies = _run_tflite_rows(tf, np, model_content, features)
+
+        row['size_kb'] = round(len(model_content) / 1024, 1)
+        row['latency_p50_ms'] = round(float(np.percentile(latencies, 50)), 4)
+        row['latency_p95_ms'] = round(float(np.percentile(latencies, 95)), 4)
+
+        if reference is None:
+            reference = outputs
+        row['max_abs_diff'] = round(float(np.abs(outputs - reference).max()), 6)
+        if outputs.shape[1] > 1:
+            row['agreement'] = round(float((outputs.argmax(1) == reference.argmax(1)).mean()), 4)
+        else:
+            row['agreement'] = round(float(((outputs > 0.5) == (reference > 0.5)).mean()), 4)
+
+        if classes is not None and outputs.shape[1] == len(classes):
+            accuracy = float((classes[outputs.argmax(1)] == truth).mean())
+            if reference_accuracy is None:
+                reference_accuracy = accuracy
+            row['accuracy'] = round(accuracy, 4)
+            row['accuracy_delta'] = round(accuracy - reference_accuracy, 4)
+        rows.append(row)
+
+    print_info(f"{'mode':<8} {'size KB':>9} {'p50 ms':>8} {'p95 ms':>8} {'agree':>7} {'Δacc':>7}")
+    for row in rows:
+        if 'error' in row:
+            print_info(f"{row['mode']:<8} failed: {row['error']}")
+            continue
+        delta = row.get('accuracy_delta')
+        print_info(
+            f"{row['mode']:<8} {row['size_kb']:>9} {row['latency_p50_ms']:>8.4f} "
+            f"{row['latency_p95_ms']:>8.4f} {row['agreement']:>7.4f} "
+            f"{'' if delta is None else f'{delta:+.4f}':>7}"
+        )
+
+    report_path = out_dir / 'report.json'
+    report_path.write_text(json.dumps({'source': source, 'modes': rows}, indent=2))
+    print_success(f"Quantization report: {report_path}")
+    return rows
+
+
+def save_savedmodel(model, savedmodel_dir):
+    """Save a Keras model as a SavedModel (Keras 3 uses export())."""
+    if hasattr(model, 'export'):
+        model.export(savedmodel_dir)
+    else:
+        model.save(savedmodel_dir)
+
+
+def conversion_keys(pkl_hash, n_features, versions, quantize='dynamic', corpus_hash=None,
+                    distill=None, ops='auto'):
+    """
+    Cache key for every conversion stage (see conversion_cache.py).
+    Each key chains its parent's key with the settings that stage depends on.
+    corpus_hash only matters for int8, whose calibration data it identifies,
+    and for a distilled method C, whose training data it is.
+    """
+    from conversion_cache import stage_key
+
+    tf_version = versions.get('tensorflow') or versions.get('tensorflow-cpu')
+    calibration = corpus_hash if quantize == 'int8' else None
+    keys = {}
+    keys['a.onnx'] = stage_key('a.onnx', pkl_hash, {
+        'n_features': n_features,
+        'scikit-learn': versions.get('scikit-learn'),
+        'skl2onnx': versions.get('skl2onnx'),
+        'onnx': versions.get('onnx'),
+    })
+    keys['a.savedmodel'] = stage_key('a.savedmodel', keys['a.onnx'], {
+        'onnx-tf': versions.get('onnx-tf'),
+        'tensorflow': tf_version,
+    })
+    keys['a.tflite'] = stage_key('a.tflite', keys['a.savedmodel'], {
+        'tensorflow': tf_version,
+        'calibration': calibration,
+        **quantized_settings(METHOD_A_TFLITE_SETTINGS, quantize, ops),
+    })
+    keys['b.savedmodel'] = stage_key('b.savedmodel', pkl_hash, {'tensorflow': tf_version})
+    keys['b.tflite'] = stage_key('b.tflite', keys['b.savedmodel'], {
+        'tensorflow': tf_version,
+        'calibration': calibration,
+        **quantized_settings(METHOD_B_TFLITE_SETTINGS, quantize, ops),
+    })
+    if distill:
+        # The student depends on the teacher, its corpus and the sklearn that scores it
+        keys['c.tflite'] = stage_key('c.tflite', pkl_hash, {
+            'distill': distill['settings'],
+            'corpus': corpus_hash,
+            'scikit-learn': versions.get('scikit-learn'),
+            'numpy': versions.get('numpy'),
+            'tensorflow': tf_version,
+            'calibration': calibration,
+            **quantized_settings(METHOD_C_TFLITE_SETTINGS, quantize, ops),
+        })
+    else:
+        keys['c.tflite'] = stage_key('c.tflite', None, {
+            'n_features': n_features,
+            'numpy': versions.get('numpy'),
+            'tensorflow': tf_version,
+            'calibration': calibration,
+            **quantized_settings(METHOD_C_TFLITE_SETTINGS, quantize, ops),
+        })
+    keys['result'] = stage_key('result', pkl_hash, {
+        'stages': [keys['a.tflite'], keys['b.tflite'], keys['c.tflite']],
+    })
+    return keys
+
+
+def _cache_lookup(cache, keys, stage):
+    """Cached artifact for a stage, or None when caching is off."""
+    if cache is None or keys is None:
+        return None
+    return cache.lookup(stage, keys[stage])
+
+
+def _cache_store(cache, keys, stage, path):
+    """Store a freshly built stage artifact when caching is on."""
+    if cache is not None and keys is not None:
+        cache.store(stage, keys[stage], path)
+
+
+def method_a_sklearn_to_tflite(pkl_path, n_features, assets_dir, keep_intermediates=False,
+                               cache=None, keys=None, check_deps=True, quant=None):
     """
     METHOD A: Convert scikit-learn model to ONNX to SavedModel to TFLite.
+    With a cache, each of the three stages is reused when its key matches.
     Returns (success: bool, tflite_path: str or None, error_msg: str or None)
     """
     print_step(1, "Attempting scikit-learn → ONNX → SavedModel → TFLite")
     
-    # Check dependencies
-    deps_needed = {
-        'joblib': 'joblib',
-        'skl2onnx': 'skl2onnx',
-        'onnx': 'onnx',
-        'onnx_tf': 'onnx-tf',
-        'tensorflow': 'tensorflow',
-    }
+    onnx_path = str(assets_dir.parent / 'priority_classifier.onnx')
+    savedmodel_dir = str(assets_dir.parent / 'tmp_savedmodel')
+    tflite_path = str(assets_dir / 'priority_classifier.tflite')
     
-    deps = check_dependencies(deps_needed)
+    # A sweep needs the SavedModel, so it bypasses the final-stage cache
+    cached = None if quant and quant.get('sweep') else _cache_lookup(cache, keys, 'a.tflite')
+    if cached:
+        cache.restore(cached, tflite_path)
+        print_success(f"TFLite restored from cache: {tflite_path}")
+        if keep_intermediates:
+            for stage, dest in (('a.onnx', onnx_path), ('a.savedmodel', savedmodel_dir)):
+                artifact = cache.peek(stage, keys[stage])
+                if artifact:
+                    cache.restore(artifact, dest)
+        return True, tflite_path, None
     
-    if not all(deps.values()):
-        print_warning("Missing dependencies for Method A, will try fallback")
-        return False, None, "Missing scikit-learn dependencies"
+    # Check dependencies
+    if check_deps:
+        deps = check_dependencies(METHOD_A_DEPS)
+        
+        if not all(deps.values()):
+            print_warning("Missing dependencies for Method A, will try fallback")
+            return False, None, "Missing scikit-learn dependencies"
     
     try:
-        import joblib
-        import numpy as np
-        from skl2onnx import convert_sklearn
-        from skl2onnx.common.data_types import FloatTensorType
-        import onnx
-        import onnx_tf.backend
-        import tensorflow as tf
+        with PROFILER.stage('imports'):
+            import joblib
+            import numpy as np
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import FloatTensorType
+            import onnx
+            import onnx_tf.backend
+            import tensorflow as tf
         
-        print_info(f"Loading pickle from {pkl_path}")
-        model = joblib.load(pkl_path)
-        print_success(f"Loaded model type: {type(model).__name__}")
-        
-        # Verify it's a sklearn model
-        if not hasattr(model, 'predict'):
-            raise ValueError("Loaded object has no 'predict' method (not a sklearn estimator)")
-        
-        # Infer n_features if needed
-        inferred = infer_n_features(model)
-        if inferred and inferred != n_features:
-            print_info(f"Updating n_features from {n_features} to {inferred} (inferred from model)")
-            n_features = inferred
-        
-        print_info(f"Input features: {n_features}")
-        
-        # Convert to ONNX
-        print_info("Converting to ONNX...")
-        initial_type = [('input', FloatTensorType([None, n_features]))]
-        onnx_model = convert_sklearn(model, initial_types=initial_type)
-        
-        onnx_path = str(assets_dir.parent / 'priority_classifier.onnx')
-        with open(onnx_path, 'wb') as f:
-            f.write(onnx_model.SerializeToString())
-        print_success(f"ONNX saved: {onnx_path}")
-        
-        # Convert ONNX to SavedModel
-        print_info("Converting ONNX → SavedModel...")
-        onnx_model = onnx.load(onnx_path)
-        tf_rep = onnx_tf.backend.prepare(onnx_model)
-        
-        savedmodel_dir = str(assets_dir.parent / 'tmp_savedmodel')
-        tf_rep.export_graph(savedmodel_dir)
-        print_success(f"SavedModel created: {savedmodel_dir}/")
+        cached_savedmodel = _cache_lookup(cache, keys, 'a.savedmodel')
+        if cached_savedmodel:
+            cache.restore(cached_savedmodel, savedmodel_dir)
+            print_success(f"SavedModel restored from cache: {savedmodel_dir}/")
+        else:
+            cached_onnx = _cache_lookup(cache, keys, 'a.onnx')
+            if cached_onnx:
+                cache.restore(cached_onnx, onnx_path)
+                print_success(f"ONNX restored from cache: {onnx_path}")
+            else:
+                print_info(f"Loading pickle from {pkl_path}")
+                with PROFILER.stage('joblib.load'):
+                    model = joblib.load(pkl_path)
+                print_success(f"Loaded model type: {type(model).__name__}")
+                
+                # Verify it's a sklearn model
+                if not hasattr(model, 'predict'):
+                    raise ValueError("Loaded object has no 'predict' method (not a sklearn estimator)")
+                
+                # Infer n_features if needed
+                inferred = infer_n_features(model)
+                if inferred and inferred != n_features:
+                    print_info(f"Updating n_features from {n_features} to {inferred} (inferred from model)")
+                    n_features = inferred
+                
+                print_info(f"Input features: {n_features}")
+                
+                # Convert to ONNX
+                print_info("Converting to ONNX...")
+                initial_type = [('input', FloatTensorType([None, n_features]))]
+                with PROFILER.stage('convert_sklearn', n_features=n_features):
+                    onnx_model = convert_sklearn(model, initial_types=initial_type)
+                
+                with open(onnx_path, 'wb') as f:
+                    f.write(onnx_model.SerializeToString())
+                print_success(f"ONNX saved: {onnx_path}")
+                _cache_store(cache, keys, 'a.onnx', onnx_path)
+            
+            # Convert ONNX to SavedModel
+            print_info("Converting ONNX → SavedModel...")
+            with PROFILER.stage('onnx.load'):
+                onnx_model = onnx.load(onnx_path)
+            with PROFILER.stage('onnx_tf.backend.prepare'):
+                tf_rep = onnx_tf.backend.prepare(onnx_model)
+            
+            with PROFILER.stage('export_graph'):
+                tf_rep.export_graph(savedmodel_dir)
+            print_success(f"SavedModel created: {savedmodel_dir}/")
+            _cache_store(cache, keys, 'a.savedmodel', savedmodel_dir)
         
         # Convert SavedModel to TFLite
         print_info("Converting SavedModel → TFLite...")
-        converter = tf.lite.TFLiteConverter.from_saved_model(savedmodel_dir)
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        converter.target_spec.supported_ops = [
-            tf.lite.OpsSet.TFLITE_BUILTINS,
-            tf.lite.OpsSet.SELECT_TF_OPS,
-        ]
+        if quant and quant.get('sweep'):
+            with PROFILER.stage('quantization_sweep'):
+                quantization_sweep(tf, savedmodel_dir, METHOD_A_TFLITE_SETTINGS, quant, assets_dir)
+        tflite_model = convert_savedmodel(tf, savedmodel_dir, METHOD_A_TFLITE_SETTINGS, quant)
         
-        tflite_model = converter.convert()
-        tflite_path = str(assets_dir / 'priority_classifier.tflite')
         with open(tflite_path, 'wb') as f:
             f.write(tflite_model)
+        _cache_store(cache, keys, 'a.tflite', tflite_path)
         
         size_mb = Path(tflite_path).stat().st_size / (1024 * 1024)
         print_success(f"TFLite created: {tflite_path} ({size_mb:.2f} MB)")
         
         # Cleanup
-        if os.path.exists(onnx_path):
-            os.remove(onnx_path)
-        if os.path.exists(savedmodel_dir):
-            shutil.rmtree(savedmodel_dir)
+        if keep_intermediates:
+            print_info(f"Keeping intermediates: {onnx_path}, {savedmodel_dir}/")
+        else:
+            if os.path.exists(onnx_path):
+                os.remove(onnx_path)
+            if os.path.exists(savedmodel_dir):
+                shutil.rmtree(savedmodel_dir)
         
         return True, tflite_path, None
         
@@ -219,52 +665,68 @@ def method_a_sklearn_to_tflite(pkl_path, n_features, assets_dir):
         return False, None, str(e)
 
 
-def method_b_keras_to_tflite(pkl_path, assets_dir):
+def method_b_keras_to_tflite(pkl_path, assets_dir, cache=None, keys=None, check_deps=True,
+                             quant=None):
     """
     METHOD B: Convert pickled Keras/TensorFlow model directly to TFLite.
     Returns (success: bool, tflite_path: str or None, error_msg: str or None)
     """
     print_step(2, "Attempting Keras/TensorFlow pickled model → TFLite")
     
-    deps_needed = {
-        'tensorflow': 'tensorflow',
-    }
+    tflite_path = str(assets_dir / 'priority_classifier.tflite')
+    savedmodel_dir = str(assets_dir.parent / 'tmp_savedmodel')
     
-    deps = check_dependencies(deps_needed)
+    # A sweep needs the SavedModel, so it bypasses the final-stage cache
+    cached = None if quant and quant.get('sweep') else _cache_lookup(cache, keys, 'b.tflite')
+    if cached:
+        cache.restore(cached, tflite_path)
+        print_success(f"TFLite restored from cache: {tflite_path}")
+        return True, tflite_path, None
     
-    if not deps['tensorflow']:
-        print_warning("TensorFlow not available, will try fallback")
-        return False, None, "TensorFlow not available"
+    if check_deps:
+        deps = check_dependencies(METHOD_B_DEPS)
+        
+        if not deps['tensorflow']:
+            print_warning("TensorFlow not available, will try fallback")
+            return False, None, "TensorFlow not available"
     
     try:
-        import tensorflow as tf
-        import pickle as pkl
-        
-        print_info(f"Attempting to unpickle {pkl_path} as TensorFlow model...")
-        with open(pkl_path, 'rb') as f:
-            obj = pkl.load(f)
+        with PROFILER.stage('imports'):
+            import tensorflow as tf
+            import pickle as pkl
         
-        # Check if it's a Keras model
-        if not isinstance(obj, tf.keras.Model):
-            raise ValueError(f"Pickled object is not a tf.keras.Model (is {type(obj).__name__})")
-        
-        print_success(f"Loaded Keras model: {obj.name}")
-        
-        # Save as SavedModel (intermediate format)
-        savedmodel_dir = str(assets_dir.parent / 'tmp_savedmodel')
-        print_info(f"Saving as SavedModel to {savedmodel_dir}...")
-        obj.save(savedmodel_dir)
-        print_success("SavedModel saved")
+        cached_savedmodel = _cache_lookup(cache, keys, 'b.savedmodel')
+        if cached_savedmodel:
+            cache.restore(cached_savedmodel, savedmodel_dir)
+            print_success(f"SavedModel restored from cache: {savedmodel_dir}/")
+        else:
+            print_info(f"Attempting to unpickle {pkl_path} as TensorFlow model...")
+            with open(pkl_path, 'rb') as f, PROFILER.stage('pickle.load'):
+                obj = pkl.load(f)
+            
+            # Check if it's a Keras model
+            if not isinstance(obj, tf.keras.Model):
+                raise ValueError(f"Pickled object is not a tf.keras.Model (is {type(obj).__name__})")
+            
+            print_success(f"Loaded Keras model: {obj.name}")
+            
+            # Save as SavedModel (intermediate format)
+            print_info(f"Saving as SavedModel to {savedmodel_dir}...")
+            with PROFILER.stage('save_savedmodel'):
+                save_savedmodel(obj, savedmodel_dir)
+            print_success("SavedModel saved")
+            _cache_store(cache, keys, 'b.savedmodel', savedmodel_dir)
         
         # Convert to TFLite
         print_info("Converting SavedModel → TFLite...")
-        converter = tf.lite.TFLiteConverter.from_saved_model(savedmodel_dir)
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        tflite_model = converter.convert()
+        if quant and quant.get('sweep'):
+            with PROFILER.stage('quantization_sweep'):
+                quantization_sweep(tf, savedmodel_dir, METHOD_B_TFLITE_SETTINGS, quant, assets_dir)
+        tflite_model = convert_savedmodel(tf, savedmodel_dir, METHOD_B_TFLITE_SETTINGS, quant)
         
-        tflite_path = str(assets_dir / 'priority_classifier.tflite')
         with open(tflite_path, 'wb') as f:
             f.write(tflite_model)
+        _cache_store(cache, keys, 'b.tflite', tflite_path)
         
         size_mb = Path(tflite_path).stat().st_size / (1024 * 1024)
         print_success(f"TFLite created: {tflite_path} ({size_mb:.2f} MB)")
@@ -280,83 +742,123 @@ def method_b_keras_to_tflite(pkl_path, assets_dir):
         return False, None, str(e)
 
 
-def method_c_synthetic_fallback(n_features, assets_dir):
+def method_c_synthetic_fallback(n_features, assets_dir, cache=None, keys=None, check_deps=True,
+                                quant=None, distill=None):
     """
     METHOD C: Create a synthetic fallback TFLite model.
     This ensures the app can run even if the original model cannot be converted.
+    With distill ({'pkl_path', 'corpus', 'settings'}) the model is a student
+    trained on the pickled model's predictions instead (see distill.py).
     Returns (success: bool, tflite_path: str or None, error_msg: str or None)
     """
-    print_step(3, "Creating synthetic fallback TFLite model")
+    if distill:
+        print_step(3, "Distilling the pickled model into a student TFLite model")
+    else:
+        print_step(3, "Creating synthetic fallback TFLite model")
     
-    deps_needed = {
-        'tensorflow': 'tensorflow',
-        'numpy': 'numpy',
-    }
+    tflite_path = str(assets_dir / 'priority_classifier.tflite')
     
-    deps = check_dependencies(deps_needed)
+    # A sweep needs the SavedModel, so it bypasses the final-stage cache
+    cached = None if quant and quant.get('sweep') else _cache_lookup(cache, keys, 'c.tflite')
+    if cached:
+        cache.restore(cached, tflite_path)
+        if distill:
+            print_success(f"Student TFLite restored from cache: {tflite_path}")
+        else:
+            print_success(f"Fallback TFLite restored from cache: {tflite_path}")
+            print_warning("NOTE: This is a synthetic model trained on random data.")
+        return True, tflite_path, None
     
-    if not all(deps.values()):
-        print_error("Cannot create fallback: TensorFlow/NumPy required")
-        return False, None, "TensorFlow/NumPy not available"
+    if check_deps:
+        deps = check_dependencies(METHOD_C_DEPS)
+        
+        if not all(deps.values()):
+            print_error("Cannot create fallback: TensorFlow/NumPy required")
+            return False, None, "TensorFlow/NumPy not available"
     
     try:
-        import tensorflow as tf
-        import numpy as np
-        
-        print_info(f"Creating synthetic Keras model with {n_features} input features")
-        
-        # Build a simple dense model
-        model = tf.keras.Sequential([
-            tf.keras.layers.Input(shape=(n_features,)),
-            tf.keras.layers.Dense(64, activation='relu'),
-            tf.keras.layers.Dropout(0.2),
-            tf.keras.layers.Dense(32, activation='relu'),
-            tf.keras.layers.Dropout(0.2),
-            tf.keras.layers.Dense(1, activation='sigmoid'),  # Output: 0-1 score
-        ])
-        
-        print_info(f"Model summary:")
-        model.summary()
-        
-        # Compile and train on synthetic data
-        model.compile(loss='mse', optimizer='adam', metrics=['mae'])
-        
-        print_info("Training on synthetic data (500 examples, 5 epochs)...")
-        X_synthetic = np.random.randn(500, n_features).astype(np.float32)
-        y_synthetic = np.random.rand(500, 1).astype(np.float32)
+        with PROFILER.stage('imports'):
+            import tensorflow as tf
+            import numpy as np
         
-        model.fit(
-            X_synthetic, y_synthetic,
-            epochs=5,
-            batch_size=32,
-            verbose=0,
-        )
+        holdout = None
+        if distill:
+            from distill import distill as distill_student, print_report
+            
+            print_info(f"Teacher: {distill['pkl_path']}, corpus: {distill['corpus']}")
+            with PROFILER.stage('distill'):
+                model, featurizer, report, holdout = distill_student(
+                    distill['pkl_path'], distill['corpus'], distill['settings'],
+                )
+            print_report(report)
+            if quant is not None:
+                # int8 calibrates on student features, not the pkl's vectorizer output
+                quant.setdefault('_features', {})[featurizer.width] = (
+                    holdout['features'], holdout['labels'],
+                )
+        else:
+            print_info(f"Creating synthetic Keras model with {n_features} input features")
+            
+            # Build a simple dense model
+            model = tf.keras.Sequential([
+                tf.keras.layers.Input(shape=(n_features,)),
+                tf.keras.layers.Dense(64, activation='relu'),
+                tf.keras.layers.Dropout(0.2),
+                tf.keras.layers.Dense(32, activation='relu'),
+                tf.keras.layers.Dropout(0.2),
+                tf.keras.layers.Dense(1, activation='sigmoid'),  # Output: 0-1 score
+            ])
+            
+            print_info(f"Model summary:")
+            model.summary()
+            
+            # Compile and train on synthetic data
+            model.compile(loss='mse', optimizer='adam', metrics=['mae'])
+            
+            print_info("Training on synthetic data (500 examples, 5 epochs)...")
+            X_synthetic = np.random.randn(500, n_features).astype(np.float32)
+            y_synthetic = np.random.rand(500, 1).astype(np.float32)
+            
+            with PROFILER.stage('model.fit'):
+                model.fit(
+                    X_synthetic, y_synthetic,
+                    epochs=5,
+                    batch_size=32,
+                    verbose=0,
+                )
         print_success("Training complete")
         
         # Save as SavedModel
         savedmodel_dir = str(assets_dir.parent / 'tmp_savedmodel_fallback')
         print_info(f"Saving as SavedModel...")
-        model.save(savedmodel_dir)
+        with PROFILER.stage('save_savedmodel'):
+            save_savedmodel(model, savedmodel_dir)
         
         # Convert to TFLite
         print_info("Converting to TFLite...")
-        converter = tf.lite.TFLiteConverter.from_saved_model(savedmodel_dir)
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        converter.target_spec.supported_ops = [
-            tf.lite.OpsSet.TFLITE_BUILTINS,
-            tf.lite.OpsSet.SELECT_TF_OPS,
-        ]
-        tflite_model = converter.convert()
+        if quant and quant.get('sweep'):
+            with PROFILER.stage('quantization_sweep'):
+                quantization_sweep(tf, savedmodel_dir, METHOD_C_TFLITE_SETTINGS, quant, assets_dir)
+        tflite_model = convert_savedmodel(tf, savedmodel_dir, METHOD_C_TFLITE_SETTINGS, quant)
         
-        tflite_path = str(assets_dir / 'priority_classifier.tflite')
         with open(tflite_path, 'wb') as f:
             f.write(tflite_model)
+        _cache_store(cache, keys, 'c.tflite', tflite_path)
         
         size_mb = Path(tflite_path).stat().st_size / (1024 * 1024)
-        print_success(f"Fallback TFLite created: {tflite_path} ({size_mb:.2f} MB)")
-        print_warning("NOTE: This is a synthetic model trained on random data.")
-        print_warning("      The actual priority predictions may not be accurate.")
-        print_warning("      Replace with real conversion if possible.")
+        if distill:
+            # The converted (possibly quantized) student against the teacher
+            outputs, latencies = _run_tflite_rows(tf, np, tflite_model, holdout['features'])
+            agreement = float((outputs.argmax(1) == holdout['teacher_proba'].argmax(1)).mean())
+            print_success(f"Student TFLite created: {tflite_path} ({size_mb:.2f} MB)")
+            print_info(f"TFLite agreement with teacher: {agreement:.2%} on "
+                       f"{len(outputs)} held-out emails, "
+                       f"p50 invoke {np.percentile(latencies, 50) * 1000:.1f} µs")
+        else:
+            print_success(f"Fallback TFLite created: {tflite_path} ({size_mb:.2f} MB)")
+            print_warning("NOTE: This is a synthetic model trained on random data.")
+            print_warning("      The actual priority predictions may not be accurate.")
+            print_warning("      Replace with real conversion if possible.")
         
         # Cleanup
         if os.path.exists(savedmodel_dir):
@@ -369,9 +871,561 @@ def method_c_synthetic_fallback(n_features, assets_dir):
         return False, None, str(e)
 
 
-def validate_tflite(tflite_path):
+def prune_vocabulary(pkl_path, assets_dir, top_k=None, fraction=None):
+    """
+    Pruning stage: rewrite the pipeline keeping only high-weight terms.
+    Returns (success: bool, pruned_pkl_path: str or None, error_msg: str or None)
+    """
+    print_step(0, "Pruning vocabulary by classifier weight")
+    
+    try:
+        import joblib
+        from vocab_pruning import prune
+        
+        with PROFILER.stage('joblib.load'):
+            model = joblib.load(pkl_path)
+        with PROFILER.stage('prune', top_k=top_k, fraction=fraction):
+            pruned = prune(model, top_k=top_k, fraction=fraction)
+        
+        pruned_path = str(assets_dir.parent / 'priority_classifier.pruned.pkl')
+        joblib.dump(pruned, pruned_path)
+        
+        n_before = len(model.steps[0][1].vocabulary_)
+        n_after = len(pruned.steps[0][1].vocabulary_)
+        print_success(f"Kept {n_after} of {n_before} terms: {pruned_path}")
+        return True, pruned_path, None
+        
+    except Exception as e:
+        print_error(f"Pruning failed: {str(e)}")
+        return False, None, str(e)
+
+
+# Short emails used to check exported artifacts against the pickled model
+PARITY_SAMPLES = [
+    'Welcome to MailMind. Get started with intelligent email prioritization',
+    'Project Deadline: Q1 Report Due. Please submit the quarterly report by Friday EOD',
+    'Meeting Confirmation: Monday 2 PM. Confirming our meeting to discuss the new strategy',
+    'Newsletter: Flutter 3.16 Released. Discover what is new in Flutter 3.16',
+    'Action Required: Please Review. Your feedback is requested on the design proposal',
+    'Weekly Team Sync. Summary of this week accomplishments and next steps',
+    'URGENT: your account password expires today, verify immediately',
+    'Limited time offer! 50% off everything, unsubscribe at any time',
+    '',
+]
+
+
+def method_tfidf_artifact(pkl_path, assets_dir):
+    """
+    Export the TfidfVectorizer pipeline to a memory-mapped scoring artifact.
+    Returns (success: bool, artifact_path: str or None, error_msg: str or None)
+    """
+    print_step(1, "Exporting TF-IDF pipeline → memory-mapped artifact")
+
+    deps_needed = {
+        'joblib': 'joblib',
+        'numpy': 'numpy',
+        'sklearn': 'scikit-learn',
+    }
+
+    deps = check_dependencies(deps_needed)
+
+    if not all(deps.values()):
+        return False, None, "Missing dependencies for TF-IDF export"
+
+    try:
+        import joblib
+        import numpy as np
+        from tfidf_artifact import export_artifact, TfidfArtifactScorer
+
+        print_info(f"Loading pickle from {pkl_path}")
+        with PROFILER.stage('joblib.load'):
+            model = joblib.load(pkl_path)
+        print_success(f"Loaded model type: {type(model).__name__}")
+
+        artifact_path = str(assets_dir / 'priority_classifier.tfidf')
+        with PROFILER.stage('export_artifact'):
+            size = export_artifact(model, artifact_path)
+        print_success(f"Artifact created: {artifact_path} ({size / 1024:.1f} KB)")
+
+        # Check the NumPy scorer reproduces predict_proba
+        with PROFILER.stage('parity'):
+            scorer = TfidfArtifactScorer(artifact_path)
+            expected = model.predict_proba(PARITY_SAMPLES)
+            actual = scorer.predict_proba(PARITY_SAMPLES)
+        max_diff = float(np.abs(expected - actual).max())
+        if max_diff > 1e-4:
+            raise ValueError(f"Artifact disagrees with predict_proba (max diff {max_diff:.2e})")
+        print_success(f"Scorer matches predict_proba (max diff {max_diff:.2e})")
+
+        return True, artifact_path, None
+
+    except Exception as e:
+        print_error(f"TF-IDF export failed: {str(e)}")
+        return False, None, str(e)
+
+
+METHOD_SPARSE_TFLITE_SETTINGS = {
+    'optimizations': [],
+    'supported_ops': ['TFLITE_BUILTINS'],
+}
+
+
+def sparse_inputs(analyzer, vocabulary, text):
+    """
+    Token ids and term counts for one email, as the sparse model expects.
+    Returns (token_ids int32 [n], weights float32 [n]).
+    """
+    import numpy as np
+
+    counts = {}
+    for term in analyzer(text):
+        idx = vocabulary.get(term)
+        if idx is not None:
+            counts[idx] = counts.get(idx, 0) + 1
+    token_ids = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return token_ids, weights
+
+
+def find_sparse_inputs(input_details):
+    """
+    (token_ids detail, weights detail) for a sparse model, or None for a
+    dense [1, n_features] model.
+    """
+    import numpy as np
+
+    if len(input_details) != 2:
+        return None
+    ids = [d for d in input_details if d['dtype'] == np.int32]
+    weights = [d for d in input_details if d['dtype'] == np.float32]
+    if len(ids) != 1 or len(weights) != 1:
+        return None
+    return ids[0], weights[0]
+
+
+def run_sparse(interpreter, token_ids, weights):
+    """Resize, feed and invoke a sparse model; returns the output array."""
+    ids_detail, weights_detail = find_sparse_inputs(interpreter.get_input_details())
+    interpreter.resize_tensor_input(ids_detail['index'], [len(token_ids)])
+    interpreter.resize_tensor_input(weights_detail['index'], [len(weights)])
+    interpreter.allocate_tensors()
+    interpreter.set_tensor(ids_detail['index'], token_ids)
+    interpreter.set_tensor(weights_detail['index'], weights)
+    interpreter.invoke()
+    return interpreter.get_tensor(interpreter.get_output_details()[0]['index'])
+
+
+def build_sparse_module(tf, vectorizer, estimator):
+    """
+    tf.Module scoring one email from (token_ids, term counts): gathers idf and
+    per-class weights for just those ids, so cost scales with email length.
+    """
+    import numpy as np
+    from tfidf_artifact import extract_linear_head
+
+    coef, intercept, link = extract_linear_head(estimator)
+    idf = np.asarray(vectorizer.idf_ if vectorizer.use_idf else np.ones(coef.shape[1]),
+                     dtype=np.float32)
+    sublinear = bool(vectorizer.sublinear_tf)
+    binary = bool(vectorizer.binary)
+    norm = vectorizer.norm
+
+    class SparseScorer(tf.Module):
+        def __init__(self):
+            super().__init__()
+            self.idf = tf.constant(idf)
+            self.coef = tf.constant(np.ascontiguousarray(coef.T, dtype=np.float32))
+            self.intercept = tf.constant(np.asarray(intercept, dtype=np.float32))
+
+        @tf.function(input_signature=[
+            tf.TensorSpec([None], tf.int32, name='token_ids'),
+            tf.TensorSpec([None], tf.float32, name='weights'),
+        ])
+        def score(self, token_ids, weights):
+            tf_weights = weights
+            if binary:
+                tf_weights = tf.minimum(tf_weights, 1.0)
+            elif sublinear:
+                tf_weights = 1.0 + tf.math.log(tf_weights)
+            values = tf_weights * tf.gather(self.idf, token_ids)
+            if norm == 'l2':
+                values = values / tf.maximum(tf.sqrt(tf.reduce_sum(values * values)), 1e-12)
+            elif norm == 'l1':
+                values = values / tf.maximum(tf.reduce_sum(tf.abs(values)), 1e-12)
+            logits = tf.reduce_sum(
+                tf.gather(self.coef, token_ids) * tf.expand_dims(values, 1), axis=0
+            ) + self.intercept
+            if link == 'logistic':
+                positive = tf.sigmoid(logits)
+                probs = tf.concat([1.0 - positive, positive], axis=0)
+            else:
+                probs = tf.nn.softmax(logits)
+            return {'probabilities': tf.expand_dims(probs, 0)}
+
+    return SparseScorer()
+
+
+def method_sparse_tflite(pkl_path, assets_dir, quant=None):
+    """
+    Export the TF-IDF pipeline as a TFLite model over sparse token inputs.
+    Writes priority_classifier.tflite plus priority_classifier.vocab.json
+    (analyzer settings and term → id map for the app's tokenizer).
+    Returns (success: bool, tflite_path: str or None, error_msg: str or None)
+    """
+    import json
+
+    print_step(1, "Exporting TF-IDF pipeline → sparse token-id TFLite")
+
+    deps = check_dependencies({
+        'joblib': 'joblib',
+        'numpy': 'numpy',
+        'sklearn': 'scikit-learn',
+        'tensorflow': 'tensorflow',
+    })
+    if not all(deps.values()):
+        return False, None, "Missing dependencies for sparse export"
+
+    quant = quant or {}
+    mode = quant.get('mode', 'none')
+    if mode == 'int8':
+        return False, None, "int8 is not supported for the sparse model (use none, dynamic or float16)"
+
+    try:
+        with PROFILER.stage('imports'):
+            import joblib
+            import numpy as np
+            import tensorflow as tf
+            from tfidf_artifact import split_pipeline
+
+        print_info(f"Loading pickle from {pkl_path}")
+        with PROFILER.stage('joblib.load'):
+            model = joblib.load(pkl_path)
+        vectorizer, estimator = split_pipeline(model)
+        print_success(f"Vocabulary: {len(vectorizer.vocabulary_)} terms, "
+                      f"classes: {estimator.classes_.tolist()}")
+
+        with PROFILER.stage('build_sparse_module'):
+            module = build_sparse_module(tf, vectorizer, estimator)
+            concrete = module.score.get_concrete_function()
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], module)
+        apply_tflite_settings(
+            converter,
+            quantized_settings(METHOD_SPARSE_TFLITE_SETTINGS, mode, quant.get('ops', 'auto')), tf,
+        )
+        with PROFILER.stage('TFLiteConverter.convert', quantize=mode):
+            tflite_model = converter.convert()
+
+        tflite_path = str(assets_dir / 'priority_classifier.tflite')
+        with open(tflite_path, 'wb') as f:
+            f.write(tflite_model)
+        print_success(f"Sparse TFLite created: {tflite_path} ({len(tflite_model) / 1024:.1f} KB)")
+
+        vocab_path = assets_dir / 'priority_classifier.vocab.json'
+        vocab_path.write_text(json.dumps({
+            'token_pattern': vectorizer.token_pattern,
+            'lowercase': bool(vectorizer.lowercase),
+            'ngram_range': list(vectorizer.ngram_range),
+            'stop_words': sorted(vectorizer.get_stop_words() or []),
+            'classes': [c.item() if hasattr(c, 'item') else c for c in estimator.classes_],
+            'inputs': {'token_ids': 'int32 [n] vocabulary ids', 'weights': 'float32 [n] term counts'},
+            'vocabulary': {term: int(idx) for term, idx in sorted(vectorizer.vocabulary_.items())},
+        }, ensure_ascii=False))
+        print_success(f"Vocabulary written: {vocab_path}")
+
+        # Parity against the pickled pipeline
+        with PROFILER.stage('parity'):
+            interpreter = tf.lite.Interpreter(model_content=tflite_model)
+            analyzer = vectorizer.build_analyzer()
+            expected = model.predict_proba(PARITY_SAMPLES)
+            max_diff = 0.0
+            for text, row in zip(PARITY_SAMPLES, expected):
+                token_ids, weights = sparse_inputs(analyzer, vectorizer.vocabulary_, text)
+                if len(token_ids) == 0:
+                    continue
+                output = run_sparse(interpreter, token_ids, weights)
+                max_diff = max(max_diff, float(np.abs(output[0] - row).max()))
+        tolerance = 1e-4 if mode == 'none' else 2e-2
+        if max_diff > tolerance:
+            raise ValueError(f"Sparse model disagrees with predict_proba (max diff {max_diff:.2e})")
+        print_success(f"Sparse model matches predict_proba (max diff {max_diff:.2e})")
+
+        return True, tflite_path, None
+
+    except Exception as e:
+        print_error(f"Sparse export failed: {str(e)}")
+        return False, None, str(e)
+
+
+METHOD_ORT_DEPS = {
+    'joblib': 'joblib',
+    'numpy': 'numpy',
+    'skl2onnx': 'skl2onnx',
+    'onnxruntime': 'onnxruntime',
+}
+
+# ORT_ENABLE_EXTENDED fuses nodes for the CPU execution provider, which is the
+# only provider the desktop build uses; the saved .ort is tied to it
+ORT_OPTIMIZATION_LEVEL = 'ORT_ENABLE_EXTENDED'
+
+# Locale of the in-graph StringNormalizer (lowercasing). skl2onnx defaults to
+# en_US.UTF-8, which minimal Linux installs lack; C.UTF-8 is always present
+ORT_LOCALE = 'C.UTF-8'
+
+# Parity gate for --target ort: largest per-class probability difference from
+# predict_proba allowed on the validation emails
+ORT_TOLERANCE = 1e-4
+
+# skl2onnx turns token patterns into the ASCII-only [a-zA-Z0-9_]+ and keeps
+# 1-character tokens. onnxruntime's Tokenizer uses RE2, where Python's
+# Unicode \w is [\p{L}\p{N}_]
+ORT_TOKEN_PATTERNS = {
+    r'(?u)\b\w\w+\b': r'[\p{L}\p{N}_]{2,}',
+}
+
+
+def patch_ort_tokenizer(onnx_model, vectorizer):
+    """
+    Make skl2onnx's string graph tokenize like the vectorizer's analyzer:
+    a Unicode token pattern, and stop words dropped before n-grams are formed
+    (skl2onnx only leaves them out of the vocabulary, so bigrams that sklearn
+    forms across a stop word are missed). Stop words are moved to the end of
+    each row of the [rows, tokens] Tokenizer output with a TopK on
+    (is_stop_word * tokens + position); no vocabulary n-gram contains one.
+    The in-graph lowercasing maps one character to one character ('İ' → 'i'),
+    unlike str.lower(); load_backend('ort') lowercases before scoring.
+    """
+    from onnx import helper, TensorProto
+
+    graph = onnx_model.graph
+    index, tokenizer = next((i, n) for i, n in enumerate(graph.node) if n.op_type == 'Tokenizer')
+    pattern = ORT_TOKEN_PATTERNS.get(vectorizer.token_pattern)
+    if pattern is None:
+        print_warning(f"No RE2 equivalent for token_pattern {vectorizer.token_pattern!r}; "
+                      f"keeping the skl2onnx tokenizer")
+    else:
+        for attr in tokenizer.attribute:
+            if attr.name == 'tokenexp':
+                attr.s = pattern.encode('utf-8')
+
+    stop_words = sorted(vectorizer.get_stop_words() or [])
+    if not stop_words:
+        return
+    tokens = tokenizer.output[0]
+    compact = tokens + '_no_stop_words'
+    for node in graph.node[index + 1:]:
+        for i, name in enumerate(node.input):
+            if name == tokens:
+                node.input[i] = compact
+
+    def name(suffix):
+        return f"{tokens}_{suffix}"
+
+    graph.initializer.extend([
+        helper.make_tensor(name('zero'), TensorProto.INT64, [], [0]),
+        helper.make_tensor(name('one'), TensorProto.INT64, [], [1]),
+        helper.make_tensor(name('minus_one'), TensorProto.INT64, [], [-1]),
+        helper.make_tensor(name('axis'), TensorProto.INT64, [1], [1]),
+    ])
+    nodes = [
+        helper.make_node('Shape', [tokens], [name('shape')]),
+        helper.make_node('Gather', [name('shape'), name('one')], [name('width')]),
+        helper.make_node('Gather', [name('shape'), name('axis')], [name('k')]),
+        helper.make_node('Range', [name('zero'), name('width'), name('one')], [name('position')]),
+        # ai.onnx.ml LabelEncoder v1: index in classes_strings, default_int64 otherwise
+        helper.make_node('LabelEncoder', [tokens], [name('stop_index')], domain='ai.onnx.ml',
+                         classes_strings=stop_words, default_int64=-1),
+        helper.make_node('Greater', [name('stop_index'), name('minus_one')], [name('is_stop')]),
+        helper.make_node('Cast', [name('is_stop')], [name('stop')], to=TensorProto.INT64),
+        helper.make_node('Mul', [name('stop'), name('width')], [name('stop_rank')]),
+        helper.make_node('Add', [name('stop_rank'), name('position')], [name('order_key')]),
+        helper.make_node('TopK', [name('order_key'), name('k')], [name('ordered'), name('order')],
+                         axis=1, largest=0, sorted=1),
+        helper.make_node('GatherElements', [tokens, name('order')], [compact], axis=1),
+    ]
+    for offset, node in enumerate(nodes, 1):
+        graph.node.insert(index + offset, node)
+
+
+def _time_backend(score, texts, chunk_size=256, single=200):
+    """
+    Time a benchmark_backends scorer on texts.
+    Returns (probabilities [n, k], rows/sec batched, p50 ms for one text per call).
+    """
+    import time
+    import numpy as np
+
+    outputs = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), chunk_size):
+        outputs.append(np.asarray(score(texts[i:i + chunk_size])))
+    elapsed = time.perf_counter() - start
+
+    latencies = []
+    for text in texts[:single]:
+        start = time.perf_counter()
+        score([text])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    rows_per_sec = len(texts) / elapsed if elapsed > 0 else None
+    return np.concatenate(outputs), rows_per_sec, float(np.percentile(latencies, 50))
+
+
+def method_onnx_runtime(pkl_path, assets_dir, corpus=None):
+    """
+    Convert the whole pipeline, TF-IDF included, to ONNX with a string input,
+    optimize it offline with ONNX Runtime and save it in ORT format.
+    No TensorFlow or onnx-tf involved. Validates a batched onnxruntime session
+    against predict_proba (max probability difference ORT_TOLERANCE; input is
+    lowercased with str.lower() first, see patch_ort_tokenizer) and, when a
+    dense TFLite model is already in assets/models, compares inference speed
+    with it.
+    Writes priority_classifier.ort and priority_classifier.ort.json (report).
+    Returns (success: bool, ort_path: str or None, error_msg: str or None)
+    """
+    import json
+    import time
+
+    print_step(1, "Converting scikit-learn pipeline → ONNX → ORT format")
+
+    deps = check_dependencies(METHOD_ORT_DEPS)
+    if not all(deps.values()):
+        return False, None, "Missing dependencies for the ONNX Runtime export"
+
+    try:
+        with PROFILER.stage('imports'):
+            import joblib
+            import numpy as np
+            import onnxruntime as ort
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import StringTensorType
+            from tfidf_artifact import split_pipeline
+            from benchmark_backends import load_backend, BackendSkipped
+            from email_corpus import load_texts
+
+        conversion = {}
+        print_info(f"Loading pickle from {pkl_path}")
+        start = time.perf_counter()
+        with PROFILER.stage('joblib.load'):
+            model = joblib.load(pkl_path)
+        conversion['joblib.load'] = time.perf_counter() - start
+        vectorizer, estimator = split_pipeline(model)
+
+        # One string per row; tokenizing and TF-IDF run inside the graph
+        print_info("Converting to ONNX (string input)...")
+        start = time.perf_counter()
+        with PROFILER.stage('convert_sklearn'):
+            onnx_model = convert_sklearn(
+                model,
+                initial_types=[('input', StringTensorType([None, 1]))],
+                options={
+                    type(estimator): {'zipmap': False},
+                    type(vectorizer): {'locale': ORT_LOCALE},
+                },
+            )
+        patch_ort_tokenizer(onnx_model, vectorizer)
+        conversion['convert_sklearn'] = time.perf_counter() - start
+
+        onnx_path = str(assets_dir.parent / 'priority_classifier.string.onnx')
+        with open(onnx_path, 'wb') as f:
+            f.write(onnx_model.SerializeToString())
+
+        # Creating a session with optimized_model_filepath runs the offline
+        # optimizer and serializes the result
+        print_info(f"Optimizing with ONNX Runtime ({ORT_OPTIMIZATION_LEVEL}) → ORT format...")
+        ort_path = str(assets_dir / 'priority_classifier.ort')
+        options = ort.SessionOptions()
+        options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, ORT_OPTIMIZATION_LEVEL)
+        options.optimized_model_filepath = ort_path
+        options.add_session_config_entry('session.save_model_format', 'ORT')
+        start = time.perf_counter()
+        with PROFILER.stage('ort.optimize'):
+            ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        conversion['ort.optimize'] = time.perf_counter() - start
+        os.remove(onnx_path)
+
+        size_kb = Path(ort_path).stat().st_size / 1024
+        print_success(f"ORT model created: {ort_path} ({size_kb:.1f} KB) "
+                      f"in {sum(conversion.values()):.2f}s")
+
+        # Validate a batched session on the saved .ort file
+        texts = load_texts(corpus, limit=2000)[0] if corpus else list(PARITY_SAMPLES)
+        source = corpus or 'built-in samples'
+        print_info(f"Validating on {len(texts)} emails from {source}")
+        with PROFILER.stage('parity'):
+            expected = model.predict_proba(texts)
+            score = load_backend('ort', ort_path, model)
+            actual, rows_per_sec, p50_ms = _time_backend(score, texts)
+        row_diff = np.abs(expected - actual).max(axis=1)
+        max_diff = float(row_diff.max())
+        agreement = float((expected.argmax(1) == actual.argmax(1)).mean())
+        print_info(f"ORT vs predict_proba: agreement {agreement:.2%}, max diff {max_diff:.2e}")
+        drifted = int((row_diff > ORT_TOLERANCE).sum())
+        if drifted:
+            worst = texts[int(row_diff.argmax())]
+            os.remove(ort_path)
+            raise ValueError(
+                f"ORT model differs from predict_proba by more than {ORT_TOLERANCE:g} on "
+                f"{drifted} emails (max {max_diff:.2e}, e.g. {worst[:60]!r})"
+            )
+
+        _, pickle_rows, pickle_p50 = _time_backend(model.predict_proba, texts)
+        report = {
+            'optimization_level': ORT_OPTIMIZATION_LEVEL,
+            'conversion_s': {stage: round(t, 4) for stage, t in conversion.items()},
+            'validation': {
+                'source': source,
+                'rows': len(texts),
+                'agreement': round(agreement, 4),
+                'max_abs_diff': max_diff,
+                'tolerance': ORT_TOLERANCE,
+            },
+            'input': {
+                'lowercase': bool(vectorizer.lowercase),
+                'note': 'lowercase with full Unicode case mapping (str.lower) before scoring',
+            },
+            'inference': {
+                'pickle': {'rows_per_sec': round(pickle_rows, 1), 'p50_ms': round(pickle_p50, 4)},
+                'ort': {'rows_per_sec': round(rows_per_sec, 1), 'p50_ms': round(p50_ms, 4),
+                        'size_kb': round(size_kb, 1)},
+            },
+        }
+
+        tflite_path = assets_dir / 'priority_classifier.tflite'
+        if tflite_path.exists():
+            try:
+                with PROFILER.stage('tflite comparison'):
+                    tflite_score = load_backend('tflite', str(tflite_path), model)
+                    _, tflite_rows, tflite_p50 = _time_backend(tflite_score, texts)
+            except BackendSkipped as e:
+                print_info(f"TFLite comparison skipped: {e}")
+            else:
+                report['inference']['tflite'] = {
+                    'rows_per_sec': round(tflite_rows, 1), 'p50_ms': round(tflite_p50, 4),
+                    'size_kb': round(tflite_path.stat().st_size / 1024, 1),
+                }
+
+        print_info(f"{'backend':<8} {'rows/s':>10} {'p50 ms':>8}")
+        for name, row in report['inference'].items():
+            print_info(f"{name:<8} {row['rows_per_sec']:>10,.0f} {row['p50_ms']:>8.4f}")
+
+        report_path = assets_dir / 'priority_classifier.ort.json'
+        report_path.write_text(json.dumps(report, indent=2))
+        print_success(f"ORT report: {report_path}")
+
+        return True, ort_path, None
+
+    except Exception as e:
+        print_error(f"ONNX Runtime export failed: {str(e)}")
+        return False, None, str(e)
+
+
+def validate_tflite(tflite_path, fuzz=None, runtime_name=None):
     """
     Validate the generated TFLite by loading it and running inference.
+    With fuzz ({'rows', 'budget_s', 'monotonic'}) dense models are also
+    streamed large generated batches and fail on any broken invariant
+    (see tflite_fuzz.py). The interpreter comes from the lightest installed
+    runtime, or the TensorFlow already imported by a conversion
+    (see lite_runtime.py).
     Returns (success: bool, details: dict)
     """
     print_step(4, "Validating TFLite model")
@@ -384,12 +1438,11 @@ def validate_tflite(tflite_path):
         'inference_ok': False,
         'output_shape': None,
         'output_range': None,
+        'fuzz': None,
+        'runtime': None,
     }
     
     try:
-        import tensorflow as tf
-        import numpy as np
-        
         tflite_file = Path(tflite_path)
         if not tflite_file.exists():
             print_error(f"TFLite file not found: {tflite_path}")
@@ -401,8 +1454,11 @@ def validate_tflite(tflite_path):
         
         # Load interpreter
         print_info("Loading TFLite interpreter...")
-        interpreter = tf.lite.Interpreter(model_path=tflite_path)
-        interpreter.allocate_tensors()
+        with PROFILER.stage('Interpreter.allocate_tensors'):
+            runtime, interpreter = open_interpreter(tflite_path, runtime_name)
+        details['runtime'] = runtime.as_dict()
+        print_info(f"Runtime {runtime.summary()}")
+        import numpy as np
         details['loaded'] = True
         print_success("Interpreter loaded successfully")
         
@@ -410,19 +1466,28 @@ def validate_tflite(tflite_path):
         input_details = interpreter.get_input_details()
         output_details = interpreter.get_output_details()
         
-        print_info(f"Input shape: {input_details[0]['shape']}")
+        for detail in input_details:
+            print_info(f"Input {detail['name']}: shape {detail['shape_signature']}, "
+                       f"dtype {detail['dtype'].__name__}")
         print_info(f"Output shape: {output_details[0]['shape']}")
         
         details['interpreter_ok'] = True
         
         # Run dummy inference
         print_info("Running dummy inference...")
-        n_features = input_details[0]['shape'][1]
-        dummy_input = np.random.randn(1, n_features).astype(np.float32)
-        
-        interpreter.set_tensor(input_details[0]['index'], dummy_input)
-        interpreter.invoke()
-        output_data = interpreter.get_tensor(output_details[0]['index'])
+        with PROFILER.stage('invoke'):
+            if find_sparse_inputs(input_details):
+                # Sparse model: a handful of token ids with unit counts
+                token_ids = np.arange(4, dtype=np.int32)
+                weights = np.ones(4, dtype=np.float32)
+                output_data = run_sparse(interpreter, token_ids, weights)
+            else:
+                n_features = input_details[0]['shape'][1]
+                dummy_input = np.random.randn(1, n_features).astype(np.float32)
+                
+                interpreter.set_tensor(input_details[0]['index'], dummy_input)
+                interpreter.invoke()
+                output_data = interpreter.get_tensor(output_details[0]['index'])
         
         details['output_shape'] = list(output_data.shape)
         details['output_range'] = (float(output_data.min()), float(output_data.max()))
@@ -432,17 +1497,56 @@ def validate_tflite(tflite_path):
         print_success(f"Output shape: {details['output_shape']}")
         print_success(f"Output range: {details['output_range'][0]:.4f} to {details['output_range'][1]:.4f}")
         
+        if fuzz and find_sparse_inputs(input_details):
+            print_info("Fuzzing skipped: sparse models score one email per invoke")
+        elif fuzz:
+            from tflite_fuzz import fuzz_dense, print_report
+            
+            print_info(f"Fuzzing with up to {fuzz['rows']:,} generated rows "
+                       f"({fuzz['budget_s']:g}s budget)...")
+            with PROFILER.stage('fuzz', rows=fuzz['rows']):
+                report = fuzz_dense(
+                    runtime, np, tflite_path, rows=fuzz['rows'], budget_s=fuzz['budget_s'],
+                    monotonic=fuzz.get('monotonic', False),
+                )
+            details['fuzz'] = report
+            print_report(report, indent='  ')
+            if report['failures']:
+                for failure in report['failures']:
+                    print_error(f"Invariant broken: {failure}")
+                return False, details
+            print_success("All fuzzing invariants hold")
+        
         return True, details
         
     except ImportError as e:
-        print_warning(f"TensorFlow not available for validation: {str(e)}")
-        print_info("Install TensorFlow to validate: pip install tensorflow")
+        print_warning(f"TFLite runtime not available for validation: {str(e)}")
         return True, details  # Not a hard failure
     except Exception as e:
         print_error(f"Validation failed: {str(e)}")
         return False, details
 
 
+def fuzz_settings(args, monotonic=False):
+    """validate_tflite fuzz settings from the command line, or None."""
+    if not args.fuzz:
+        return None
+    return {'rows': args.fuzz_rows, 'budget_s': args.fuzz_budget, 'monotonic': monotonic}
+
+
+def is_linear_model(pkl_path):
+    """
+    True when the pickled estimator's class scores are linear in its input
+    features (Naive Bayes, logistic regression), so converted outputs must be
+    monotonic along every feature.
+    """
+    import joblib
+    
+    model = joblib.load(pkl_path)
+    estimator = model.steps[-1][1] if hasattr(model, 'steps') else model
+    return hasattr(estimator, 'feature_log_prob_') or hasattr(estimator, 'coef_')
+
+
 def print_next_steps(tflite_path):
     """Print instructions for next steps."""
     print_step(5, "Next Steps")
@@ -462,8 +1566,196 @@ def print_next_steps(tflite_path):
     print_info("  flutter run -d <device-id>")
 
 
-def main():
-    """Main conversion pipeline."""
+# Strategy name → (priority, dependencies, default timeout in seconds).
+# Lower priority number wins when several strategies succeed.
+STRATEGIES = {
+    'A': (0, METHOD_A_DEPS, 900),
+    'B': (1, METHOD_B_DEPS, 600),
+    'C': (2, METHOD_C_DEPS, 600),
+}
+
+
+def _strategy_worker(name, pkl_path, n_features, work_dir, cache, keys, quant, distill, results,
+                     profile=False):
+    """Run one conversion method in a worker process and report its outcome."""
+    assets_dir = Path(work_dir) / 'models'
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    if profile:
+        PROFILER.start()
+    try:
+        with PROFILER.stage(f'method {name}'):
+            outcome = _run_strategy(name, pkl_path, n_features, assets_dir, cache, keys, quant,
+                                    distill)
+            PROFILER.annotate(success=outcome[0])
+    except BaseException as e:
+        outcome = (False, None, f"{type(e).__name__}: {e}")
+    events = cache.events if cache is not None else []
+    results.put((name, outcome, events, PROFILER.records))
+
+
+def _run_strategy(name, pkl_path, n_features, assets_dir, cache, keys, quant, distill=None):
+    """Call conversion method A, B or C as a race worker would."""
+    if name == 'A':
+        return method_a_sklearn_to_tflite(
+            pkl_path, n_features, assets_dir, keep_intermediates=True,
+            cache=cache, keys=keys, check_deps=False, quant=quant,
+        )
+    if name == 'B':
+        return method_b_keras_to_tflite(
+            pkl_path, assets_dir, cache=cache, keys=keys, check_deps=False, quant=quant,
+        )
+    return method_c_synthetic_fallback(
+        n_features, assets_dir, cache=cache, keys=keys, check_deps=False, quant=quant,
+        distill=distill,
+    )
+
+
+def race_strategies(pkl_path, n_features, assets_dir, timeouts, cache=None, keys=None,
+                    keep_intermediates=False, quant=None, distill=None):
+    """
+    Run every viable conversion method in its own process.
+
+    Dependencies are checked up front with find_spec. The highest-priority
+    method that succeeds wins as soon as every higher-priority method has
+    failed or timed out; the remaining workers are terminated.
+    Returns (success: bool, tflite_path: str or None, method: str or None,
+             error_msg: str or None)
+    """
+    import time
+    import queue
+    import multiprocessing
+
+    print_header("Racing Conversion Strategies")
+    
+    failures = {}
+    viable = []
+    for name, (_, deps, _) in sorted(STRATEGIES.items(), key=lambda kv: kv[1][0]):
+        missing = find_missing_dependencies(deps)
+        if missing:
+            failures[name] = f"Missing dependencies: {', '.join(missing)}"
+            print_warning(f"Method {name} skipped ({failures[name]})")
+        else:
+            viable.append(name)
+    
+    if not viable:
+        return False, None, None, '; '.join(f"{n}: {e}" for n, e in failures.items())
+    
+    # Spawn keeps TensorFlow state out of the parent and works on every OS
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    work_root = Path(tempfile.mkdtemp(prefix='convert_race_', dir=assets_dir.parent))
+    procs = {}
+    deadlines = {}
+    successes = {}
+    
+    try:
+        for name in viable:
+            work_dir = work_root / name
+            proc = ctx.Process(
+                target=_strategy_worker,
+                args=(name, pkl_path, n_features, str(work_dir), cache, keys, quant, distill,
+                      results, PROFILER.enabled),
+                daemon=True,
+            )
+            proc.start()
+            procs[name] = proc
+            deadlines[name] = time.monotonic() + timeouts[name]
+            print_info(f"Method {name} started (pid {proc.pid}, timeout {timeouts[name]}s)")
+        
+        pending = set(viable)
+        winner = None
+        while True:
+            # Winner: best-priority success with nothing better still running
+            for name in sorted(STRATEGIES, key=lambda n: STRATEGIES[n][0]):
+                if name in successes:
+                    winner = name
+                    break
+                if name in pending:
+                    break
+            if winner or not pending:
+                break
+            
+            try:
+                name, (success, path, error), events, records = results.get(timeout=0.25)
+            except queue.Empty:
+                pass
+            else:
+                pending.discard(name)
+                if cache is not None:
+                    cache.events.extend(events)
+                PROFILER.merge(records)
+                if success:
+                    successes[name] = path
+                    print_success(f"Method {name} finished")
+                else:
+                    failures[name] = error
+                    print_warning(f"Method {name} failed: {error}")
+            
+            now = time.monotonic()
+            for name in list(pending):
+                proc = procs[name]
+                if now > deadlines[name]:
+                    proc.terminate()
+                    pending.discard(name)
+                    failures[name] = f"Timed out after {timeouts[name]}s"
+                    print_warning(f"Method {name} timed out")
+                elif not proc.is_alive() and proc.exitcode not in (0, None):
+                    pending.discard(name)
+                    failures[name] = f"Worker exited with code {proc.exitcode}"
+                    print_warning(f"Method {name} crashed (exit code {proc.exitcode})")
+        
+        if not winner:
+            return False, None, None, '; '.join(f"{n}: {e}" for n, e in failures.items())
+        
+        for name in pending:
+            print_info(f"Cancelling method {name}")
+        
+        tflite_path = str(assets_dir / 'priority_classifier.tflite')
+        shutil.move(successes[winner], tflite_path)
+        keep = ['quantized']
+        if keep_intermediates:
+            keep += ['priority_classifier.onnx', 'tmp_savedmodel']
+        for item in keep:
+            src = work_root / winner / item
+            dest = assets_dir.parent / item
+            if src.exists():
+                if dest.is_dir():
+                    shutil.rmtree(dest)
+                elif dest.exists():
+                    dest.unlink()
+                shutil.move(str(src), str(dest))
+        print_success(f"Method {winner} selected: {tflite_path}")
+        return True, tflite_path, winner, None
+    
+    finally:
+        for proc in procs.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs.values():
+            proc.join(timeout=5)
+        shutil.rmtree(work_root, ignore_errors=True)
+
+
+def write_student_spec(distill, assets_dir):
+    """Write the input spec the app needs to feed a distilled method C model."""
+    from distill import SPEC_NAME, write_spec
+    
+    path = write_spec(distill['pkl_path'], distill['settings']['buckets'], assets_dir / SPEC_NAME)
+    print_success(f"Student feature spec: {path}")
+    return path
+
+
+def print_cache_report(cache):
+    """Print cache hits and misses per stage."""
+    print_header("Conversion Cache")
+    for stage, counts in sorted(cache.report().items()):
+        status = 'hit' if counts['hit'] else ('disabled' if counts['disabled'] else 'miss')
+        print_info(f"{stage:<14} {status}")
+    print_info(f"Cache directory: {cache.root}/")
+
+
+def build_parser():
+    """Command-line options of the converter (also used by convert_sweep.py)."""
     parser = argparse.ArgumentParser(
         description='Convert priority_classifier.pkl to TensorFlow Lite',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -479,11 +1771,181 @@ def main():
         default=32,
         help='Number of input features (default: 32, auto-detect if possible)',
     )
+    parser.add_argument(
+        '--target',
+        choices=['tflite', 'tfidf', 'sparse', 'ort'],
+        default='tflite',
+        help='Output format: tflite (default), tfidf memory-mapped artifact, '
+             'sparse token-id TFLite, or ort (ONNX Runtime, no TensorFlow)',
+    )
+    parser.add_argument(
+        '--prune-top-k',
+        type=int,
+        help='Keep only the K most decision-relevant vocabulary terms (see vocab_pruning.py)',
+    )
+    parser.add_argument(
+        '--prune-fraction',
+        type=float,
+        help='Keep the terms covering this fraction of total classifier weight',
+    )
+    parser.add_argument(
+        '--keep-intermediates',
+        action='store_true',
+        help='Keep priority_classifier.onnx and tmp_savedmodel/ (see benchmark_backends.py)',
+    )
+    parser.add_argument(
+        '--quantize',
+        choices=QUANTIZE_MODES,
+        default=None,
+        help='TFLite quantization: none, dynamic, float16 or int8 '
+             '(default: dynamic; none for --target sparse)',
+    )
+    parser.add_argument(
+        '--ops-set',
+        choices=OPS_SETS,
+        default='auto',
+        help='TFLite op sets: auto (each method\'s own), builtins (no Flex delegate) '
+             'or select (allow SELECT_TF_OPS)',
+    )
+    parser.add_argument(
+        '--quantize-sweep',
+        action='store_true',
+        help='Also build every quantize mode and report size, latency and accuracy delta',
+    )
+    parser.add_argument(
+        '--corpus',
+        help='Email corpus (JSONL) for int8 calibration, the quantization sweep, --distill '
+             'and --target ort validation',
+    )
+    parser.add_argument(
+        '--distill',
+        action='store_true',
+        help='Method C trains a student on the pkl\'s predictions over --corpus '
+             'instead of random data (see distill.py)',
+    )
+    parser.add_argument(
+        '--distill-buckets',
+        type=int,
+        default=512,
+        help='Hashed token buckets of the distilled student (default: 512)',
+    )
+    parser.add_argument(
+        '--parallel',
+        action='store_true',
+        help='Race all viable methods in worker processes; best-priority success wins',
+    )
+    parser.add_argument(
+        '--timeout',
+        type=int,
+        default=None,
+        help='Per-method timeout in seconds for --parallel (default: A 900, B 600, C 600)',
+    )
+    parser.add_argument(
+        '--fuzz',
+        action='store_true',
+        help='Validate with large generated batches (NaN/Inf, range, batch and '
+             'monotonicity invariants); fail the conversion if any breaks',
+    )
+    parser.add_argument(
+        '--fuzz-rows',
+        type=int,
+        default=200_000,
+        help='Generated rows for --fuzz (default: 200000)',
+    )
+    parser.add_argument(
+        '--fuzz-budget',
+        type=float,
+        default=30.0,
+        help='Time budget in seconds for --fuzz (default: 30)',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default='.convert_cache',
+        help='Directory for cached conversion stages (default: .convert_cache)',
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always rebuild every stage and do not write the cache',
+    )
+    parser.add_argument(
+        '--validate',
+        metavar='TFLITE',
+        help='Only validate an existing .tflite (no conversion, no TensorFlow import '
+             'when a lightweight runtime is installed)',
+    )
+    parser.add_argument(
+        '--runtime',
+        choices=RUNTIME_CHOICES,
+        help='Interpreter package for validation (default: $MAIL_MIND_TFLITE_RUNTIME or auto, '
+             'see lite_runtime.py)',
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Record wall/CPU time, RSS and tracemalloc peak of every stage',
+    )
+    parser.add_argument(
+        '--profile-output',
+        default='convert_profile.json',
+        help='Profile summary path; the Chrome trace is written next to it '
+             '(default: convert_profile.json)',
+    )
+    return parser
+
+
+def parse_args(argv=None):
+    """Parsed options with target-dependent defaults filled in."""
+    args = build_parser().parse_args(argv)
+    if args.quantize is None:
+        args.quantize = 'none' if args.target == 'sparse' else 'dynamic'
+    return args
+
+
+def main():
+    """Main conversion pipeline."""
+    args = parse_args()
     
-    args = parser.parse_args()
+    if not args.profile:
+        return run(args)
     
+    PROFILER.start()
+    try:
+        with PROFILER.stage('convert_model', target=args.target):
+            return run(args)
+    finally:
+        PROFILER.stop()
+        print_profile(PROFILER, args.profile_output)
+
+
+def print_profile(profiler, output):
+    """Print the slowest stages and write the JSON summary and Chrome trace."""
+    print_header("Stage Profile")
+    print(f"{'stage':<58} {'wall s':>8} {'cpu s':>8} {'rss MB':>8} {'py peak MB':>11}")
+    for row in profiler.summary():
+        name = '  ' * row['depth'] + row['name'] + (' ✗' if row['status'] == 'error' else '')
+        rss = '' if row['rss_mb'] is None else row['rss_mb']
+        print(f"{name[:58]:<58} {row['wall_s']:>8.2f} {row['cpu_s']:>8.2f} {rss:>8} "
+              f"{row['tracemalloc_peak_mb']:>11.1f}")
+    summary_path, trace_path = profiler.write(output)
+    print_success(f"Profile summary: {summary_path}")
+    print_success(f"Chrome trace: {trace_path} (open in chrome://tracing or ui.perfetto.dev)")
+
+
+def run(args):
+    """Conversion pipeline for parsed command-line arguments."""
+    LAST_RESULT.clear()
     print_header("Mail Mind: Priority Classifier TFLite Converter")
     
+    if args.validate:
+        with PROFILER.stage('validate_tflite'):
+            valid, details = validate_tflite(args.validate, fuzz_settings(args), args.runtime)
+        LAST_RESULT.update(path=args.validate, valid=valid, validation=details)
+        if not valid or not details['inference_ok']:
+            return 1
+        print_header("✓ Validation Successful")
+        return 0
+    
     # Validate input
     pkl_path = Path(args.input)
     if not pkl_path.exists():
@@ -499,44 +1961,223 @@ def main():
     assets_dir.mkdir(parents=True, exist_ok=True)
     print_success(f"Assets directory ready: {assets_dir}/")
     
+    if args.prune_top_k is not None or args.prune_fraction is not None:
+        with PROFILER.stage('prune_vocabulary'):
+            success, path, error = prune_vocabulary(
+                str(pkl_path), assets_dir, top_k=args.prune_top_k, fraction=args.prune_fraction,
+            )
+        if not success:
+            LAST_RESULT.update(error=error)
+            print_error(f"Error: {error}")
+            return 1
+        pkl_path = Path(path)
+    
+    if args.target == 'tfidf':
+        with PROFILER.stage('method_tfidf_artifact'):
+            success, path, error = method_tfidf_artifact(str(pkl_path), assets_dir)
+        if not success:
+            LAST_RESULT.update(error=error)
+            print_error(f"Error: {error}")
+            return 1
+        LAST_RESULT.update(method='tfidf', path=path)
+        print_header("✓ Conversion Successful")
+        print(f"TF-IDF artifact: {path}")
+        print_info("Score with: python3 tfidf_artifact.py --artifact " + path + " \"<text>\"")
+        return 0
+    
+    if args.target == 'ort':
+        if args.corpus and not Path(args.corpus).exists():
+            print_error(f"Corpus not found: {args.corpus}")
+            return 1
+        with PROFILER.stage('method_onnx_runtime'):
+            success, path, error = method_onnx_runtime(str(pkl_path), assets_dir, args.corpus)
+        if not success:
+            LAST_RESULT.update(error=error)
+            print_error(f"Error: {error}")
+            return 1
+        LAST_RESULT.update(method='ort', path=path)
+        print_header("✓ Conversion Successful")
+        print(f"ORT model: {path}")
+        print_info("Benchmark with: python3 benchmark_backends.py --corpus <emails.jsonl> --backends pickle,ort,tflite")
+        return 0
+    
+    if args.target == 'sparse':
+        with PROFILER.stage('method_sparse_tflite'):
+            success, path, error = method_sparse_tflite(
+                str(pkl_path), assets_dir, {'mode': args.quantize, 'ops': args.ops_set},
+            )
+        if not success:
+            LAST_RESULT.update(error=error)
+            print_error(f"Error: {error}")
+            return 1
+        with PROFILER.stage('validate_tflite'):
+            valid, details = validate_tflite(path, fuzz_settings(args), args.runtime)
+        LAST_RESULT.update(method='sparse', path=path, valid=valid, validation=details)
+        if not valid:
+            if details.get('fuzz'):
+                print_error("Fuzzing broke an invariant; conversion failed")
+                return 1
+            print_warning("Validation failed, but TFLite file exists")
+        print_header("✓ Conversion Successful")
+        print(f"Sparse TFLite model: {path}")
+        print_next_steps(path)
+        return 0
+    
     n_features = args.features
     print_info(f"Using {n_features} input features")
     
+    if args.corpus and not Path(args.corpus).exists():
+        print_error(f"Corpus not found: {args.corpus}")
+        return 1
+    if args.quantize == 'int8' and not args.corpus:
+        print_error("--quantize int8 needs --corpus to calibrate on real emails")
+        return 1
+    if args.distill and not args.corpus:
+        print_error("--distill needs --corpus for the teacher to label")
+        return 1
+    quant = {
+        'mode': args.quantize,
+        'ops': args.ops_set,
+        'sweep': args.quantize_sweep,
+        'corpus': args.corpus,
+        'pkl_path': str(pkl_path),
+    }
+    print_info(f"Quantization: {args.quantize}")
+    if args.ops_set != 'auto':
+        print_info(f"Ops set: {args.ops_set}")
+    
+    distill = None
+    if args.distill:
+        from distill import DEFAULT_SETTINGS
+        distill = {
+            'pkl_path': str(pkl_path),
+            'corpus': args.corpus,
+            'settings': {**DEFAULT_SETTINGS, 'buckets': args.distill_buckets},
+        }
+        print_info(f"Method C: distilled student ({args.distill_buckets} token buckets)")
+    
+    # Content-addressed cache of every conversion stage
+    cache = None
+    keys = None
+    if not args.no_cache:
+        from conversion_cache import ConversionCache, file_sha256, tool_versions
+        cache = ConversionCache(args.cache_dir)
+        with PROFILER.stage('cache_keys'):
+            corpus_hash = file_sha256(args.corpus) if args.corpus else None
+            keys = conversion_keys(
+                file_sha256(pkl_path), n_features, tool_versions(),
+                quantize=args.quantize, corpus_hash=corpus_hash, distill=distill,
+                ops=args.ops_set,
+            )
+        
+        # A cached result was validated without fuzzing, so --fuzz re-validates;
+        # --keep-intermediates needs the methods, which restore their own stages
+        bypass = args.quantize_sweep or args.fuzz or args.keep_intermediates
+        cached = None if bypass else cache.lookup('result', keys['result'])
+        if cached:
+            tflite_path = str(assets_dir / 'priority_classifier.tflite')
+            cache.restore(cached, tflite_path)
+            meta = cache.meta('result', keys['result'])
+            print_success(f"Full cache hit (method {meta.get('method', '?')}), skipping conversion")
+            LAST_RESULT.update(method=meta.get('method'), path=tflite_path, valid=True,
+                               validation=meta.get('validation'), cached=True)
+            if distill and meta.get('method') == 'C':
+                write_student_spec(distill, assets_dir)
+            print_cache_report(cache)
+            print_header("✓ Conversion Successful (cached)")
+            print(f"TFLite model: {tflite_path}")
+            return 0
+    
     # Try conversion methods in order
     tflite_path = None
+    method = None
+    
+    if args.parallel:
+        timeouts = {
+            name: args.timeout or default for name, (_, _, default) in STRATEGIES.items()
+        }
+        with PROFILER.stage('race_strategies'):
+            success, tflite_path, method, error = race_strategies(
+                str(pkl_path), n_features, assets_dir, timeouts,
+                cache=cache, keys=keys, keep_intermediates=args.keep_intermediates, quant=quant,
+                distill=distill,
+            )
+        if not success:
+            LAST_RESULT.update(error=error)
+            print_error("All conversion methods failed")
+            print_error(f"Errors: {error}")
+            if cache:
+                print_cache_report(cache)
+            return 1
     
-    # Method A: scikit-learn
-    success, path, error = method_a_sklearn_to_tflite(str(pkl_path), n_features, assets_dir)
-    if success:
-        tflite_path = path
     else:
-        print_info(f"Method A error: {error}")
-        
-        # Method B: Keras
-        success, path, error = method_b_keras_to_tflite(str(pkl_path), assets_dir)
+        # Method A: scikit-learn
+        with PROFILER.stage('method A'):
+            success, path, error = method_a_sklearn_to_tflite(
+                str(pkl_path), n_features, assets_dir, keep_intermediates=args.keep_intermediates,
+                cache=cache, keys=keys, quant=quant,
+            )
+            PROFILER.annotate(success=success)
         if success:
-            tflite_path = path
+            tflite_path, method = path, 'A'
         else:
-            print_info(f"Method B error: {error}")
+            print_info(f"Method A error: {error}")
             
-            # Method C: Synthetic fallback
-            success, path, error = method_c_synthetic_fallback(n_features, assets_dir)
+            # Method B: Keras
+            with PROFILER.stage('method B'):
+                success, path, error = method_b_keras_to_tflite(
+                    str(pkl_path), assets_dir, cache=cache, keys=keys, quant=quant,
+                )
+                PROFILER.annotate(success=success)
             if success:
-                tflite_path = path
+                tflite_path, method = path, 'B'
             else:
-                print_error(f"All conversion methods failed")
-                print_error(f"Last error: {error}")
-                return 1
-    
+                print_info(f"Method B error: {error}")
+                
+                # Method C: Synthetic fallback
+                with PROFILER.stage('method C'):
+                    success, path, error = method_c_synthetic_fallback(
+                        n_features, assets_dir, cache=cache, keys=keys, quant=quant,
+                        distill=distill,
+                    )
+                    PROFILER.annotate(success=success)
+                if success:
+                    tflite_path, method = path, 'C'
+                else:
+                    LAST_RESULT.update(error=error)
+                    print_error(f"All conversion methods failed")
+                    print_error(f"Last error: {error}")
+                    if cache:
+                        print_cache_report(cache)
+                    return 1
+
+
     # Validate
     if tflite_path and Path(tflite_path).exists():
-        valid, details = validate_tflite(tflite_path)
+        fuzz = fuzz_settings(args, monotonic=method == 'A' and is_linear_model(pkl_path))
+        with PROFILER.stage('validate_tflite'):
+            valid, details = validate_tflite(tflite_path, fuzz, args.runtime)
+        LAST_RESULT.update(method=method, path=tflite_path, valid=valid, validation=details)
+        if not valid and details.get('fuzz'):
+            print_error("Fuzzing broke an invariant; conversion failed")
+            if cache:
+                print_cache_report(cache)
+            return 1
         if not valid:
             print_warning("Validation failed, but TFLite file exists")
+        elif cache:
+            cache.store('result', keys['result'], tflite_path,
+                        meta={'method': method, 'validation': details})
     else:
         print_error("TFLite file was not created")
         return 1
     
+    if distill and method == 'C':
+        write_student_spec(distill, assets_dir)
+    
+    if cache:
+        print_cache_report(cache)
+    
     # Success
     print_header("✓ Conversion Successful")
     print(f"TFLite model: {tflite_path}")
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Conversion Sweep
+
+Converts every pickle in a directory (per-role and per-tenant variants of
+priority_classifier.pkl) under a matrix of convert_model.py options in one
+pass, instead of one `python convert_model.py` per file and setting:
+
+  - jobs run in a pool of spawned worker processes that import TensorFlow
+    once in their initializer, so startup is paid per worker, not per job
+  - each job runs convert_model.run() in its own temporary directory, so
+    its assets/models, tmp_savedmodel and quantized outputs never collide
+  - artifacts are copied to <out>/<model>/<variant>.<ext>; the stage cache
+    (conversion_cache.py) is shared and its writes are atomic
+  - every job's output goes to <out>/logs/<model>/<variant>.log
+
+The matrix is the product of --target, --features, --quantize and
+--ops-set (comma-separated lists); options a target ignores are collapsed
+(--features only applies to tflite, --ops-set to tflite and sparse).
+'auto' features are read from the pickle (n_features_in_ or vocabulary).
+
+<out>/manifest.json lists per job: status, conversion method, size,
+sha256, conversion time, validation (inference, output shape, runtime)
+and the worker that ran it. Method C without --distill is a synthetic
+stand-in, not the pickle, and is reported as 'fallback'.
+
+--serial-baseline also runs every job the usual way (a fresh
+convert_model.py process each, one after another) and reports both times.
+
+Usage:
+    python3 convert_sweep.py --models models/ [--out build/models]
+                             [--target tflite] [--features auto]
+                             [--quantize dynamic,float16] [--ops-set auto,builtins]
+                             [--workers 4] [--corpus emails.jsonl] [--fuzz]
+                             [--serial-baseline]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import itertools
+from pathlib import Path
+
+from convert_model import OPS_SETS, QUANTIZE_MODES
+from lite_runtime import RUNTIME_CHOICES
+from stage_profiler import current_rss_mb
+
+
+TARGETS = ['tflite', 'tfidf', 'sparse', 'ort']
+# Which matrix axes each target honours
+TARGET_AXES = {
+    'tflite': ('features', 'quantize', 'ops_set'),
+    'sparse': ('quantize', 'ops_set'),
+    'tfidf': (),
+    'ort': (),
+}
+ARTIFACT_SUFFIX = {'tflite': '.tflite', 'sparse': '.tflite', 'tfidf': '.tfidf', 'ort': '.ort'}
+# Quantize mode convert_model.py uses when none is given
+DEFAULT_QUANTIZE = {'tflite': 'dynamic', 'sparse': 'none'}
+
+
+def split_list(value, choices=None, name='value'):
+    items = [v.strip() for v in value.split(',') if v.strip()]
+    if choices is not None:
+        unknown = [v for v in items if v not in choices]
+        if unknown:
+            raise ValueError(f"Unknown {name}: {', '.join(unknown)} (choose from {', '.join(choices)})")
+    return items
+
+
+def pickle_features(pkl_path):
+    """Input width of a pickled model (vectorizer vocabulary or n_features_in_), or None."""
+    import joblib
+    from convert_model import infer_n_features
+
+    model = joblib.load(pkl_path)
+    steps = getattr(model, 'steps', None)
+    vocabulary = getattr(steps[0][1], 'vocabulary_', None) if steps else None
+    if vocabulary is not None:
+        return len(vocabulary)
+    return infer_n_features(model)
+
+
+def build_jobs(models, targets, features, quantize, ops_sets):
+    """
+    One job per model and distinct option combination.
+    Returns a list of dicts (model, pkl, target, features, quantize, ops_set, variant).
+    """
+    jobs = []
+    for pkl in models:
+        widths = {}
+        for target, width, mode, ops in itertools.product(targets, features, quantize, ops_sets):
+            axes = TARGET_AXES[target]
+            if 'features' in axes and width == 'auto':
+                if pkl not in widths:
+                    widths[pkl] = pickle_features(pkl)
+                width = widths[pkl]
+                if width is None:
+                    raise ValueError(f"{pkl}: cannot infer the input width; pass --features <n>")
+            job = {
+                'model': Path(pkl).stem,
+                'pkl': str(Path(pkl).resolve()),
+                'target': target,
+                'features': int(width) if 'features' in axes else None,
+                'quantize': mode if 'quantize' in axes else None,
+                'ops_set': ops if 'ops_set' in axes else None,
+            }
+            parts = [target]
+            if job['features'] is not None:
+                parts.append(f"f{job['features']}")
+            if job['quantize'] is not None:
+                parts.append(job['quantize'])
+            if job['ops_set'] not in (None, 'auto'):
+                parts.append(job['ops_set'])
+            job['variant'] = '-'.join(parts)
+            if job not in jobs:
+                jobs.append(job)
+    return jobs
+
+
+def job_argv(job, options):
+    """convert_model.py arguments for one job."""
+    argv = ['--input', job['pkl'], '--target', job['target']]
+    if job['features'] is not None:
+        argv += ['--features', str(job['features'])]
+    if job['quantize'] is not None:
+        argv += ['--quantize', job['quantize']]
+    if job['ops_set'] is not None:
+        argv += ['--ops-set', job['ops_set']]
+    if options.get('corpus'):
+        argv += ['--corpus', options['corpus']]
+    if options.get('distill'):
+        argv += ['--distill']
+    if options.get('fuzz'):
+        argv += ['--fuzz', '--fuzz-rows', str(options['fuzz_rows'])]
+    if options.get('runtime'):
+        argv += ['--runtime', options['runtime']]
+    if options.get('cache_dir'):
+        argv += ['--cache-dir', options['cache_dir']]
+    else:
+        argv += ['--no-cache']
+    return argv
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    paths = sorted(p for p in Path(path).rglob('*') if p.is_file()) if Path(path).is_dir() else [Path(path)]
+    for p in paths:
+        with open(p, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _size(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+    return path.stat().st_size
+
+
+def collect_artifact(src, dest):
+    """Copy a job's artifact (file or directory) out of its work dir."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.is_dir():
+        shutil.rmtree(dest)
+    if Path(src).is_dir():
+        shutil.copytree(src, dest)
+    else:
+        shutil.copy2(src, dest)
+    return str(dest)
+
+
+_worker = {}
+
+
+def _init_worker(preload_tensorflow):
+    """Pay the heavy imports once per worker process."""
+    start = time.perf_counter()
+    import convert_model
+    _worker['convert_model'] = convert_model
+    if preload_tensorflow:
+        try:
+            import tensorflow
+        except ImportError:
+            tensorflow = None
+        _worker['tensorflow'] = tensorflow
+    _worker.update(pid=os.getpid(), startup_s=time.perf_counter() - start, jobs=0)
+
+
+def run_job(job, options, out_dir, scratch):
+    """Convert one job in an isolated work directory; returns its manifest row."""
+    import contextlib
+    import convert_model
+
+    _worker['jobs'] = _worker.get('jobs', 0) + 1
+    row = dict(job, worker=os.getpid(), worker_job=_worker['jobs'],
+               tensorflow_warm='tensorflow' in sys.modules)
+    log_path = Path(out_dir) / 'logs' / job['model'] / f"{job['variant']}.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    work = Path(tempfile.mkdtemp(prefix=f"{job['model']}-{job['variant']}-", dir=scratch))
+    cwd = os.getcwd()
+    start = time.perf_counter()
+    try:
+        os.chdir(work)
+        with open(log_path, 'w', encoding='utf-8') as log, \
+                contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            try:
+                code = convert_model.run(convert_model.parse_args(job_argv(job, options)))
+            except SystemExit as e:
+                code = e.code
+            except Exception as e:
+                convert_model.LAST_RESULT.update(error=f"{type(e).__name__}: {e}")
+                code = 1
+        result = dict(convert_model.LAST_RESULT)
+        row['convert_s'] = round(time.perf_counter() - start, 3)
+        row['method'] = result.get('method')
+        row['cached'] = bool(result.get('cached'))
+        validation = result.get('validation') or {}
+        row['valid'] = result.get('valid')
+        row['inference_ok'] = validation.get('inference_ok')
+        row['output_shape'] = validation.get('output_shape')
+        row['runtime'] = (validation.get('runtime') or {}).get('runtime')
+        if validation.get('fuzz'):
+            row['fuzz_failures'] = len(validation['fuzz'].get('failures', []))
+        path = result.get('path')
+        if code == 0 and path and Path(path).exists():
+            dest = Path(out_dir) / job['model'] / f"{job['variant']}{ARTIFACT_SUFFIX[job['target']]}"
+            row['artifact'] = collect_artifact(path, dest)
+            row['size_kb'] = round(_size(dest) / 1024, 1)
+            row['sha256'] = _sha256(dest)
+            synthetic = row['method'] == 'C' and not options.get('distill')
+            row['status'] = 'fallback' if synthetic else 'ok' if row['valid'] is not False else 'invalid'
+        else:
+            row['status'] = 'failed'
+            row['error'] = result.get('error') or f"convert_model exited with {code}"
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work, ignore_errors=True)
+    row['rss_mb'] = current_rss_mb()
+    row['log'] = str(log_path)
+    return row
+
+
+def run_sweep(jobs, options, out_dir, workers, preload_tensorflow=True, on_row=None):
+    """Run jobs on a pool of warm workers. Returns manifest rows in job order."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    out_dir = Path(out_dir)
+    scratch = Path(tempfile.mkdtemp(prefix='.sweep_', dir=out_dir))
+    rows = [None] * len(jobs)
+    try:
+        # Spawn keeps each worker's TensorFlow state private and works on every OS
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(preload_tensorflow,)) as pool:
+            futures = {pool.submit(run_job, job, options, str(out_dir), str(scratch)): i
+                       for i, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    rows[i] = future.result()
+                except Exception as e:
+                    # The worker died (out of memory, crash in native code)
+                    rows[i] = dict(jobs[i], status='failed', error=f"{type(e).__name__}: {e}")
+                if on_row:
+                    on_row(rows[i])
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return rows
+
+
+def run_serial(jobs, options, out_dir):
+    """The usual way: a fresh convert_model.py process per job, one after another."""
+    import subprocess
+
+    script = Path(__file__).resolve().parent / 'convert_model.py'
+    times = []
+    for job in jobs:
+        work = Path(tempfile.mkdtemp(prefix='.serial_', dir=out_dir))
+        start = time.perf_counter()
+        try:
+            subprocess.run([sys.executable, str(script)] + job_argv(job, options), cwd=work,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def print_table(rows):
+    print(f"{'model':<22} {'variant':<28} {'status':<8} {'method':<6} {'size KB':>9} "
+          f"{'convert s':>9} {'valid':>5}  runtime", file=sys.stderr)
+    for row in rows:
+        valid = '' if row.get('valid') is None else ('yes' if row['valid'] else 'no')
+        size = f"{row['size_kb']:.1f}" if row.get('size_kb') is not None else '-'
+        convert_s = f"{row['convert_s']:.2f}" if row.get('convert_s') is not None else '-'
+        print(f"{row['model'][:22]:<22} {row['variant'][:28]:<28} {row['status']:<8} "
+              f"{str(row.get('method') or '-'):<6} {size:>9} {convert_s:>9} {valid:>5}  "
+              f"{row.get('runtime') or '-'}", file=sys.stderr)
+
+
+def main():
+    """Convert a directory of pickles under an option matrix."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Parallel multi-model conversion sweep')
+    parser.add_argument('--models', required=True, help='Directory of .pkl files (or one .pkl)')
+    parser.add_argument('--out', default='build/models', help='Artifacts, logs and manifest (default: build/models)')
+    parser.add_argument('--target', default='tflite',
+                        help=f"Comma-separated targets: {', '.join(TARGETS)} (default: tflite)")
+    parser.add_argument('--features', default='auto',
+                        help='Comma-separated input widths, or auto from the pickle (default: auto)')
+    parser.add_argument('--quantize', default=None,
+                        help=f"Comma-separated modes: {', '.join(QUANTIZE_MODES)} "
+                             f"(default: dynamic; none for sparse)")
+    parser.add_argument('--ops-set', default='auto',
+                        help=f"Comma-separated op sets: {', '.join(OPS_SETS)} (default: auto)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count, at most one per job)')
+    parser.add_argument('--corpus', help='Email corpus for int8 calibration and --distill')
+    parser.add_argument('--distill', action='store_true', help='Method C distills a student (needs --corpus)')
+    parser.add_argument('--fuzz', action='store_true', help='Fuzz every converted model (see tflite_fuzz.py)')
+    parser.add_argument('--fuzz-rows', type=int, default=20000, help='Rows per --fuzz run (default: 20000)')
+    parser.add_argument('--runtime', choices=RUNTIME_CHOICES, help='Interpreter package for validation')
+    parser.add_argument('--cache-dir', default='.convert_cache',
+                        help='Shared stage cache (default: .convert_cache)')
+    parser.add_argument('--no-cache', action='store_true', help='Rebuild every stage')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='Do not import TensorFlow when a worker starts (tfidf/ort-only sweeps)')
+    parser.add_argument('--serial-baseline', action='store_true',
+                        help='Also time one fresh convert_model.py process per job, sequentially')
+
+    args = parser.parse_args()
+
+    models_path = Path(args.models)
+    if not models_path.exists():
+        print(f"✗ Models not found: {args.models}", file=sys.stderr)
+        return 1
+    models = sorted(models_path.glob('*.pkl')) if models_path.is_dir() else [models_path]
+    if not models:
+        print(f"✗ No .pkl files in {args.models}", file=sys.stderr)
+        return 1
+    if args.corpus and not Path(args.corpus).exists():
+        print(f"✗ Corpus not found: {args.corpus}", file=sys.stderr)
+        return 1
+
+    try:
+        targets = split_list(args.target, TARGETS, 'target')
+        features = split_list(args.features, name='feature width')
+        for width in features:
+            if width != 'auto' and not width.isdigit():
+                raise ValueError(f"Feature width must be a number or auto: {width}")
+        ops_sets = split_list(args.ops_set, OPS_SETS, 'ops set')
+        if args.quantize:
+            quantize = split_list(args.quantize, QUANTIZE_MODES, 'quantize mode')
+        else:
+            quantize = sorted({DEFAULT_QUANTIZE.get(t, 'dynamic') for t in targets})
+        if 'int8' in quantize and not args.corpus:
+            raise ValueError('int8 needs --corpus to calibrate on real emails')
+        if args.distill and not args.corpus:
+            raise ValueError('--distill needs --corpus for the teacher to label')
+        jobs = build_jobs([str(m) for m in models], targets, features, quantize, ops_sets)
+        # The sparse model has no int8 variant
+        jobs = [j for j in jobs if not (j['target'] == 'sparse' and j['quantize'] == 'int8')]
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+
+    # Workers chdir into their own work directories
+    out_dir = Path(args.out).resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    options = {
+        'corpus': str(Path(args.corpus).resolve()) if args.corpus else None,
+        'distill': args.distill,
+        'fuzz': args.fuzz,
+        'fuzz_rows': args.fuzz_rows,
+        'runtime': args.runtime,
+        'cache_dir': None if args.no_cache else str(Path(args.cache_dir).resolve()),
+    }
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(jobs)))
+    print(f"→ {len(models)} models × {len(jobs) // len(models) if len(models) else 0} variants = "
+          f"{len(jobs)} jobs on {workers} workers", file=sys.stderr)
+
+    def report(row):
+        mark = {'ok': '✓', 'fallback': '⚠'}.get(row['status'], '✗')
+        detail = row.get('error') or f"method {row.get('method')}, {row.get('size_kb')} KB"
+        print(f"{mark} {row['model']} {row['variant']}: {row['status']} "
+              f"({detail}, {row.get('convert_s', 0):.2f}s)", file=sys.stderr)
+
+    start = time.perf_counter()
+    rows = run_sweep(jobs, options, out_dir, workers, not args.no_preload, report)
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        'models': len(models),
+        'jobs': len(jobs),
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'ok': sum(r['status'] == 'ok' for r in rows),
+        'fallback': sum(r['status'] == 'fallback' for r in rows),
+        'invalid': sum(r['status'] == 'invalid' for r in rows),
+        'failed': sum(r['status'] == 'failed' for r in rows),
+    }
+    if args.serial_baseline:
+        print('→ Serial baseline: one convert_model.py process per job...', file=sys.stderr)
+        serial = run_serial(jobs, options, out_dir)
+        summary['serial_seconds'] = round(sum(serial), 3)
+        summary['speedup'] = round(sum(serial) / elapsed, 2) if elapsed > 0 else None
+
+    manifest = {'summary': summary, 'options': options, 'jobs': rows}
+    manifest_path = out_dir / 'manifest.json'
+    manifest_path.write_text(json.dumps(manifest, indent=2, default=str))
+
+    print_table(rows)
+    print(f"✓ {summary['ok']}/{len(jobs)} ok in {elapsed:.2f}s; manifest: {manifest_path}", file=sys.stderr)
+    if args.serial_baseline:
+        print(f"→ Serial convert_model.py runs: {summary['serial_seconds']:.2f}s "
+              f"({summary['speedup']}x)", file=sys.stderr)
+    if summary['fallback']:
+        print(f"⚠ {summary['fallback']} jobs fell back to the synthetic method C model", file=sys.stderr)
+    return 1 if summary['failed'] or summary['invalid'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Dart Text
+
+Dart String semantics shared by the offline mirrors of the app's rule code
+(rule_scorer.py, summarizer.py, deadline_extractor.py), so they agree with
+each other and with the VM:
+
+    - toLowerCase() is the simple case mapping ('İ' → 'i', not 'i̇')
+    - trim() strips Unicode White_Space and the BOM (not U+001C-U+001F)
+    - length and substring() count UTF-16 code units
+"""
+
+import re
+
+
+# Dart's String.trim(): Unicode White_Space plus the BOM
+DART_WHITESPACE = ('\t\n\v\f\r \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006'
+                   '\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff')
+
+# Characters that take two UTF-16 code units
+ASTRAL = re.compile('[\U00010000-\U0010ffff]')
+
+
+def dart_lower(text):
+    """
+    toLowerCase() as on the Dart VM, for keyword matching. Python's full
+    mapping only differs on 'İ' (→ 'i̇'), which is also the only character
+    whose lowercase is longer, so the result has the same length as text.
+    """
+    if text.isascii():
+        return text.lower()
+    return text.replace('\u0130', 'i').lower()
+
+
+def utf16_len(text):
+    """Dart's String.length."""
+    return len(text) + len(ASTRAL.findall(text)) if not text.isascii() else len(text)
+
+
+def dart_substring(text, start, end):
+    """text.substring(start, end) with Dart's UTF-16 indices."""
+    units = text.encode('utf-16-le', errors='surrogatepass')
+    return units[2 * start:2 * end].decode('utf-16-le', errors='surrogatepass')
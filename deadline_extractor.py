@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Deadline Extractor
+
+Offline batch version of DeadlineDetectorDart (lib/core/deadline_detector.dart)
+for backfilling deadline metadata over archived mail. Each record's
+'{subject}\\n{snippet}' text is analysed exactly as
+EmailRepository.analyzeAndStoreDeadlinesForEmails does, and the output is
+DeadlineDetectionResult.toMap() plus the message id:
+
+    {"id": "...", "hasDeadline": true, "deadlines": ["2024-03-05T00:00:00.000"],
+     "primaryDeadline": "...", "primaryDeadlineText": "...",
+     "daysUntilPrimary": 3, "urgencyScore": 7, "reminder": {...}}
+
+The Dart detector runs six regexes over every text, then looks up each
+"<word> <number>" match in a month table. This engine finds the same matches
+in one scan. It uses a single fused pattern with the month names built in,
+so non-month words are never matched. The day and year of a month date, and
+the digit of "by <digit>", are matched in lookaheads. That way no
+alternative consumes text that another Dart pattern would have matched.
+Each Dart pattern therefore sees exactly the matches it would find on its
+own. --verify runs a literal port of the Dart code next to the fused scan,
+checks that the two agree and reports the speedup.
+
+"Now" is fixed per run (--now) so results are reproducible. Dates are local
+midnights, as in Dart. Dates that normalise outside years 1-9999 (e.g.
+00/00/0000) are dropped, because Python cannot represent them.
+
+Usage:
+    python3 deadline_extractor.py --input mail.jsonl [--output deadlines.jsonl]
+                                  [--workers N] [--now 2024-06-01T09:00:00]
+    python3 deadline_extractor.py --input mail.jsonl --verify
+"""
+
+import re
+import sys
+import json
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from dart_text import ASTRAL, DART_WHITESPACE, dart_lower, dart_substring
+
+
+# Keep in sync with DeadlineDetectorDart._monthNames (insertion order matters:
+# _findDeadlineText uses the first name listed for a month)
+MONTH_NAMES = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11,
+    'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8,
+    'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+FIRST_MONTH_NAME = {}
+for _name, _month in MONTH_NAMES.items():
+    FIRST_MONTH_NAME.setdefault(_month, _name)
+
+# Dart (JavaScript) regex semantics: ASCII \b and \d, but Unicode \s
+WS = r'[\t\n\v\f\r \u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff]'
+
+FLAGS = re.ASCII
+
+DEADLINE_KEYWORDS = (
+    r'deadline|due|due\s+by|due\s+date|submit\s+by|submit\s+before|must\s+be\s+done|'
+    r'complete\s+by|finish\s+by|by\s+\d|expires?|expiration\s+date|final\s+date|last\s+date'
+).replace(r'\s', WS)
+URGENCY_KEYWORDS = (
+    r'urgent|asap|critical|immediately|high\s+priority|important|crucial|emergency|'
+    r'rush|today|tonight|tomorrow'
+).replace(r'\s', WS)
+ACTION_VERBS = r'submit|send|complete|finish|deliver|provide|prepare|review|approve|sign|confirm'
+
+# Keyword phrases that start with an action verb the Dart action pattern also counts
+_ACTION_PREFIXED = re.compile(rf'(?:submit|complete|finish){WS}', FLAGS)
+
+# Literal ports of the Dart patterns, used by the reference implementation
+DEADLINE_KEYWORD_PATTERN = re.compile(rf'\b({DEADLINE_KEYWORDS})\b', FLAGS | re.IGNORECASE)
+DATE_PATTERN_1 = re.compile(r'\b(\d{1,2})[/-](\d{1,2})[/-](\d{4})\b', FLAGS)
+DATE_PATTERN_2 = re.compile(rf'\b([A-Za-z]+){WS}+(\d{{1,2}}),?{WS}+(\d{{4}})\b', FLAGS)
+DATE_PATTERN_3 = re.compile(rf'\b([A-Za-z]+){WS}+(\d{{1,2}})\b', FLAGS)
+URGENCY_KEYWORD_PATTERN = re.compile(rf'\b({URGENCY_KEYWORDS})\b', FLAGS | re.IGNORECASE)
+ACTION_VERB_PATTERN = re.compile(rf'\b({ACTION_VERBS})\b', FLAGS | re.IGNORECASE)
+
+_MONTH_ALTERNATION = '|'.join(sorted(MONTH_NAMES, key=len, reverse=True))
+
+# Every alternative starts at a word boundary on a letter or digit; checking
+# that once up front lets the scan skip other positions quickly
+FUSED_PATTERN = re.compile(
+    r'\b(?=[0-9a-z])(?:'
+    r'(?P<numeric>(?P<n1>\d{1,2})[/-](?P<n2>\d{1,2})[/-](?P<n3>\d{4})\b)'
+    rf'|(?P<month>{_MONTH_ALTERNATION}){WS}+'
+    rf'(?=(?P<day>\d{{1,2}})\b(?:,?{WS}+(?P<year>\d{{4}})\b)?)'
+    r'|(?P<keyword>'
+    + DEADLINE_KEYWORDS.replace(r'by' + WS + r'+\d', r'by' + WS + r'+(?=(?P<by_digit>\d)\b)')
+    + r')\b'
+    rf'|(?P<urgency>{URGENCY_KEYWORDS})\b'
+    rf'|(?P<action>{ACTION_VERBS})\b)',
+    FLAGS | re.IGNORECASE,
+)
+
+# Characters whose lowercase form contains ASCII letters (U+0130, U+212A)
+CASE_FOLDS_TO_ASCII = re.compile('[\u0130\u212a]')
+
+NO_DEADLINE = {
+    'hasDeadline': False,
+    'deadlines': [],
+    'primaryDeadline': None,
+    'primaryDeadlineText': None,
+    'daysUntilPrimary': 9999,
+    'urgencyScore': 0,
+    'reminder': None,
+}
+
+US_PER_MINUTE = 60 * 1000 * 1000
+US_PER_HOUR = 60 * US_PER_MINUTE
+US_PER_DAY = 24 * US_PER_HOUR
+
+
+def dart_date(year, month, day):
+    """
+    DateTime(year, month, day) with Dart's overflow rules (month 13 is January
+    of the next year, day 0 the last day of the previous month).
+    Returns a date, or None outside Python's year range.
+    """
+    years, month0 = divmod(year * 12 + month - 1, 12)
+    if not 1 <= years <= 9999:
+        return None
+    try:
+        return date(years, month0 + 1, 1) + timedelta(days=day - 1)
+    except OverflowError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def local_midnight_us(day):
+    """Epoch microseconds of local midnight on a date."""
+    try:
+        return int(datetime(day.year, day.month, day.day).timestamp()) * 1000000
+    except (OverflowError, OSError, ValueError):
+        offset = time.altzone if time.daylight else time.timezone
+        naive = datetime(day.year, day.month, day.day) - datetime(1970, 1, 1)
+        return (naive.days * 86400 + offset) * 1000000
+
+
+def epoch_us(moment):
+    """Epoch microseconds of a naive local datetime."""
+    return int(moment.timestamp() * 1000000)
+
+
+def iso(day):
+    """Dart toIso8601String() of a local midnight DateTime."""
+    return f'{day.year:04d}-{day.month:02d}-{day.day:02d}T00:00:00.000'
+
+
+def _trunc_div(value, unit):
+    quotient = abs(value) // unit
+    return quotient if value >= 0 else -quotient
+
+
+def calculate_remaining_time(deadline_us, now_us):
+    """Same as DeadlineDetectorDart.calculateRemainingTime."""
+    diff = deadline_us - now_us
+    days = _trunc_div(diff, US_PER_DAY)
+    total_hours = _trunc_div(diff, US_PER_HOUR)
+    overdue = diff < 0
+    return {
+        'days': -abs(days) if overdue else days,
+        'hours': total_hours % 24,
+        'minutes': _trunc_div(diff, US_PER_MINUTE) % 60,
+        'total_hours': -abs(total_hours) if overdue else total_hours,
+        'is_overdue': 1 if overdue else 0,
+    }
+
+
+def generate_reminder(deadline_us, now_us):
+    """Same as DeadlineDetectorDart.generateReminder."""
+    remaining = calculate_remaining_time(deadline_us, now_us)
+    days_until = remaining['days']
+
+    if days_until < 0:
+        reminder_type, priority = 'critical', 1
+        message = f'OVERDUE: This deadline was {abs(days_until)} days ago. Immediate action required!'
+    elif days_until == 0:
+        reminder_type, priority = 'critical', 1
+        message = f"TODAY: Deadline is today. {remaining['total_hours']} hours remaining."
+    elif days_until == 1:
+        reminder_type, priority = 'urgent', 2
+        message = 'TOMORROW: Deadline is tomorrow. Less than 24 hours remaining.'
+    elif days_until <= 3:
+        reminder_type, priority = 'warning', 2
+        message = f"COMING UP: Deadline in {days_until} days. {remaining['hours']} hours remaining."
+    else:
+        reminder_type, priority = 'info', 3
+        message = f'Upcoming deadline in {days_until} days.'
+
+    return {
+        'should_remind': days_until <= 3,
+        'reminder_type': reminder_type,
+        'message': message,
+        'priority': priority,
+        'remaining': remaining,
+    }
+
+
+def _numeric_date(day, month, year):
+    """Pattern 1: DD/MM/YYYY, else MM/DD/YYYY."""
+    if day <= 31 and month <= 12:
+        return dart_date(year, month, day)
+    if day <= 12 and month <= 31:
+        return dart_date(year, day, month)
+    return None
+
+
+def _next_occurrence(month, day, now):
+    """Pattern 3: this year's date, or next year's if it has passed."""
+    found = dart_date(now.year, month, day)
+    if found is not None and local_midnight_us(found) < epoch_us(now):
+        found = dart_date(now.year + 1, month, day)
+    return found
+
+
+def _utf16_offset(text, index):
+    """Dart string index (UTF-16 code units) of a Python string index."""
+    return index + len(ASTRAL.findall(text, 0, index))
+
+
+def find_deadline_text(text, lower, keyword_spans, deadline):
+    """Same as DeadlineDetectorDart._findDeadlineText."""
+    astral = not text.isascii() and ASTRAL.search(text) is not None
+    length = len(text.encode('utf-16-le', errors='surrogatepass')) // 2 if astral else len(text)
+    day = str(deadline.day)
+    month_name = FIRST_MONTH_NAME[deadline.month]
+    month_number = str(deadline.month)
+
+    for start, end in keyword_spans:
+        if astral:
+            start, end = _utf16_offset(lower, start), _utf16_offset(lower, end)
+        start = min(max(start - 50, 0), length)
+        end = min(max(end + 100, 0), length)
+        snippet = dart_substring(text, start, end) if astral else text[start:end]
+        if day in snippet and (month_name in snippet or month_number in snippet):
+            return snippet.strip(DART_WHITESPACE)
+    return None
+
+
+def calculate_urgency(urgency_count, action_count, deadline_us, now_us):
+    """Same as DeadlineDetectorDart.calculateUrgency."""
+    score = min(urgency_count, 3) + min(action_count, 2)
+    if deadline_us is not None:
+        days_until = _trunc_div(deadline_us - now_us, US_PER_DAY)
+        if days_until <= 1:  # overdue, today or tomorrow
+            score += 3
+        elif days_until <= 3:
+            score += 2
+        elif days_until <= 7:
+            score += 1
+    return min(max(score, 0), 10)
+
+
+class DeadlineExtractor:
+    """DeadlineDetectorDart.detectDeadlines at a fixed `now`."""
+
+    def __init__(self, now=None):
+        self.now = now or datetime.now()
+        self.now_us = epoch_us(self.now)
+        # "<month> <day>" without a year only depends on now, so resolve every
+        # month name / day pair once instead of per match
+        self._upcoming = {
+            (name, day): _next_occurrence(month, day, self.now)
+            for name, month in MONTH_NAMES.items()
+            for day in range(1, 32)
+        }
+
+    def scan(self, text, lower):
+        """
+        All six Dart patterns in one regex pass.
+        Returns (keyword_spans, urgency_count, action_count, dates); keyword
+        spans index into the lowercased text.
+        """
+        matches = list(FUSED_PATTERN.finditer(lower))
+        if CASE_FOLDS_TO_ASCII.search(text):
+            # Lowercasing created ASCII letters (dart_lower keeps the length),
+            # so the date patterns must see the original text
+            date_matches = FUSED_PATTERN.finditer(text)
+        else:
+            date_matches = matches
+
+        keyword_spans, urgency, action = [], 0, 0
+        for m in matches:
+            kind = m.lastgroup
+            if kind == 'keyword':
+                keyword = m.group('keyword')
+                end = m.end('by_digit') if m.group('by_digit') else m.end('keyword')
+                keyword_spans.append((m.start('keyword'), end))
+                if _ACTION_PREFIXED.match(keyword):
+                    action += 1
+            elif kind == 'urgency':
+                urgency += 1
+            elif kind == 'action':
+                action += 1
+
+        numeric, long_form, short_form = [], [], []
+        upcoming = self._upcoming
+        for m in date_matches:
+            kind = m.lastgroup
+            if kind == 'numeric':
+                numeric.append(_numeric_date(int(m.group('n1')), int(m.group('n2')), int(m.group('n3'))))
+            elif kind == 'day' or kind == 'year':
+                name, day = m.group('month', 'day')
+                day = int(day)
+                if not 1 <= day <= 31:
+                    continue
+                name = name.lower()
+                if kind == 'year':
+                    long_form.append(dart_date(int(m.group('year')), MONTH_NAMES[name], day))
+                short_form.append(upcoming[name, day])
+
+        dates = [d for d in numeric + long_form + short_form if d is not None]
+        return keyword_spans, urgency, action, dates
+
+    def scan_reference(self, text, lower):
+        """Literal port of the Dart regex passes, one pattern at a time."""
+        dates = []
+        for m in DATE_PATTERN_1.finditer(text):
+            dates.append(_numeric_date(int(m.group(1)), int(m.group(2)), int(m.group(3))))
+        for m in DATE_PATTERN_2.finditer(text):
+            month = MONTH_NAMES.get(m.group(1).lower())
+            if month is not None and 1 <= int(m.group(2)) <= 31:
+                dates.append(dart_date(int(m.group(3)), month, int(m.group(2))))
+        for m in DATE_PATTERN_3.finditer(text):
+            month = MONTH_NAMES.get(m.group(1).lower())
+            if month is not None and 1 <= int(m.group(2)) <= 31:
+                dates.append(_next_occurrence(month, int(m.group(2)), self.now))
+
+        return (
+            [m.span() for m in DEADLINE_KEYWORD_PATTERN.finditer(lower)],
+            sum(1 for _ in URGENCY_KEYWORD_PATTERN.finditer(lower)),
+            sum(1 for _ in ACTION_VERB_PATTERN.finditer(lower)),
+            [d for d in dates if d is not None],
+        )
+
+    def detect(self, text, reference=False):
+        """
+        Analyse one text.
+        Returns the DeadlineDetectionResult.toMap() dict.
+        """
+        if not text:
+            return dict(NO_DEADLINE)
+
+        lower = dart_lower(text)
+        scan = self.scan_reference if reference else self.scan
+        keyword_spans, urgency, action, dates = scan(text, lower)
+        if not dates:
+            # Keywords without a date never make a deadline in the Dart code
+            return dict(NO_DEADLINE)
+
+        now_us = self.now_us
+        stamps = [local_midnight_us(d) for d in dates]
+        future = [i for i, stamp in enumerate(stamps) if stamp > now_us]
+
+        if not keyword_spans:
+            # Low-confidence mode: a future date within 90 days
+            if not future:
+                return dict(NO_DEADLINE)
+            earliest = min(stamps[i] for i in future)
+            if _trunc_div(earliest - now_us, US_PER_DAY) > 90:
+                return dict(NO_DEADLINE)
+
+        candidates = future or range(len(dates))
+        primary = min(candidates, key=stamps.__getitem__)
+        primary_us = stamps[primary]
+        primary_date = dates[primary]
+
+        return {
+            'hasDeadline': True,
+            'deadlines': [iso(d) for d in dates],
+            'primaryDeadline': iso(primary_date),
+            'primaryDeadlineText': find_deadline_text(text, lower, keyword_spans, primary_date),
+            'daysUntilPrimary': _trunc_div(primary_us - now_us, US_PER_DAY),
+            'urgencyScore': calculate_urgency(urgency, action, primary_us, now_us),
+            'reminder': generate_reminder(primary_us, now_us),
+        }
+
+
+def record_text(record):
+    """Text the app analyses: '{subject}\\n{snippet}'."""
+    return f"{record.get('subject') or ''}\n{record.get('snippet') or ''}"
+
+
+_worker_extractor = None
+
+
+def _init_worker(now):
+    global _worker_extractor
+    _worker_extractor = DeadlineExtractor(now)
+
+
+def _detect_chunk(chunk):
+    return [
+        {'id': record.get('id'), **_worker_extractor.detect(record_text(record))}
+        for record in chunk
+    ]
+
+
+def detect_stream(records, now, workers=None, chunk_size=1000):
+    """
+    Run detection across a process pool, preserving input order.
+    Yields one result dict per record.
+    """
+    from rule_scorer import iter_chunks
+
+    if workers == 1:
+        _init_worker(now)
+        for chunk in iter_chunks(records, chunk_size):
+            yield from _detect_chunk(chunk)
+        return
+
+    import multiprocessing
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(now,)) as pool:
+        for results in pool.imap(_detect_chunk, iter_chunks(records, chunk_size)):
+            yield from results
+
+
+def verify(texts, now):
+    """
+    Compare the fused scan with the reference port on a list of texts.
+    Returns (mismatches, reference_s, fused_s); mismatches lists
+    (index, reference, fused) tuples.
+    """
+    extractor = DeadlineExtractor(now)
+
+    start = time.perf_counter()
+    expected = [extractor.detect(text, reference=True) for text in texts]
+    reference_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [extractor.detect(text) for text in texts]
+    fused_s = time.perf_counter() - start
+
+    mismatches = [(i, e, a) for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+    return mismatches, reference_s, fused_s
+
+
+def main():
+    """Backfill deadline metadata for a mailbox export."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Batch deadline extraction matching the app detector')
+    parser.add_argument('--input', required=True, help='JSONL or .mbox export to analyse')
+    parser.add_argument('--output', help='Write JSONL results here (default: stdout)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Records per task (default: 1000)')
+    parser.add_argument('--now', help='Local time to measure deadlines from (ISO 8601, default: now)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Check the fused scan against the reference port and time both')
+
+    args = parser.parse_args()
+
+    from rule_scorer import iter_records
+
+    if not Path(args.input).exists():
+        print(f"✗ Input file not found: {args.input}", file=sys.stderr)
+        return 1
+    try:
+        now = datetime.fromisoformat(args.now) if args.now else datetime.now()
+    except ValueError:
+        print(f"✗ Invalid --now value: {args.now}", file=sys.stderr)
+        return 1
+    if now.tzinfo is not None:
+        now = now.astimezone().replace(tzinfo=None)
+
+    if args.verify:
+        texts = [record_text(r) for r in iter_records(args.input)]
+        mismatches, reference_s, fused_s = verify(texts, now)
+        for index, expected, actual in mismatches[:10]:
+            print(f"✗ record {index}: reference {expected}, fused {actual}")
+        print(f"→ Reference: {len(texts) / max(reference_s, 1e-9):,.0f} texts/s, "
+              f"fused: {len(texts) / max(fused_s, 1e-9):,.0f} texts/s "
+              f"({reference_s / max(fused_s, 1e-9):.2f}x)")
+        if mismatches:
+            print(f"✗ {len(mismatches)} of {len(texts)} results differ")
+            return 1
+        print(f"✓ All {len(texts)} results match")
+        return 0
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    count = found = 0
+    try:
+        for result in detect_stream(iter_records(args.input), now, args.workers, max(args.chunk_size, 1)):
+            out.write(json.dumps(result) + '\n')
+            count += 1
+            found += result['hasDeadline']
+    finally:
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"✓ Analysed {count} emails in {elapsed:.2f}s ({rate:,.0f} emails/s), "
+          f"{found} with deadlines", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Distillation
+
+Trains a small student network to reproduce priority_classifier.pkl (the
+teacher) on a real email corpus, replacing method C's model trained on random
+data. The student only needs features that are cheap to compute on device:
+
+    buckets     lowercase [a-z0-9]{2,} tokens hashed with CRC-32 into N
+                buckets, log1p counts, L2-normalized
+    rules       the PriorityClassifier fallback signals (see rule_scorer.py):
+                important label, trusted domain, high / low keyword counts,
+                date reference and the 0-100 rule score / 100
+
+The teacher's predict_proba output (optionally softened by a temperature) is
+the training target, so the student learns the teacher's decision surface
+rather than the corpus labels. A held-out split reports top-class agreement
+with the teacher, mean absolute probability difference, accuracy against the
+corpus labels when present, and per-email time for teacher vs student.
+
+The feature layout is written as a JSON spec next to the model so the app
+can build the same input vector.
+
+Usage:
+    python3 distill.py --corpus emails.jsonl [--input priority_classifier.pkl]
+                       [--buckets 512] [--hidden 32] [--epochs 30]
+                       [--report distill_report.json]
+
+    python3 convert_model.py --corpus emails.jsonl --distill
+        (method C trains the student and converts it to TFLite)
+"""
+
+import re
+import sys
+import json
+import zlib
+import time
+from pathlib import Path
+
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]{2,}')
+
+RULE_FEATURES = [
+    'important_label', 'trusted_domain', 'high_keywords', 'low_keywords',
+    'date_reference', 'rule_score',
+]
+
+DEFAULT_SETTINGS = {
+    'buckets': 512,
+    'hidden': 32,
+    'epochs': 30,
+    'temperature': 1.0,
+    'holdout': 0.2,
+    'limit': 20000,
+    'seed': 0,
+}
+
+SPEC_NAME = 'priority_classifier.student.json'
+
+
+def _rule_record(record):
+    """Corpus records holding only 'text' are scored as if it were the snippet."""
+    if record.get('subject') or record.get('snippet') or record.get('text') is None:
+        return record
+    return {**record, 'snippet': record['text']}
+
+
+class StudentFeaturizer:
+    """Hashed token buckets followed by the rule-engine signals."""
+
+    def __init__(self, n_buckets=512):
+        from rule_scorer import RuleScorer, HIGH_PRIORITY_KEYWORDS
+
+        self.n_buckets = n_buckets
+        self.rules = RuleScorer()
+        self._n_high = len(HIGH_PRIORITY_KEYWORDS)
+        self._buckets = {}
+
+    @property
+    def width(self):
+        return self.n_buckets + len(RULE_FEATURES)
+
+    def bucket(self, token):
+        """Bucket index of one token (memoized; vocabularies are small)."""
+        index = self._buckets.get(token)
+        if index is None:
+            index = self._buckets[token] = zlib.crc32(token.encode('utf-8')) % self.n_buckets
+        return index
+
+    def rule_values(self, record):
+        """RULE_FEATURES values for one record."""
+        from rule_scorer import IMPORTANT_LABELS, DATE_PATTERN, RELATIVE_DATE_PATTERN, extract_domain
+
+        record = _rule_record(record)
+        text = f"{record.get('subject') or ''} {record.get('snippet') or ''}".lower()
+        matches = self.rules.keywords.find(text)
+        high = sum(1 for index in matches if index < self._n_high)
+        low = len(matches) - high
+        important = any(str(label).upper() in IMPORTANT_LABELS for label in record.get('labels') or [])
+        trusted = self.rules.trusted.any(extract_domain(record.get('from') or ''))
+        dated = bool(DATE_PATTERN.search(text) or RELATIVE_DATE_PATTERN.search(text))
+        # Same arithmetic as RuleScorer.explain, without building the reasons
+        score = 50 + 35 * important + 20 * trusted + 20 * high - 15 * low + 15 * dated
+        return [float(important), float(trusted), float(high), float(low), float(dated),
+                min(max(score, 0), 100) / 100.0]
+
+    def transform(self, records):
+        """Feature matrix float32 [n, width] for a list of corpus records."""
+        import numpy as np
+        from email_corpus import record_text
+
+        ids = []
+        offsets = [0]
+        rules = []
+        for record in records:
+            ids.extend(self.bucket(t) for t in TOKEN_PATTERN.findall(record_text(record).lower()))
+            offsets.append(len(ids))
+            rules.append(self.rule_values(record))
+
+        n = len(records)
+        rows = np.repeat(np.arange(n), np.diff(offsets))
+        counts = np.bincount(rows * self.n_buckets + np.asarray(ids, dtype=np.int64),
+                             minlength=n * self.n_buckets)
+        buckets = np.log1p(counts.reshape(n, self.n_buckets).astype(np.float32))
+        norms = np.sqrt(np.einsum('ij,ij->i', buckets, buckets))
+        buckets /= np.maximum(norms, 1e-12)[:, None]
+
+        features = np.empty((n, self.width), dtype=np.float32)
+        features[:, :self.n_buckets] = buckets
+        features[:, self.n_buckets:] = np.asarray(rules, dtype=np.float32).reshape(n, len(RULE_FEATURES))
+        return features
+
+    def spec(self, classes):
+        """JSON-serializable description of the input vector."""
+        return {
+            'input_width': self.width,
+            'buckets': {
+                'count': self.n_buckets,
+                'token_pattern': TOKEN_PATTERN.pattern,
+                'lowercase': True,
+                'hash': 'crc32(utf-8) % count',
+                'value': 'log1p(count), L2-normalized over the buckets',
+                'text': 'subject, snippet and body joined with spaces',
+            },
+            'rules': {
+                'offset': self.n_buckets,
+                'features': RULE_FEATURES,
+                'source': 'lib/core/priority_classifier.dart fallback rules on subject + snippet',
+            },
+            'output': {'classes': [str(c) for c in classes], 'activation': 'softmax'},
+        }
+
+
+def write_spec(pkl_path, n_buckets, path):
+    """Write the feature spec for a student of this teacher; returns path."""
+    import joblib
+
+    classes = joblib.load(pkl_path).classes_
+    Path(path).write_text(json.dumps(StudentFeaturizer(n_buckets).spec(classes), indent=2))
+    return path
+
+
+def teacher_targets(teacher, texts, temperature=1.0):
+    """
+    Teacher class probabilities, softened by temperature.
+    Returns (targets float32 [n, k], raw probabilities [n, k]).
+    """
+    import numpy as np
+
+    proba = np.asarray(teacher.predict_proba(texts), dtype=np.float64)
+    if temperature == 1.0:
+        return proba.astype(np.float32), proba
+    logits = np.log(np.clip(proba, 1e-12, 1.0)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    soft = np.exp(logits)
+    soft /= soft.sum(axis=1, keepdims=True)
+    return soft.astype(np.float32), proba
+
+
+def build_student(tf, width, n_classes, hidden=32):
+    """Softmax head over the student features, with an optional hidden layer."""
+    layers = [tf.keras.layers.Input(shape=(width,))]
+    if hidden:
+        layers.append(tf.keras.layers.Dense(hidden, activation='relu'))
+    layers.append(tf.keras.layers.Dense(n_classes, activation='softmax'))
+    model = tf.keras.Sequential(layers)
+    model.compile(loss='categorical_crossentropy', optimizer=tf.keras.optimizers.Adam(0.005))
+    return model
+
+
+def student_weights(model):
+    """(kernel, bias) pairs of the student's dense layers."""
+    return [layer.get_weights() for layer in model.layers if layer.get_weights()]
+
+
+def student_forward(dense, features):
+    """Student probabilities with NumPy only, from student_weights()."""
+    import numpy as np
+
+    out = features
+    for i, (kernel, bias) in enumerate(dense):
+        out = out @ kernel + bias
+        if i < len(dense) - 1:
+            np.maximum(out, 0, out=out)
+    out = np.exp(out - out.max(axis=1, keepdims=True))
+    return out / out.sum(axis=1, keepdims=True)
+
+
+def compare(teacher_proba, student_proba, labels=None, classes=None):
+    """Agreement between two probability matrices (and accuracy vs labels)."""
+    import numpy as np
+
+    result = {
+        'agreement': round(float((teacher_proba.argmax(1) == student_proba.argmax(1)).mean()), 4),
+        'mean_abs_diff': round(float(np.abs(teacher_proba - student_proba).mean()), 5),
+    }
+    if labels is not None and classes is not None and all(l is not None for l in labels):
+        truth = np.array([str(l) for l in labels])
+        names = np.array([str(c) for c in classes])
+        result['teacher_accuracy'] = round(float((names[teacher_proba.argmax(1)] == truth).mean()), 4)
+        result['student_accuracy'] = round(float((names[student_proba.argmax(1)] == truth).mean()), 4)
+    return result
+
+
+def distill(pkl_path, corpus_path, settings=None):
+    """
+    Train a student on the teacher's predictions over a corpus.
+    Returns (model, featurizer, report, holdout) where holdout is a dict of
+    the held-out 'features', 'teacher_proba', 'labels' and 'texts'.
+    """
+    import joblib
+    import numpy as np
+    import tensorflow as tf
+    from email_corpus import read_records, record_text, record_label
+
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    teacher = joblib.load(pkl_path)
+    classes = list(teacher.classes_)
+
+    records = []
+    for record in read_records(corpus_path):
+        if len(records) >= settings['limit']:
+            break
+        records.append(record)
+    if len(records) < 10:
+        raise ValueError(f"Corpus too small to distill ({len(records)} records): {corpus_path}")
+
+    order = np.random.default_rng(settings['seed']).permutation(len(records))
+    n_eval = max(1, int(len(records) * settings['holdout']))
+    eval_idx, train_idx = order[:n_eval], order[n_eval:]
+    texts = [record_text(r) for r in records]
+    labels = [record_label(r) for r in records]
+
+    featurizer = StudentFeaturizer(settings['buckets'])
+    features = featurizer.transform(records)
+    targets, proba = teacher_targets(teacher, texts, settings['temperature'])
+
+    tf.keras.utils.set_random_seed(settings['seed'])
+    model = build_student(tf, featurizer.width, len(classes), settings['hidden'])
+    model.fit(features[train_idx], targets[train_idx],
+              epochs=settings['epochs'], batch_size=64, verbose=0)
+
+    eval_texts = [texts[i] for i in eval_idx]
+    eval_records = [records[i] for i in eval_idx]
+    eval_labels = [labels[i] for i in eval_idx]
+
+    dense = student_weights(model)
+    student_proba = student_forward(dense, features[eval_idx])
+
+    def student_predict(rs):
+        return student_forward(dense, featurizer.transform(rs))
+
+    # Both sides end to end from raw emails: whole held-out batch (best of
+    # three) and one email per call, which is how the app scores mail
+    teacher_s = min(_timed(teacher.predict_proba, eval_texts) for _ in range(3))
+    student_s = min(_timed(student_predict, eval_records) for _ in range(3))
+    single = min(n_eval, 200)
+    teacher_one = [_timed(teacher.predict_proba, [t]) for t in eval_texts[:single]]
+    student_one = [_timed(student_predict, [r]) for r in eval_records[:single]]
+
+    report = {
+        'teacher': str(pkl_path),
+        'corpus': str(corpus_path),
+        'settings': settings,
+        'n_train': int(len(train_idx)),
+        'n_eval': int(n_eval),
+        'input_width': featurizer.width,
+        'parameters': int(model.count_params()),
+        **compare(proba[eval_idx], student_proba, eval_labels, classes),
+        'batch_us_per_email': {
+            'teacher': round(teacher_s / n_eval * 1e6, 2),
+            'student': round(student_s / n_eval * 1e6, 2),
+        },
+        'single_email_p50_us': {
+            'teacher': round(float(np.median(teacher_one)) * 1e6, 2),
+            'student': round(float(np.median(student_one)) * 1e6, 2),
+        },
+    }
+    holdout = {
+        'features': features[eval_idx],
+        'teacher_proba': proba[eval_idx],
+        'labels': eval_labels,
+        'classes': classes,
+    }
+    return model, featurizer, report, holdout
+
+
+def _timed(fn, arg):
+    start = time.perf_counter()
+    fn(arg)
+    return time.perf_counter() - start
+
+
+def print_report(report, out=sys.stdout):
+    """Human-readable summary of a distill() report."""
+    print(f"→ Student: {report['input_width']} inputs, {report['parameters']} parameters, "
+          f"trained on {report['n_train']} emails", file=out)
+    print(f"→ Held-out emails: {report['n_eval']}", file=out)
+    print(f"→ Agreement with teacher: {report['agreement']:.2%} "
+          f"(mean |Δp| {report['mean_abs_diff']:.4f})", file=out)
+    if 'student_accuracy' in report:
+        print(f"→ Accuracy vs labels: teacher {report['teacher_accuracy']:.2%}, "
+              f"student {report['student_accuracy']:.2%}", file=out)
+    for key, title in (('batch_us_per_email', 'Batch, per email'),
+                       ('single_email_p50_us', 'One email per call, p50')):
+        times = report[key]
+        print(f"→ {title}: teacher {times['teacher']:.1f} µs, student {times['student']:.1f} µs "
+              f"({times['teacher'] / times['student']:.1f}x)", file=out)
+
+
+def main():
+    """Distill the pickled classifier and print the agreement report."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Distill priority_classifier.pkl into a small student')
+    parser.add_argument('--input', default='priority_classifier.pkl', help='Teacher pickle')
+    parser.add_argument('--corpus', required=True, help='Email corpus (JSONL)')
+    parser.add_argument('--buckets', type=int, default=DEFAULT_SETTINGS['buckets'],
+                        help='Hashed token buckets (default: 512)')
+    parser.add_argument('--hidden', type=int, default=DEFAULT_SETTINGS['hidden'],
+                        help='Hidden units, 0 for a linear student (default: 32)')
+    parser.add_argument('--epochs', type=int, default=DEFAULT_SETTINGS['epochs'],
+                        help='Training epochs (default: 30)')
+    parser.add_argument('--temperature', type=float, default=DEFAULT_SETTINGS['temperature'],
+                        help='Soften teacher probabilities (default: 1.0)')
+    parser.add_argument('--limit', type=int, default=DEFAULT_SETTINGS['limit'],
+                        help='Use at most this many corpus emails (default: 20000)')
+    parser.add_argument('--report', help='Write the report as JSON here')
+    parser.add_argument('--spec', help='Write the student feature spec as JSON here')
+
+    args = parser.parse_args()
+
+    for path in (args.input, args.corpus):
+        if not Path(path).exists():
+            print(f"✗ File not found: {path}", file=sys.stderr)
+            return 1
+
+    settings = {
+        'buckets': args.buckets,
+        'hidden': args.hidden,
+        'epochs': args.epochs,
+        'temperature': args.temperature,
+        'limit': args.limit,
+    }
+    _, featurizer, report, holdout = distill(args.input, args.corpus, settings)
+    print_report(report)
+
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2))
+        print(f"✓ Report written to {args.report}")
+    if args.spec:
+        Path(args.spec).write_text(json.dumps(featurizer.spec(holdout['classes']), indent=2))
+        print(f"✓ Feature spec written to {args.spec}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Columnar Corpus
+
+Pre-tokenized, memory-mappable form of a JSONL email corpus (see
+email_corpus.py). Each message is run through the pickled TfidfVectorizer's
+own preprocessor, tokenizer and stop-word list once, at build time. After
+that, experiments read token ids straight from disk instead of
+re-tokenizing raw text on every run.
+
+A prepared corpus is a directory of flat little-endian arrays plus
+meta.json:
+
+    meta.json         row count, analyzer settings, column dtypes/lengths
+    vocab.json        token strings, indexed by token id
+    tokens.bin        int32   stop-word-filtered token ids, all docs back to back
+    offsets.bin       int64   [n + 1] doc i owns tokens[offsets[i]:offsets[i + 1]]
+    label.bin         int16   priority label (-1 when unlabelled)
+    domain.bin        int32   sender domain id into domains.json (-1 when unknown)
+    gmail_labels.bin  int16   Gmail label ids into gmail_labels.json
+    gmail_offsets.bin int64   [n + 1] ragged offsets into gmail_labels.bin
+    id_bytes.bin      uint8   UTF-8 message ids, back to back
+    id_offsets.bin    int64   [n + 1] ragged offsets into id_bytes.bin
+
+ColumnarCorpus.batches() yields Batch objects whose arrays are views into
+the memory maps, so iterating copies nothing. VectorizerMap turns a batch
+into exactly the matrix vectorizer.transform() would give for the raw text
+(unigrams and bigrams are looked up from token ids; no regex runs).
+Batch.texts() rebuilds a text per message that the vectorizer maps to the
+same features, for backends that only take strings.
+
+email_corpus.load_texts() and iter_batches() accept a prepared directory
+wherever they accept a JSONL file, so benchmark_backends.py,
+convert_model.py --corpus and vocab_pruning.py can read it unchanged.
+
+Usage:
+    python3 email_columns.py --input emails.jsonl --output emails.cols
+                             [--pickle priority_classifier.pkl] [--verify]
+    python3 email_columns.py --corpus emails.cols --verify --input emails.jsonl
+        (check feature parity with vectorizer.transform and time both paths)
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+
+
+FORMAT_VERSION = 1
+META_NAME = 'meta.json'
+
+COLUMNS = {
+    'tokens': 'int32',
+    'offsets': 'int64',
+    'label': 'int16',
+    'domain': 'int32',
+    'gmail_labels': 'int16',
+    'gmail_offsets': 'int64',
+    'id_bytes': 'uint8',
+    'id_offsets': 'int64',
+}
+
+DEFAULT_BATCH_SIZE = 4096
+
+
+def is_columnar(path):
+    """True when `path` is a directory written by build()."""
+    return (Path(path) / META_NAME).is_file()
+
+
+def sender_domain(sender):
+    """'Boss <boss@Corp.com>' → 'corp.com' ('' when there is no address)."""
+    address = sender.rsplit('<', 1)[-1].rstrip('> ').strip()
+    _, at, domain = address.rpartition('@')
+    return domain.lower() if at else ''
+
+
+def analyzer_settings(vectorizer):
+    """The vectorizer parameters the stored token ids depend on."""
+    return {
+        'lowercase': bool(vectorizer.lowercase),
+        'token_pattern': vectorizer.token_pattern,
+        'stop_words': sorted(vectorizer.get_stop_words() or ()),
+        'strip_accents': vectorizer.strip_accents,
+    }
+
+
+class _ColumnWriter:
+    """Appends one typed column to a raw .bin file."""
+
+    def __init__(self, path, dtype):
+        import numpy as np
+
+        self.np = np
+        self.dtype = dtype
+        self.file = open(path, 'wb')
+        self.length = 0
+
+    def append(self, values):
+        if isinstance(values, (bytes, bytearray)):
+            array = self.np.frombuffer(values, dtype=self.dtype)
+        else:
+            array = self.np.asarray(values, dtype=self.dtype)
+        self.file.write(array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes())
+        self.length += array.size
+
+    def close(self):
+        self.file.close()
+
+
+def build(corpus_path, out_dir, pkl_path='priority_classifier.pkl', chunk_size=2048):
+    """
+    Tokenize a JSONL corpus (or snapshot store) once and write the columnar layout to out_dir.
+    Returns the meta dict.
+    """
+    import joblib
+    from email_corpus import read_records, record_text, record_label
+
+    pipeline = joblib.load(pkl_path)
+    vectorizer = pipeline.steps[0][1] if hasattr(pipeline, 'steps') else pipeline
+    if getattr(vectorizer, 'analyzer', None) != 'word' or vectorizer.tokenizer is not None:
+        raise ValueError("Only the default word analyzer can be pre-tokenized")
+    preprocess = vectorizer.build_preprocessor()
+    tokenize = vectorizer.build_tokenizer()
+    stop_words = vectorizer.get_stop_words() or frozenset()
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    writers = {name: _ColumnWriter(out / f"{name}.bin", dtype) for name, dtype in COLUMNS.items()}
+    vocab, domains, gmail_labels = {}, {}, {}
+    n_docs = n_tokens = n_gmail = n_id_bytes = 0
+    writers['offsets'].append([0])
+    writers['gmail_offsets'].append([0])
+    writers['id_offsets'].append([0])
+
+    def flush(chunk):
+        nonlocal n_docs, n_tokens, n_gmail, n_id_bytes
+        token_ids, offsets, labels, doc_domains = [], [], [], []
+        label_ids, label_offsets, id_bytes, id_offsets = [], [], bytearray(), []
+        for record in chunk:
+            for token in tokenize(preprocess(record_text(record))):
+                if token not in stop_words:
+                    token_ids.append(vocab.setdefault(token, len(vocab)))
+            offsets.append(n_tokens + len(token_ids))
+
+            label = record_label(record)
+            labels.append(-1 if label is None else int(label))
+            domain = sender_domain(str(record.get('from') or ''))
+            doc_domains.append(domains.setdefault(domain, len(domains)) if domain else -1)
+
+            for name in record.get('labels') or ():
+                label_ids.append(gmail_labels.setdefault(str(name), len(gmail_labels)))
+            label_offsets.append(n_gmail + len(label_ids))
+
+            id_bytes += str(record.get('id') or '').encode('utf-8')
+            id_offsets.append(n_id_bytes + len(id_bytes))
+
+        writers['tokens'].append(token_ids)
+        writers['offsets'].append(offsets)
+        writers['label'].append(labels)
+        writers['domain'].append(doc_domains)
+        writers['gmail_labels'].append(label_ids)
+        writers['gmail_offsets'].append(label_offsets)
+        writers['id_bytes'].append(bytes(id_bytes))
+        writers['id_offsets'].append(id_offsets)
+        n_docs += len(chunk)
+        n_tokens += len(token_ids)
+        n_gmail += len(label_ids)
+        n_id_bytes += len(id_bytes)
+
+    try:
+        chunk = []
+        for record in read_records(corpus_path):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if len(vocab) > 2 ** 31 - 1 or len(gmail_labels) > 2 ** 15 - 1:
+        raise ValueError("Corpus vocabulary too large for the int32/int16 id columns")
+
+    (out / 'vocab.json').write_text(json.dumps(list(vocab), ensure_ascii=False), encoding='utf-8')
+    (out / 'domains.json').write_text(json.dumps(list(domains)), encoding='utf-8')
+    (out / 'gmail_labels.json').write_text(json.dumps(list(gmail_labels)), encoding='utf-8')
+    meta = {
+        'version': FORMAT_VERSION,
+        'source': str(corpus_path),
+        'rows': n_docs,
+        'analyzer': analyzer_settings(vectorizer),
+        'columns': {name: [dtype, writers[name].length] for name, dtype in COLUMNS.items()},
+    }
+    (out / META_NAME).write_text(json.dumps(meta, indent=2), encoding='utf-8')
+    return meta
+
+
+class Batch:
+    """A contiguous run of messages [start, stop); every array is a view."""
+
+    __slots__ = ('corpus', 'start', 'stop', 'offsets', 'tokens', 'label', 'domain')
+
+    def __init__(self, corpus, start, stop):
+        self.corpus = corpus
+        self.start = start
+        self.stop = stop
+        # Absolute offsets: doc i's tokens are tokens[offsets[i] - offsets[0]:...]
+        self.offsets = corpus.offsets[start:stop + 1]
+        self.tokens = corpus.tokens[self.offsets[0]:self.offsets[-1]]
+        self.label = corpus.label[start:stop]
+        self.domain = corpus.domain[start:stop]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def doc_tokens(self, i):
+        """Token ids of the batch's i-th message (a view)."""
+        base = self.offsets[0]
+        return self.tokens[self.offsets[i] - base:self.offsets[i + 1] - base]
+
+    def ids(self):
+        """Message ids of the batch, decoded."""
+        return self.corpus.ids(self.start, self.stop)
+
+    def labels(self):
+        """Priority labels as a list, None where unlabelled."""
+        return [None if value < 0 else int(value) for value in self.label]
+
+    def texts(self):
+        """Space-joined tokens per message; vectorizer.transform() maps them to the same features."""
+        vocab = self.corpus.vocab
+        return [' '.join(vocab[t] for t in self.doc_tokens(i).tolist()) for i in range(len(self))]
+
+
+class ColumnarCorpus:
+    """Read-only view of a directory written by build()."""
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.path = Path(path)
+        self.meta = json.loads((self.path / META_NAME).read_text(encoding='utf-8'))
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported columnar format {self.meta.get('version')}")
+        for name, (dtype, length) in self.meta['columns'].items():
+            dtype = np.dtype(dtype).newbyteorder('<')
+            if length:
+                column = np.memmap(self.path / f"{name}.bin", dtype=dtype, mode='r', shape=(length,))
+            else:
+                column = np.zeros(0, dtype=dtype)
+            setattr(self, name, column)
+        self._vocab = None
+
+    def __len__(self):
+        return self.meta['rows']
+
+    @property
+    def vocab(self):
+        if self._vocab is None:
+            self._vocab = json.loads((self.path / 'vocab.json').read_text(encoding='utf-8'))
+        return self._vocab
+
+    def domains(self):
+        return json.loads((self.path / 'domains.json').read_text(encoding='utf-8'))
+
+    def gmail_label_names(self):
+        return json.loads((self.path / 'gmail_labels.json').read_text(encoding='utf-8'))
+
+    def ids(self, start, stop):
+        """Decoded message ids for rows [start, stop)."""
+        offsets = self.id_offsets[start:stop + 1].tolist()
+        raw = bytes(self.id_bytes[offsets[0]:offsets[-1]])
+        base = offsets[0]
+        return [raw[a - base:b - base].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+
+    def gmail_labels_of(self, i):
+        """Gmail label ids of row i (a view)."""
+        return self.gmail_labels[self.gmail_offsets[i]:self.gmail_offsets[i + 1]]
+
+    def batches(self, batch_size=DEFAULT_BATCH_SIZE, start=0, stop=None):
+        """Yield Batch views of at most batch_size rows over [start, stop)."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for first in range(start, stop, max(batch_size, 1)):
+            yield Batch(self, first, min(first + batch_size, stop))
+
+    def vectorizer_map(self, vectorizer):
+        """VectorizerMap from this corpus's token ids to `vectorizer`'s columns."""
+        return VectorizerMap(self, vectorizer)
+
+
+class VectorizerMap:
+    """
+    Maps corpus token ids (and adjacent pairs) to a fitted TfidfVectorizer's
+    feature columns, so batches can be featurized without re-tokenizing.
+    """
+
+    def __init__(self, corpus, vectorizer):
+        import numpy as np
+
+        if analyzer_settings(vectorizer) != corpus.meta['analyzer']:
+            raise ValueError("Vectorizer analyzer settings differ from the ones the corpus was built with")
+        low, high = vectorizer.ngram_range
+        if low != 1 or high not in (1, 2):
+            raise ValueError(f"Unsupported ngram_range {vectorizer.ngram_range}")
+
+        self.np = np
+        self.vectorizer = vectorizer
+        self.width = len(vectorizer.vocabulary_)
+        token_ids = {token: i for i, token in enumerate(corpus.vocab)}
+        self.n_tokens = max(len(token_ids), 1)
+        self.unigram = np.full(self.n_tokens, -1, dtype=np.int64)
+        pair_keys, pair_cols = [], []
+        for term, column in vectorizer.vocabulary_.items():
+            parts = term.split(' ')
+            if len(parts) == 1 and term in token_ids:
+                self.unigram[token_ids[term]] = column
+            elif len(parts) == 2 and parts[0] in token_ids and parts[1] in token_ids:
+                pair_keys.append(token_ids[parts[0]] * self.n_tokens + token_ids[parts[1]])
+                pair_cols.append(column)
+        order = np.argsort(pair_keys)
+        self.pair_keys = np.asarray(pair_keys, dtype=np.int64)[order]
+        self.pair_cols = np.asarray(pair_cols, dtype=np.int64)[order]
+        self.bigrams = high == 2 and len(self.pair_keys) > 0
+
+    def counts(self, batch):
+        """Term-count CSR matrix [len(batch), width], like CountVectorizer.transform."""
+        import scipy.sparse as sp
+
+        np = self.np
+        tokens = np.asarray(batch.tokens, dtype=np.int64)
+        doc = np.repeat(np.arange(len(batch)), np.diff(batch.offsets))
+
+        cols = self.unigram[tokens]
+        hit = cols >= 0
+        rows, cols = [doc[hit]], [cols[hit]]
+        if self.bigrams and tokens.size > 1:
+            same_doc = doc[:-1] == doc[1:]
+            keys = tokens[:-1][same_doc] * self.n_tokens + tokens[1:][same_doc]
+            at = np.minimum(np.searchsorted(self.pair_keys, keys), len(self.pair_keys) - 1)
+            found = self.pair_keys[at] == keys
+            rows.append(doc[:-1][same_doc][found])
+            cols.append(self.pair_cols[at[found]])
+
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        matrix = sp.csr_matrix((np.ones(rows.size), (rows, cols)),
+                               shape=(len(batch), self.width), dtype=np.float64)
+        matrix.sum_duplicates()
+        return matrix
+
+    def transform(self, batch):
+        """Same matrix as vectorizer.transform() on the batch's original texts."""
+        import scipy.sparse as sp
+        from sklearn.preprocessing import normalize
+
+        vectorizer = self.vectorizer
+        matrix = self.counts(batch)
+        if vectorizer.binary:
+            matrix.data[:] = 1.0
+        if vectorizer.sublinear_tf:
+            self.np.log(matrix.data, out=matrix.data)
+            matrix.data += 1.0
+        if vectorizer.use_idf:
+            matrix = matrix @ sp.diags(vectorizer.idf_)
+        if vectorizer.norm:
+            matrix = normalize(matrix, norm=vectorizer.norm, copy=False)
+        return matrix.tocsr()
+
+
+def iter_text_batches(path, batch_size=512):
+    """
+    email_corpus.iter_batches() over a prepared corpus.
+    Yields (records, texts, labels) with id / labels / label / text records.
+    """
+    corpus = ColumnarCorpus(path)
+    label_names = corpus.gmail_label_names()
+    for batch in corpus.batches(batch_size):
+        texts, labels = batch.texts(), batch.labels()
+        records = [
+            {'id': msg_id, 'text': text, 'label': label,
+             'labels': [label_names[j] for j in corpus.gmail_labels_of(batch.start + i).tolist()]}
+            for i, (msg_id, text, label) in enumerate(zip(batch.ids(), texts, labels))
+        ]
+        yield records, texts, labels
+
+
+def verify(corpus_dir, jsonl_path, pkl_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Featurize both forms of the corpus and compare.
+    Returns a dict with rows, max_abs_diff, text_max_abs_diff and timings.
+    """
+    import joblib
+    import scipy.sparse as sp
+    from email_corpus import load_texts
+
+    pipeline = joblib.load(pkl_path)
+    vectorizer = pipeline.steps[0][1]
+
+    start = time.perf_counter()
+    texts, _ = load_texts(jsonl_path)
+    reference = vectorizer.transform(texts)
+    raw_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    corpus = ColumnarCorpus(corpus_dir)
+    mapping = corpus.vectorizer_map(vectorizer)
+    columnar = sp.vstack([mapping.transform(batch) for batch in corpus.batches(batch_size)]).tocsr()
+    columnar_s = time.perf_counter() - start
+
+    rebuilt = vectorizer.transform([t for batch in corpus.batches(batch_size) for t in batch.texts()])
+    if reference.shape != columnar.shape:
+        raise ValueError(f"Row count differs: {reference.shape[0]} JSONL vs {columnar.shape[0]} columnar")
+
+    def max_diff(a, b):
+        diff = abs(a - b)
+        return float(diff.max()) if diff.nnz else 0.0
+
+    return {
+        'rows': reference.shape[0],
+        'max_abs_diff': max_diff(reference, columnar),
+        'text_max_abs_diff': max_diff(reference, rebuilt),
+        'raw_s': raw_s,
+        'columnar_s': columnar_s,
+        'speedup': raw_s / columnar_s if columnar_s > 0 else float('inf'),
+        'bytes': sum(p.stat().st_size for p in Path(corpus_dir).iterdir()),
+        'source_bytes': Path(jsonl_path).stat().st_size,
+    }
+
+
+def main():
+    """Build a columnar corpus and/or verify it against its JSONL source."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pre-tokenize an email corpus into memory-mappable columns')
+    parser.add_argument('--input', help='JSONL corpus to read')
+    parser.add_argument('--output', help='Directory to write the columnar corpus to')
+    parser.add_argument('--corpus', help='Existing columnar corpus (for --verify without rebuilding)')
+    parser.add_argument('--pickle', default='priority_classifier.pkl',
+                        help='Pickle whose vectorizer defines tokenization (default: priority_classifier.pkl)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Check features match vectorizer.transform on --input and time both')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows per batch when verifying (default: {DEFAULT_BATCH_SIZE})")
+
+    args = parser.parse_args()
+
+    if not args.input or not (args.output or args.corpus):
+        parser.error('--input and one of --output / --corpus are required')
+    for path in (args.input, args.pickle):
+        if not Path(path).exists():
+            print(f"✗ File not found: {path}", file=sys.stderr)
+            return 1
+
+    corpus_dir = args.corpus
+    if args.output:
+        start = time.perf_counter()
+        try:
+            meta = build(args.input, args.output, args.pickle)
+        except ValueError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            return 1
+        tokens = meta['columns']['tokens'][1]
+        print(f"✓ Wrote {meta['rows']} emails ({tokens:,} tokens) to {args.output} "
+              f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        corpus_dir = args.output
+
+    if args.verify:
+        if not is_columnar(corpus_dir):
+            print(f"✗ Not a columnar corpus: {corpus_dir}", file=sys.stderr)
+            return 1
+        report = verify(corpus_dir, args.input, args.pickle, max(args.batch_size, 1))
+        print(f"  JSONL + vectorizer.transform: {report['raw_s']:.3f}s", file=sys.stderr)
+        print(f"  columnar + VectorizerMap:     {report['columnar_s']:.3f}s "
+              f"({report['speedup']:.1f}x)", file=sys.stderr)
+        print(f"  size: {report['bytes']:,} bytes vs {report['source_bytes']:,} JSONL", file=sys.stderr)
+        if report['max_abs_diff'] > 1e-9 or report['text_max_abs_diff'] > 1e-9:
+            print(f"✗ Features differ from vectorizer.transform (max abs diff "
+                  f"{max(report['max_abs_diff'], report['text_max_abs_diff']):.3g})", file=sys.stderr)
+            return 1
+        print(f"✓ {report['rows']} rows match vectorizer.transform", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Email Corpus Helpers
+
+Shared readers for the labelled email corpora used by the conversion,
+benchmark and training scripts. A corpus is a JSONL file with one message
+per line, using the same keys as EmailMetadata.toJson() plus optional
+'body', 'text' and 'label' fields:
+
+    {"id": "18c2...", "subject": "Q1 report due", "from": "boss@corp.com",
+     "snippet": "Please submit...", "labels": ["INBOX"], "label": 2}
+
+'text' wins when present; otherwise subject, snippet and body are joined.
+'label' is the priority class the model predicts (as stored in the pickle).
+
+iter_batches() and load_texts() also accept a pre-tokenized directory built
+by email_columns.py. Its texts are the stored tokens joined by spaces, which
+the pickled vectorizer maps to the same features as the original text.
+read_records() also accepts a snapshot_store.py directory.
+"""
+
+import json
+
+
+def read_jsonl(path):
+    """Yield one dict per non-blank line of a JSONL file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e})") from e
+
+
+def read_records(path):
+    """Yield the records of a JSONL file or a snapshot store directory."""
+    from snapshot_store import is_snapshot_store, read_store
+
+    if is_snapshot_store(path):
+        return read_store(path)
+    return read_jsonl(path)
+
+
+def record_text(record):
+    """Text the classifier sees for one corpus record."""
+    text = record.get('text')
+    if text is not None:
+        return str(text)
+    parts = [record.get('subject'), record.get('snippet'), record.get('body')]
+    return ' '.join(str(p) for p in parts if p)
+
+
+def record_label(record):
+    """Priority label of a record, or None when unlabelled."""
+    return record.get('label')
+
+
+def iter_batches(path, batch_size=512):
+    """
+    Stream a corpus in fixed-size chunks.
+    Yields (records, texts, labels) lists of at most batch_size items.
+    """
+    from email_columns import is_columnar, iter_text_batches
+
+    if is_columnar(path):
+        yield from iter_text_batches(path, batch_size)
+        return
+
+    records = []
+    for record in read_records(path):
+        records.append(record)
+        if len(records) >= batch_size:
+            yield records, [record_text(r) for r in records], [record_label(r) for r in records]
+            records = []
+    if records:
+        yield records, [record_text(r) for r in records], [record_label(r) for r in records]
+
+
+def load_texts(path, limit=None):
+    """
+    Read a corpus into memory.
+    Returns (texts, labels) lists, truncated to limit records if given.
+    """
+    from email_columns import is_columnar, ColumnarCorpus
+
+    if is_columnar(path):
+        corpus = ColumnarCorpus(path)
+        texts, labels = [], []
+        for batch in corpus.batches(start=0, stop=limit):
+            texts.extend(batch.texts())
+            labels.extend(batch.labels())
+        return texts, labels
+
+    texts, labels = [], []
+    for record in read_records(path):
+        if limit is not None and len(texts) >= limit:
+            break
+        texts.append(record_text(record))
+        labels.append(record_label(record))
+    return texts, labels
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Fast Analyzer
+
+Drop-in replacement for a fitted TfidfVectorizer's word analyzer plus
+vocabulary lookup. It gives the same vocabulary-index output as
+build_analyzer() followed by vocabulary_.get(), for whole batches at once.
+
+sklearn runs the token regex once per document, then filters stop words,
+joins every n-gram into a string and looks each one up in a dict, all in
+Python. FastAnalyzer instead:
+
+  1. joins the batch with '\\0' separators, lowercases it once and runs one
+     findall() with the token pattern (plus the separator as an extra
+     alternative, so document boundaries survive); all-ASCII batches with
+     the default pattern are scanned as bytes. Patterns that can match the
+     separator (r'\\S+') and batches containing NUL fall back to one
+     findall() per document
+  2. maps every token to an integer id in one C-level map(dict.get) pass:
+     tokens that occur in some vocabulary term get a dense id, stop words
+     are dropped, anything else becomes -1
+  3. builds n-grams as int64 keys (id_1 * N + id_2 ...) over the id array
+     with NumPy. A window containing a separator or an unknown token can
+     never be a vocabulary term, so no strings are joined. Keys are
+     resolved with searchsorted on the sorted vocabulary keys
+
+Scratch arrays are kept between batches and only grow. Only the regex and
+NumPy are needed, so tfidf_artifact.py uses it as well.
+
+Usage:
+    python3 fast_analyzer.py --corpus emails.jsonl [--pickle priority_classifier.pkl]
+                             [--repeat 20] [--batch-size 4096]
+        (parity check against build_analyzer() / transform(), then a throughput
+         benchmark on the corpus repeated --repeat times)
+"""
+
+import re
+import sys
+import time
+from itertools import repeat
+from pathlib import Path
+
+
+SEPARATOR = '\x00'
+UNKNOWN, STOP, BOUNDARY = -1, -2, -3
+DEFAULT_BATCH_SIZE = 4096
+
+# sklearn's default pattern: \b\w\w+\b only ever matches maximal runs of
+# word characters, which \w{2,} finds faster. On all-ASCII batches the bytes
+# form is used (ASCII \w and Unicode \w agree on ASCII text).
+DEFAULT_TOKEN_PATTERN = r'(?u)\b\w\w+\b'
+DEFAULT_PATTERN_FAST = (r'\w{2,}|\x00', rb'\w{2,}|\x00')
+
+# A token pattern that matches one of these across or on the NUL would join
+# tokens from neighbouring documents, so such patterns are analyzed per document
+SEPARATOR_PROBES = ('\x00', 'a\x00b', 'ab\x00cd')
+
+# Edge cases the parity check always runs besides the corpus
+PARITY_SAMPLES = [
+    '',
+    'the and of to',
+    'URGENT: Q3 report due by Friday!!',
+    'Meeting re-scheduled to 10/12 — call me ASAP',
+    'snake_case tokens_and 42 digits 007 x y z',
+    'Ünïcödé Straße ΣΟΦΊΑ ΟΔΟΣ naïve café',
+    'null\x00byte inside\x00 the text',
+    'a b c d e f g',
+    'interview interview offer offer interview offer',
+    'newline\nseparated\ttabs\r\nand   spaces',
+]
+
+
+class _Workspace:
+    """Reusable scratch arrays that grow to the largest batch seen."""
+
+    def __init__(self, np):
+        self.np = np
+        self.buffers = {}
+
+    def take(self, name, size, dtype):
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = self.np.empty(max(size, 1024) * 2, dtype=dtype)
+            self.buffers[name] = buffer
+        return buffer[:size]
+
+
+class FastAnalyzer:
+    """
+    Batched word analyzer over integer token ids.
+
+    vocabulary maps n-gram strings (space-joined, as in vocabulary_) to
+    column indices. The other arguments mirror TfidfVectorizer.
+    """
+
+    def __init__(self, vocabulary, token_pattern=r'(?u)\b\w\w+\b', lowercase=True,
+                 stop_words=(), ngram_range=(1, 1)):
+        import numpy as np
+
+        self.np = np
+        pattern = re.compile(token_pattern)
+        if pattern.groups > 1:
+            raise ValueError("token_pattern may not have more than one capturing group")
+        # Global flags such as (?u) must stay at the start, so pass them separately
+        body = re.sub(r'^\(\?[aiLmsux]+\)', '', token_pattern)
+        if pattern.groups == 0:
+            self._token_re = re.compile(f"(?:{body})|{SEPARATOR}", pattern.flags)
+        else:
+            # With one group findall returns the group, as sklearn's tokenizer does
+            self._token_re = re.compile(f"(?:{body})|({SEPARATOR})", pattern.flags)
+        self._has_group = pattern.groups == 1
+        self._pattern = pattern
+        self._per_document = any(SEPARATOR in match.group(0)
+                                 for probe in SEPARATOR_PROBES
+                                 for match in pattern.finditer(probe))
+        self._ascii_re = None
+        if token_pattern == DEFAULT_TOKEN_PATTERN:
+            self._token_re = re.compile(DEFAULT_PATTERN_FAST[0])
+            self._ascii_re = re.compile(DEFAULT_PATTERN_FAST[1])
+        self.lowercase = lowercase
+        self.min_n, self.max_n = ngram_range
+        if self.min_n < 1 or self.max_n < self.min_n:
+            raise ValueError(f"Invalid ngram_range {ngram_range}")
+        self.width = len(vocabulary)
+
+        # Dense ids for every token that is part of some vocabulary term
+        token_ids = {}
+        grams = []
+        for term, column in vocabulary.items():
+            parts = term.split(' ')
+            if self.min_n <= len(parts) <= self.max_n:
+                grams.append(([token_ids.setdefault(p, len(token_ids)) for p in parts], column))
+        self.n_ids = max(len(token_ids), 1)
+        if self.n_ids ** self.max_n >= 2 ** 63:
+            raise ValueError("Vocabulary too large for int64 n-gram keys")
+
+        self.table = dict.fromkeys(stop_words, STOP)
+        self.table.update(token_ids)
+        self.table[SEPARATOR] = BOUNDARY
+        self.ascii_table = {t.encode('ascii'): v for t, v in self.table.items() if t.isascii()}
+
+        self.unigram = np.full(self.n_ids, -1, dtype=np.int64)
+        by_n = {}
+        for ids, column in grams:
+            if len(ids) == 1:
+                self.unigram[ids[0]] = column
+            else:
+                key = 0
+                for token_id in ids:
+                    key = key * self.n_ids + token_id
+                by_n.setdefault(len(ids), []).append((key, column))
+        self.ngram_keys = {}
+        for n, pairs in by_n.items():
+            pairs.sort()
+            self.ngram_keys[n] = (np.array([k for k, _ in pairs], dtype=np.int64),
+                                  np.array([c for _, c in pairs], dtype=np.int64))
+        self.workspace = _Workspace(np)
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        """FastAnalyzer equivalent to a fitted TfidfVectorizer / CountVectorizer."""
+        if vectorizer.analyzer != 'word' or vectorizer.tokenizer is not None:
+            raise ValueError("Only the default word analyzer is supported")
+        if vectorizer.preprocessor is not None or vectorizer.strip_accents is not None:
+            raise ValueError("Custom preprocessors and strip_accents are not supported")
+        return cls(vectorizer.vocabulary_, vectorizer.token_pattern, vectorizer.lowercase,
+                   vectorizer.get_stop_words() or (), vectorizer.ngram_range)
+
+    def token_ids(self, texts):
+        """
+        Token-id stream for a batch: dense ids, UNKNOWN for out-of-vocabulary
+        tokens and BOUNDARY between documents. Stop words are removed.
+        """
+        np = self.np
+        if self._per_document:
+            return self._document_token_ids(texts)
+        joined = SEPARATOR.join(texts)
+        if joined.count(SEPARATOR) != max(len(texts) - 1, 0):
+            # Some document contains NUL itself
+            return self._document_token_ids(texts)
+        if self.lowercase:
+            joined = joined.lower()
+        if self._ascii_re is not None and joined.isascii():
+            tokens = self._ascii_re.findall(joined.encode('ascii'))
+            table = self.ascii_table
+        else:
+            tokens = self._token_re.findall(joined)
+            table = self.table
+        if self._has_group:
+            tokens = [a or b for a, b in tokens]
+
+        ids = np.fromiter(map(table.get, tokens, repeat(UNKNOWN)),
+                          dtype=np.int64, count=len(tokens))
+        return ids[ids != STOP]
+
+    def _document_token_ids(self, texts):
+        """token_ids() for patterns that can match NUL: one findall() per document."""
+        table = self.table
+        ids = []
+        for i, text in enumerate(texts):
+            if i:
+                ids.append(BOUNDARY)
+            if self.lowercase:
+                text = text.lower()
+            # A token that is itself NUL is unknown here, not a boundary
+            ids.extend(UNKNOWN if token == SEPARATOR else table.get(token, UNKNOWN)
+                       for token in self._pattern.findall(text))
+        ids = self.np.array(ids, dtype=self.np.int64)
+        return ids[ids != STOP]
+
+    def analyze(self, texts):
+        """
+        Vocabulary columns of every in-vocabulary n-gram in a batch.
+        Returns (rows, cols) int64 arrays with one entry per occurrence.
+        """
+        np = self.np
+        seq = self.token_ids(texts)
+        size = seq.size
+        doc = self.workspace.take('doc', size, np.int64)
+        np.cumsum(seq == BOUNDARY, out=doc)
+        valid = self.workspace.take('valid', size, np.bool_)
+        np.greater_equal(seq, 0, out=valid)
+
+        rows, cols = [], []
+        if self.min_n == 1 and size:
+            columns = self.unigram[np.where(valid, seq, 0)]
+            hit = valid & (columns >= 0)
+            rows.append(doc[hit])
+            cols.append(columns[hit])
+
+        key = self.workspace.take('key', size, np.int64)
+        window = self.workspace.take('window', size, np.bool_)
+        for n in range(max(self.min_n, 2), self.max_n + 1):
+            m = size - n + 1
+            if m <= 0 or n not in self.ngram_keys:
+                continue
+            keys, columns = self.ngram_keys[n]
+            k, ok = key[:m], window[:m]
+            np.copyto(k, seq[:m])
+            np.copyto(ok, valid[:m])
+            for offset in range(1, n):
+                np.multiply(k, self.n_ids, out=k)
+                np.add(k, seq[offset:offset + m], out=k)
+                np.logical_and(ok, valid[offset:offset + m], out=ok)
+            at = np.searchsorted(keys, k[ok])
+            at = np.minimum(at, len(keys) - 1)
+            found = keys[at] == k[ok]
+            rows.append(doc[:m][ok][found])
+            cols.append(columns[at[found]])
+
+        if not rows:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty.copy()
+        return np.concatenate(rows), np.concatenate(cols)
+
+    def counts(self, texts):
+        """Term-count CSR matrix, like CountVectorizer.transform()."""
+        import scipy.sparse as sp
+
+        rows, cols = self.analyze(texts)
+        matrix = sp.csr_matrix((self.np.ones(rows.size), (rows, cols)),
+                               shape=(len(texts), self.width), dtype=self.np.float64)
+        matrix.sum_duplicates()
+        return matrix
+
+
+def tfidf_transform(analyzer, vectorizer, texts):
+    """Same matrix as vectorizer.transform(texts), via FastAnalyzer.counts()."""
+    import scipy.sparse as sp
+    from sklearn.preprocessing import normalize
+
+    matrix = analyzer.counts(texts)
+    if vectorizer.binary:
+        matrix.data[:] = 1.0
+    if vectorizer.sublinear_tf:
+        analyzer.np.log(matrix.data, out=matrix.data)
+        matrix.data += 1.0
+    if vectorizer.use_idf:
+        matrix = matrix @ sp.diags(vectorizer.idf_)
+    if vectorizer.norm:
+        matrix = normalize(matrix, norm=vectorizer.norm, copy=False)
+    return matrix.tocsr()
+
+
+def check_parity(analyzer, vectorizer, texts, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Compare against build_analyzer() + vocabulary_ per document and against
+    transform() as a matrix. Returns a list of mismatch descriptions.
+    """
+    from collections import Counter
+
+    reference = vectorizer.build_analyzer()
+    vocab = vectorizer.vocabulary_
+    mismatches = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        rows, cols = analyzer.analyze(batch)
+        fast = [Counter() for _ in batch]
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            fast[row][col] += 1
+        for i, text in enumerate(batch):
+            expected = Counter(vocab[g] for g in reference(text) if g in vocab)
+            if fast[i] != expected:
+                mismatches.append(f"doc {start + i}: {text[:60]!r} → {dict(fast[i])} != {dict(expected)}")
+
+        diff = abs(tfidf_transform(analyzer, vectorizer, batch) - vectorizer.transform(batch))
+        if diff.nnz and diff.max() > 1e-12:
+            mismatches.append(f"batch at {start}: transform differs by {diff.max():.3g}")
+    return mismatches
+
+
+def benchmark(analyzer, vectorizer, texts, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Time both analyzers and both transforms over `texts`.
+    Returns a dict of docs/sec figures and speedups.
+    """
+    reference = vectorizer.build_analyzer()
+    vocab = vectorizer.vocabulary_
+
+    def timed(fn):
+        start = time.perf_counter()
+        for first in range(0, len(texts), batch_size):
+            fn(texts[first:first + batch_size])
+        return time.perf_counter() - start
+
+    sklearn_analyze = timed(lambda batch: [[vocab.get(g) for g in reference(t)] for t in batch])
+    fast_analyze = timed(analyzer.analyze)
+    sklearn_transform = timed(vectorizer.transform)
+    fast_transform = timed(lambda batch: tfidf_transform(analyzer, vectorizer, batch))
+
+    def rate(seconds):
+        return round(len(texts) / seconds, 1) if seconds > 0 else None
+
+    return {
+        'docs': len(texts),
+        'batch_size': batch_size,
+        'analyze_docs_per_sec': {'sklearn': rate(sklearn_analyze), 'fast': rate(fast_analyze)},
+        'analyze_speedup': round(sklearn_analyze / fast_analyze, 2),
+        'transform_docs_per_sec': {'sklearn': rate(sklearn_transform), 'fast': rate(fast_transform)},
+        'transform_speedup': round(sklearn_transform / fast_transform, 2),
+    }
+
+
+def main():
+    """Check parity with the pickled vectorizer and benchmark throughput."""
+    import argparse
+    import joblib
+    from email_corpus import load_texts
+
+    parser = argparse.ArgumentParser(description='Parity check and benchmark for the fast analyzer')
+    parser.add_argument('--corpus', required=True, help='Email corpus (JSONL or email_columns.py directory)')
+    parser.add_argument('--pickle', default='priority_classifier.pkl',
+                        help='Pipeline whose vectorizer to match (default: priority_classifier.pkl)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Repeat the corpus this many times for the benchmark (default: 20)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Docs per batch (default: {DEFAULT_BATCH_SIZE})")
+
+    args = parser.parse_args()
+
+    for path in (args.corpus, args.pickle):
+        if not Path(path).exists():
+            print(f"✗ File not found: {path}", file=sys.stderr)
+            return 1
+
+    pipeline = joblib.load(args.pickle)
+    vectorizer = pipeline.steps[0][1] if hasattr(pipeline, 'steps') else pipeline
+    try:
+        analyzer = FastAnalyzer.from_vectorizer(vectorizer)
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+
+    texts = load_texts(args.corpus)[0]
+    batch_size = max(args.batch_size, 1)
+    mismatches = check_parity(analyzer, vectorizer, PARITY_SAMPLES + texts, batch_size)
+    for mismatch in mismatches[:20]:
+        print(f"✗ {mismatch}", file=sys.stderr)
+    if mismatches:
+        print(f"✗ {len(mismatches)} parity mismatches", file=sys.stderr)
+        return 1
+    print(f"✓ {len(PARITY_SAMPLES) + len(texts)} docs match build_analyzer() and transform()",
+          file=sys.stderr)
+
+    report = benchmark(analyzer, vectorizer, texts * max(args.repeat, 1), batch_size)
+    print(f"  analyze:   sklearn {report['analyze_docs_per_sec']['sklearn']:>10,.0f} docs/s   "
+          f"fast {report['analyze_docs_per_sec']['fast']:>10,.0f} docs/s   "
+          f"({report['analyze_speedup']}x)", file=sys.stderr)
+    print(f"  transform: sklearn {report['transform_docs_per_sec']['sklearn']:>10,.0f} docs/s   "
+          f"fast {report['transform_docs_per_sec']['fast']:>10,.0f} docs/s   "
+          f"({report['transform_speedup']}x)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Mail Mind TFLite Runtime Selection
+
+Picks the lightest installed package that provides a TFLite interpreter,
+so smoke tests and validation do not pay for `import tensorflow` (seconds
+and hundreds of MB) just to reach tf.lite.Interpreter:
+
+    ai_edge_litert   pip install ai-edge-litert   (LiteRT, successor of tflite-runtime)
+    tflite_runtime   pip install tflite-runtime
+    tensorflow       pip install tensorflow       (fallback)
+
+A TensorFlow that is already imported (convert_model.py after converting) is
+reused, since it is free at that point. Nothing is imported until a runtime
+is loaded; each load reports its import time and RSS.
+
+Models converted with SELECT_TF_OPS need the Flex delegate, which only
+TensorFlow ships; open_interpreter() retries those with TensorFlow.
+
+Override the choice with --runtime or MAIL_MIND_TFLITE_RUNTIME
+(auto, ai_edge_litert, tflite_runtime or tensorflow).
+
+Usage:
+    python3 lite_runtime.py [--runtime auto] [--model <path>]
+"""
+
+import os
+import sys
+import time
+
+from stage_profiler import current_rss_mb
+
+
+RUNTIMES = ('ai_edge_litert', 'tflite_runtime', 'tensorflow')
+RUNTIME_CHOICES = ('auto',) + RUNTIMES
+RUNTIME_ENV = 'MAIL_MIND_TFLITE_RUNTIME'
+INSTALL_HINT = 'pip install ai-edge-litert (or tflite-runtime, or tensorflow)'
+
+# Allocation errors of a model that needs the TensorFlow Flex delegate
+FLEX_ERRORS = ('Flex', 'Select TensorFlow op')
+
+
+def _import_ai_edge_litert():
+    from ai_edge_litert.interpreter import Interpreter
+    from importlib.metadata import version
+
+    return Interpreter, version('ai-edge-litert')
+
+
+def _import_tflite_runtime():
+    import tflite_runtime
+    from tflite_runtime.interpreter import Interpreter
+
+    return Interpreter, getattr(tflite_runtime, '__version__', None)
+
+
+def _import_tensorflow():
+    import tensorflow as tf
+
+    return tf.lite.Interpreter, tf.__version__
+
+
+IMPORTERS = {
+    'ai_edge_litert': _import_ai_edge_litert,
+    'tflite_runtime': _import_tflite_runtime,
+    'tensorflow': _import_tensorflow,
+}
+
+
+class Runtime:
+    """An imported interpreter package and what importing it cost."""
+
+    def __init__(self, name, interpreter_class, version, import_s, rss_before_mb, rss_after_mb):
+        self.name = name
+        self.Interpreter = interpreter_class
+        self.version = version
+        self.import_s = import_s
+        self.rss_before_mb = rss_before_mb
+        self.rss_after_mb = rss_after_mb
+
+    def interpreter(self, model_path=None, model_content=None, num_threads=None):
+        kwargs = {'num_threads': num_threads} if num_threads else {}
+        if model_content is not None:
+            return self.Interpreter(model_content=model_content, **kwargs)
+        return self.Interpreter(model_path=str(model_path), **kwargs)
+
+    def summary(self):
+        """One line for the startup report."""
+        line = f"{self.name} {self.version or ''}".rstrip() + f": imported in {self.import_s:.2f}s"
+        if self.rss_after_mb is not None:
+            line += f", RSS {self.rss_after_mb:.0f} MB"
+            if self.rss_before_mb is not None:
+                line += f" (+{self.rss_after_mb - self.rss_before_mb:.0f} MB)"
+        return line
+
+    def as_dict(self):
+        return {
+            'runtime': self.name,
+            'version': self.version,
+            'import_s': round(self.import_s, 4),
+            'rss_before_mb': self.rss_before_mb,
+            'rss_after_mb': self.rss_after_mb,
+        }
+
+
+_loaded = {}
+
+
+def _load(name):
+    if name not in _loaded:
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        interpreter_class, version = IMPORTERS[name]()
+        _loaded[name] = Runtime(name, interpreter_class, version, time.perf_counter() - start,
+                                rss_before, current_rss_mb())
+    return _loaded[name]
+
+
+def load_runtime(preferred=None):
+    """
+    Import and return a Runtime. preferred is a name from RUNTIMES, 'auto'
+    or None (MAIL_MIND_TFLITE_RUNTIME, else auto). Raises ImportError when
+    no candidate can be imported.
+    """
+    preferred = preferred or os.environ.get(RUNTIME_ENV) or 'auto'
+    if preferred not in RUNTIME_CHOICES:
+        raise ValueError(f"Unknown TFLite runtime: {preferred} (choose from {', '.join(RUNTIME_CHOICES)})")
+
+    if preferred != 'auto':
+        candidates = [preferred]
+    elif 'tensorflow' in sys.modules:
+        candidates = ['tensorflow']
+    else:
+        candidates = list(RUNTIMES)
+
+    errors = []
+    for name in candidates:
+        try:
+            return _load(name)
+        except ImportError as e:
+            errors.append(f"{name}: {e}")
+    raise ImportError(f"No TFLite runtime available ({'; '.join(errors)}); install with: {INSTALL_HINT}")
+
+
+def open_interpreter(model_path, preferred=None, num_threads=None):
+    """
+    (runtime, interpreter) with tensors allocated. A lightweight runtime that
+    cannot allocate a Flex (SELECT_TF_OPS) model is retried with TensorFlow
+    unless a runtime was requested explicitly.
+    """
+    runtime = load_runtime(preferred)
+    try:
+        interpreter = runtime.interpreter(model_path, num_threads=num_threads)
+        interpreter.allocate_tensors()
+        return runtime, interpreter
+    except (RuntimeError, ValueError) as e:
+        explicit = (preferred or os.environ.get(RUNTIME_ENV) or 'auto') != 'auto'
+        if runtime.name == 'tensorflow' or explicit or not any(s in str(e) for s in FLEX_ERRORS):
+            raise
+    runtime = load_runtime('tensorflow')
+    interpreter = runtime.interpreter(model_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    return runtime, interpreter
+
+
+def main():
+    """Report which runtime would be used and what loading it costs."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Select and load a TFLite interpreter runtime')
+    parser.add_argument('--runtime', choices=RUNTIME_CHOICES,
+                        help=f"Interpreter package (default: ${RUNTIME_ENV} or auto)")
+    parser.add_argument('--model', help='Also load and allocate this model')
+
+    args = parser.parse_args()
+
+    try:
+        if args.model:
+            runtime, interpreter = open_interpreter(args.model, args.runtime)
+        else:
+            runtime = load_runtime(args.runtime)
+    except ImportError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+    except (RuntimeError, ValueError) as e:
+        print(f"✗ Could not load {args.model}: {e}", file=sys.stderr)
+        return 1
+
+    print(f"✓ {runtime.summary()}", file=sys.stderr)
+    if args.model:
+        shapes = [d['shape'].tolist() for d in interpreter.get_input_details()]
+        print(f"✓ Loaded {args.model}: inputs {shapes}, RSS {current_rss_mb()} MB", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
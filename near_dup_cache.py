@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Near-Duplicate Score Cache
+
+Templated bulk mail (newsletters, notifications, receipts; the mail
+PriorityClassifier's _lowPriorityKeywords target) arrives as many copies
+that differ only in names or numbers. This module scores one copy and
+serves the rest from a bounded LRU cache.
+
+Signature stage (batched, NumPy):
+    text → lowercase, digit runs folded to '0', word tokens
+         → 64-bit hash per token (two zlib.crc32 seeds, memoised)
+         → 64-bit SimHash (per-bit majority vote over the token hashes)
+
+Lookup:
+    1. exact: (context, BLAKE2b of the normalised text) → entry
+    2. near:  LSH over SimHash bands. With max_distance = k the 64 bits are
+       split into k + 1 bands, so any signature within Hamming distance k
+       shares at least one band exactly (pigeonhole). Candidates from the
+       band buckets are checked against the full distance.
+
+Every entry also carries a scorer-specific context that must match exactly:
+    rules      important/starred flag and sender domain (inputs besides text)
+    deadlines  the date expressions in the text (d/m/yyyy, "<month> <day>",
+               "by <digit>"), so a copy with a different due date is a miss
+    model      nothing; the classifier only sees text. Digit runs that are
+               not vocabulary terms are folded without changing the features,
+               so exact hits return the cold result
+
+Entries are evicted least-recently-used beyond --capacity. Metrics count
+exact hits, near hits, misses and evictions.
+
+--check also scores every record cold and reports how often the cached
+result differs, which is the accuracy cost of serving near-duplicates.
+The key costs a few microseconds per email, so the cache pays off for the
+classifier; the rule and deadline scorers are about as cheap as the key.
+
+Usage:
+    python3 near_dup_cache.py --input mail.jsonl --scorer rules|deadlines|model
+                              [--output results.jsonl] [--capacity 10000]
+                              [--max-distance N] [--batch-size 512] [--check]
+                              [--now 2024-06-01T09:00:00] [--pickle priority_classifier.pkl]
+"""
+
+import re
+import sys
+import json
+import time
+import zlib
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+
+
+DEFAULT_CAPACITY = 10000
+# Near hits flip ~5% of the classifier's decisions on templated mail, so the
+# model defaults to exact hits only (which are lossless, see vocabulary_folder)
+DEFAULT_MAX_DISTANCE = {'rules': 3, 'deadlines': 3, 'model': 0}
+DEFAULT_BATCH_SIZE = 512
+SIGNATURE_BITS = 64
+
+BATCH_TOKEN_PATTERN = re.compile(r'\w+|\x00')
+DIGITS = re.compile(r'\d+')
+HASH_SEED = 0x9E3779B9
+SCORERS = ('rules', 'deadlines', 'model')
+
+
+def fold_digits(lowered):
+    """Fold digit runs of lowercased text, so '#1042' and '#77' look the same."""
+    return DIGITS.sub('0', lowered)
+
+
+def vocabulary_folder(vocabulary):
+    """
+    Digit folding that cannot change a TfidfVectorizer's features: numbers
+    in the vocabulary are kept, other runs become '0' (1 digit, not a token)
+    or '00' (an out-of-vocabulary token), so n-gram adjacency is unchanged.
+    """
+    kept = {token for term in vocabulary for token in term.split() if token.isdigit()}
+
+    def fold(match):
+        run = match.group()
+        return run if run in kept else ('0' if len(run) == 1 else '00')
+
+    return lambda lowered: DIGITS.sub(fold, lowered)
+
+
+def digest(norm):
+    """
+    Exact-match key of a normalised text. An exact hit is served without
+    any further check, so this is a 128-bit cryptographic hash, not a CRC.
+    """
+    return hashlib.blake2b(norm.encode('utf-8'), digest_size=16).digest()
+
+
+class SimHasher:
+    """
+    64-bit SimHash of normalised texts, batched. Token hashes are memoised,
+    since templated mail keeps reusing a small vocabulary.
+    """
+
+    def __init__(self):
+        self.token_hashes = {}
+
+    def _hash_tokens(self, tokens):
+        import numpy as np
+
+        known = self.token_hashes
+        new = [t for t in set(tokens) if t not in known]
+        for token in new:
+            encoded = token.encode('utf-8')
+            known[token] = (zlib.crc32(encoded, HASH_SEED) << 32) | zlib.crc32(encoded)
+        return np.fromiter(map(known.__getitem__, tokens), dtype=np.uint64, count=len(tokens))
+
+    def batch(self, norms):
+        """SimHash of each text, as a uint64 array."""
+        import numpy as np
+
+        # One scan over the whole batch; NUL marks the end of each text
+        tokens = BATCH_TOKEN_PATTERN.findall('\x00'.join(norms) + '\x00')
+        ends = np.flatnonzero(np.fromiter(map('\x00'.__eq__, tokens), dtype=bool, count=len(tokens)))
+        counts = np.diff(np.concatenate(([-1], ends))) - 1
+        words = [t for t in tokens if t != '\x00']
+
+        hashes = self._hash_tokens(words)
+        # Bit i of the signature is set when most of the document's tokens set it
+        bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+        ones = np.zeros((len(norms), SIGNATURE_BITS), dtype=np.int64)
+        nonempty = counts > 0
+        if nonempty.any():
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+            ones[nonempty] = np.add.reduceat(bits, starts, axis=0, dtype=np.int64)
+        packed = np.packbits(ones * 2 > counts[:, None], axis=1, bitorder='little')
+        return packed.view(np.uint64).reshape(-1)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateCache:
+    """Bounded LRU of scored results, reachable by exact digest or SimHash LSH."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_distance=3):
+        self.capacity = max(capacity, 1)
+        self.max_distance = max_distance
+        self.n_bands = max_distance + 1
+        band_bits = SIGNATURE_BITS // self.n_bands
+        # (band, shift, mask); the last band takes any leftover bits
+        self.band_layout = [(band, band * band_bits,
+                             (1 << (band_bits if band < self.n_bands - 1
+                                    else SIGNATURE_BITS - band * band_bits)) - 1)
+                            for band in range(self.n_bands)]
+        self.entries = OrderedDict()  # entry id → (context, signature, digest, result)
+        self.exact = {}
+        self.bands = {}
+        self.next_id = 0
+        self.stats = {'lookups': 0, 'exact_hits': 0, 'near_hits': 0, 'misses': 0,
+                      'stores': 0, 'evictions': 0, 'candidates': 0}
+
+    def _band_keys(self, context, signature):
+        return [(context, band, (signature >> shift) & mask) for band, shift, mask in self.band_layout]
+
+    def get_exact(self, context, digest):
+        """Cached result for an identical normalised text, or None."""
+        self.stats['lookups'] += 1
+        entry_id = self.exact.get((context, digest))
+        if entry_id is None:
+            return None
+        self.entries.move_to_end(entry_id)
+        self.stats['exact_hits'] += 1
+        return self.entries[entry_id][3]
+
+    def get_near(self, context, signature):
+        """Cached result within max_distance of signature, or None (a miss)."""
+        if self.max_distance > 0:
+            seen = set()
+            for key in self._band_keys(context, signature):
+                for entry_id in self.bands.get(key, ()):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    self.stats['candidates'] += 1
+                    if hamming(self.entries[entry_id][1], signature) <= self.max_distance:
+                        self.entries.move_to_end(entry_id)
+                        self.stats['near_hits'] += 1
+                        return self.entries[entry_id][3]
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, context, signature, digest, result):
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries[entry_id] = (context, signature, digest, result)
+        self.exact[(context, digest)] = entry_id
+        for key in self._band_keys(context, signature):
+            self.bands.setdefault(key, set()).add(entry_id)
+        self.stats['stores'] += 1
+        while len(self.entries) > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        entry_id, (context, signature, digest, _) = self.entries.popitem(last=False)
+        if self.exact.get((context, digest)) == entry_id:
+            del self.exact[(context, digest)]
+        for key in self._band_keys(context, signature):
+            bucket = self.bands.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.bands[key]
+        self.stats['evictions'] += 1
+
+    def metrics(self):
+        stats = dict(self.stats)
+        hits = stats['exact_hits'] + stats['near_hits']
+        stats['hit_rate'] = round(hits / stats['lookups'], 4) if stats['lookups'] else 0.0
+        stats['size'] = len(self.entries)
+        return stats
+
+
+class CachedScorer:
+    """
+    Wraps a batch scorer: exact lookups for the whole batch, SimHash and LSH
+    lookups for the rest, one cold call for the misses, which are then
+    stored.
+    """
+
+    def __init__(self, text_fn, context_fn, score_batch, cache, fold=fold_digits):
+        self.text_fn = text_fn
+        self.context_fn = context_fn
+        self.score_batch = score_batch
+        self.cache = cache
+        self.fold = fold
+        self.hasher = SimHasher()
+
+    def score(self, records):
+        """One result per record, in order."""
+        cache = self.cache
+        lowered = [self.text_fn(r).lower() for r in records]
+        # NUL separates texts in the SimHash batch scan
+        norms = [self.fold(t.replace('\x00', ' ')) for t in lowered]
+        digests = list(map(digest, norms))
+        contexts = list(map(self.context_fn, records, lowered))
+
+        results = [cache.get_exact(c, d) for c, d in zip(contexts, digests)]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        signatures = dict(zip(pending, self.hasher.batch([norms[i] for i in pending]).tolist()))
+        misses = []
+        for i in pending:
+            results[i] = cache.get_near(contexts[i], signatures[i])
+            if results[i] is None:
+                misses.append(i)
+        if misses:
+            for i, result in zip(misses, self.score_batch([records[i] for i in misses])):
+                results[i] = result
+                cache.put(contexts[i], signatures[i], digests[i], result)
+        return results
+
+
+def make_scorer(kind, now=None, pkl_path='priority_classifier.pkl'):
+    """
+    (text_fn, context_fn, score_batch, fold) for one scorer; results
+    are the same dicts rule_scorer.py / deadline_extractor.py write, without
+    the id.
+    """
+    if kind == 'rules':
+        from rule_scorer import RuleScorer, IMPORTANT_LABELS, extract_domain
+
+        scorer = RuleScorer()
+
+        def text_fn(record):
+            return f"{record.get('subject') or ''} {record.get('snippet') or ''}"
+
+        def context_fn(record, text):
+            important = any(str(l).upper() in IMPORTANT_LABELS for l in record.get('labels') or [])
+            return important, extract_domain(record.get('from') or '')
+
+        return text_fn, context_fn, lambda records: [scorer.explain(r) for r in records], fold_digits
+
+    if kind == 'deadlines':
+        from deadline_extractor import DeadlineExtractor, MONTH_NAMES, record_text
+
+        extractor = DeadlineExtractor(now)
+        # Superset of what the detector reads as a date: d/m[/yyyy], "<month> <day>[, yyyy]", "by <digit>"
+        date_expressions = re.compile(
+            r'\d{1,2}[/-]\d{1,2}(?:[/-]\d{4})?'
+            r'|\b(?:' + '|'.join(MONTH_NAMES) + r')\s+\d{1,2}\b(?:,?\s+\d{4})?'
+            r'|\bby\s+\d', re.ASCII | re.IGNORECASE)
+
+        def context_fn(record, text):
+            return tuple(date_expressions.findall(text))
+
+        return (record_text, context_fn,
+                lambda records: [extractor.detect(record_text(r)) for r in records], fold_digits)
+
+    if kind == 'model':
+        import joblib
+        from email_corpus import record_text
+
+        pipeline = joblib.load(pkl_path)
+        classes = [c.item() if hasattr(c, 'item') else c for c in pipeline.classes_]
+
+        def score_batch(records):
+            proba = pipeline.predict_proba([record_text(r) for r in records])
+            return [{'prediction': classes[int(row.argmax())],
+                     'probabilities': [round(float(p), 6) for p in row]} for row in proba]
+
+        vectorizer = pipeline.steps[0][1]
+        return (record_text, lambda record, text: (), score_batch,
+                vocabulary_folder(vectorizer.vocabulary_))
+
+    raise ValueError(f"Unknown scorer: {kind}")
+
+
+def _decision(kind, result):
+    """The part of a result that drives app behaviour, for the accuracy check."""
+    if kind == 'rules':
+        return result['label']
+    if kind == 'deadlines':
+        return (result['hasDeadline'], tuple(result['deadlines']), result['urgencyScore'])
+    return result['prediction']
+
+
+def run(records, kind, cache, batch_size, now=None, pkl_path='priority_classifier.pkl', check=False):
+    """
+    Score records through the cache (and cold, with check=True).
+    Returns (results, report).
+    """
+    text_fn, context_fn, score_batch, fold = make_scorer(kind, now, pkl_path)
+    cached = CachedScorer(text_fn, context_fn, score_batch, cache, fold)
+
+    results = []
+    start = time.perf_counter()
+    for first in range(0, len(records), batch_size):
+        results.extend(cached.score(records[first:first + batch_size]))
+    cached_s = time.perf_counter() - start
+
+    report = {'scorer': kind, 'records': len(records), 'cached_s': round(cached_s, 4),
+              'cache': cache.metrics()}
+    if check:
+        start = time.perf_counter()
+        cold = []
+        for first in range(0, len(records), batch_size):
+            cold.extend(score_batch(records[first:first + batch_size]))
+        cold_s = time.perf_counter() - start
+        exact = sum(a == b for a, b in zip(results, cold))
+        decisions = sum(_decision(kind, a) == _decision(kind, b) for a, b in zip(results, cold))
+        report.update(
+            cold_s=round(cold_s, 4),
+            speedup=round(cold_s / cached_s, 2) if cached_s > 0 else None,
+            identical_results=round(exact / len(records), 4) if records else None,
+            same_decision=round(decisions / len(records), 4) if records else None,
+        )
+    return results, report
+
+
+def main():
+    """Score a mailbox export through the near-duplicate cache."""
+    import argparse
+    from datetime import datetime
+    from rule_scorer import iter_records
+
+    parser = argparse.ArgumentParser(description='Score emails with a near-duplicate result cache')
+    parser.add_argument('--input', required=True, help='JSONL or .mbox export to score')
+    parser.add_argument('--scorer', choices=SCORERS, default='rules', help='What to score (default: rules)')
+    parser.add_argument('--output', help='Write JSONL results here')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY,
+                        help=f"Max cached results (default: {DEFAULT_CAPACITY})")
+    parser.add_argument('--max-distance', type=int,
+                        help='Max SimHash Hamming distance for a near hit, 0 = exact only '
+                             '(default: 3, 0 for --scorer model)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Records per batch (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--now', help='Local time for --scorer deadlines (ISO 8601, default: now)')
+    parser.add_argument('--pickle', default='priority_classifier.pkl',
+                        help='Model for --scorer model (default: priority_classifier.pkl)')
+    parser.add_argument('--check', action='store_true',
+                        help='Also score cold and report how often cached results differ')
+
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"✗ Input file not found: {args.input}", file=sys.stderr)
+        return 1
+    if args.max_distance is None:
+        args.max_distance = DEFAULT_MAX_DISTANCE[args.scorer]
+    if not 0 <= args.max_distance < SIGNATURE_BITS // 2:
+        parser.error(f"--max-distance must be between 0 and {SIGNATURE_BITS // 2 - 1}")
+    try:
+        now = datetime.fromisoformat(args.now) if args.now else datetime.now()
+    except ValueError:
+        print(f"✗ Invalid --now value: {args.now}", file=sys.stderr)
+        return 1
+
+    records = list(iter_records(args.input))
+    cache = NearDuplicateCache(args.capacity, args.max_distance)
+    results, report = run(records, args.scorer, cache, max(args.batch_size, 1), now,
+                          args.pickle, args.check)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            for record, result in zip(records, results):
+                out.write(json.dumps({'id': record.get('id'), **result}, ensure_ascii=False) + '\n')
+
+    metrics = report['cache']
+    print(f"  hit rate {metrics['hit_rate']:.1%} ({metrics['exact_hits']} exact, "
+          f"{metrics['near_hits']} near, {metrics['misses']} misses, "
+          f"{metrics['evictions']} evictions)", file=sys.stderr)
+    if args.check:
+        print(f"  cached {report['cached_s']:.3f}s vs cold {report['cold_s']:.3f}s "
+              f"({report['speedup']}x); same decision {report['same_decision']:.2%}, "
+              f"identical result {report['identical_results']:.2%}", file=sys.stderr)
+    print(f"✓ Scored {len(records)} emails with the {args.scorer} scorer", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
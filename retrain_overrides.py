@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Override Retraining
+
+Feeds the corrections users make in the app back into
+priority_classifier.pkl without a full refit. PriorityStore
+(lib/core/priority_store.dart) keeps:
+
+    priority_box         {messageId, score, label, manualOverride, manualLabel, timestamp}
+    domain_priority_box  {domain, label, timestamp}
+
+Export both boxes (loadAllPriorities() / loadAllDomainPriorities() maps, a
+list of those records, or JSONL) and pass them with --overrides. Override
+records carry only message ids, so --corpus supplies the email text (e.g. a
+gmail_ingest.py export). A domain override labels every corpus email from
+that domain, as the app does, at --domain-weight per email. A message-level
+override wins over its domain's.
+
+The pickled TfidfVectorizer stays frozen: the converter and the app's TFLite
+input depend on its vocabulary. Only the MultinomialNB head is updated,
+with partial_fit on the new corrections. Its state is plain per-class
+feature counts, so an update costs one transform + one sparse add over the
+new rows, whatever the size of the original training set.
+
+A ledger next to the output (<pkl>.overrides.json) records what has been
+applied, with the hashes of the input it was applied to and of the model it
+produced. Re-running with the same export is a no-op. With --output set
+apart from --input, a re-run updates the existing output while --input is
+still the model that output was built from; a changed --input starts over. When an override
+changes label or is cleared, its old contribution is retracted exactly
+(partial_fit with a negative sample weight) before the new one is added.
+
+Label → class mapping follows the app: Low = 0, Medium = 1, High = 2.
+
+Usage:
+    python3 retrain_overrides.py --overrides priorities.json [--overrides domains.json]
+                                 --corpus mail.jsonl [--input priority_classifier.pkl]
+                                 [--output priority_classifier.pkl] [--weight 1.0]
+                                 [--domain-weight 0.1]
+                                 [--dry-run] [--convert]
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+
+
+LABEL_CLASSES = {'Low': 0, 'Medium': 1, 'High': 2}
+LEDGER_SUFFIX = '.overrides.json'
+LEDGER_VERSION = 2
+
+# One domain override can label thousands of emails, and the app already
+# applies it at runtime; each of those rows counts this much by default
+DEFAULT_DOMAIN_WEIGHT = 0.1
+
+
+def extract_domain(email):
+    """Port of PriorityStore._extractDomain."""
+    if '@' in email:
+        return email.split('@')[1].split('>')[0].lower()
+    return email.lower()
+
+
+def read_export(path):
+    """
+    Records from a PriorityStore export: a JSON object keyed by message id or
+    domain, a JSON list, or JSONL. Returns a list of dicts.
+    """
+    from email_corpus import read_jsonl
+
+    text = Path(path).read_text(encoding='utf-8').strip()
+    if not text:
+        return []
+    if text[0] in '{[':
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = None  # JSONL whose first line is an object
+        if isinstance(data, dict):
+            values = list(data.values())
+            if values and all(isinstance(v, dict) for v in values):
+                return values
+            if values and all(isinstance(v, str) for v in values):
+                # loadAllDomainPriorities(): {domain: label}
+                return [{'domain': d, 'label': l} for d, l in data.items()]
+            return [data]
+        if isinstance(data, list):
+            return data
+    return list(read_jsonl(path))
+
+
+def effective_overrides(records):
+    """
+    Split export records into message and domain overrides.
+    Returns ({message_id: label}, {domain: label}); cleared and unknown
+    labels are left out.
+    """
+    messages, domains = {}, {}
+    for record in records:
+        if 'domain' in record and 'messageId' not in record:
+            label = record.get('label')
+            if label in LABEL_CLASSES and record['domain']:
+                domains[record['domain'].lower()] = label
+            continue
+        if not record.get('manualOverride'):
+            continue
+        # saveManualPriority() stores the chosen label in 'label' only
+        label = record.get('manualLabel') or record.get('label')
+        if label in LABEL_CLASSES and record.get('messageId'):
+            messages[record['messageId']] = label
+    return messages, domains
+
+
+def training_rows(corpus_path, messages, domains, weight, domain_weight=DEFAULT_DOMAIN_WEIGHT):
+    """
+    Join overrides with corpus texts.
+    Returns {message_id: {'text', 'label', 'weight', 'source'}}.
+    """
+    from email_corpus import read_jsonl, record_text
+
+    rows = {}
+    for record in read_jsonl(corpus_path):
+        msg_id = record.get('id')
+        if not msg_id:
+            continue
+        if msg_id in messages:
+            label, row_weight, source = messages[msg_id], weight, 'message'
+        else:
+            label = domains.get(extract_domain(str(record.get('from') or '')))
+            row_weight, source = domain_weight, 'domain'
+        if label is not None and row_weight > 0:
+            rows[msg_id] = {'text': record_text(record), 'label': label,
+                            'weight': row_weight, 'source': source}
+    return rows
+
+
+def load_ledger(path, pkl_path, out_path):
+    """
+    Find the model to update and the rows already applied to it.
+    Returns (applied, model_path, input_sha256, discarded).
+    """
+    from conversion_cache import file_sha256
+
+    input_hash = file_sha256(pkl_path)
+    if not Path(path).exists():
+        return {}, pkl_path, input_hash, False
+    ledger = json.loads(Path(path).read_text(encoding='utf-8'))
+    if ledger.get('version') == LEDGER_VERSION:
+        applied = ledger.get('applied', {})
+        if ledger.get('model_sha256') == input_hash:
+            # Updated in place (or --input is a copy of the output)
+            return applied, pkl_path, ledger.get('input_sha256'), False
+        if (ledger.get('input_sha256') == input_hash and Path(out_path).exists()
+                and file_sha256(out_path) == ledger.get('model_sha256')):
+            # --output built from this same --input by an earlier run
+            return applied, out_path, input_hash, False
+    return {}, pkl_path, input_hash, True
+
+
+def plan_updates(applied, wanted):
+    """
+    Diff the ledger against the wanted rows.
+    Returns (retract, add) lists of (message_id, row).
+    """
+    retract, add = [], []
+    for msg_id, row in applied.items():
+        new = wanted.get(msg_id)
+        if new is None or (new['label'], new['weight'], new['text']) != (row['label'], row['weight'], row['text']):
+            retract.append((msg_id, row))
+    for msg_id, row in wanted.items():
+        old = applied.get(msg_id)
+        if old is None or (old['label'], old['weight'], old['text']) != (row['label'], row['weight'], row['text']):
+            add.append((msg_id, row))
+    return retract, add
+
+
+def apply_updates(pipeline, retract, add):
+    """
+    partial_fit the pipeline's NB head: old rows with negative weight, new
+    rows with positive weight. Returns the number of rows touched.
+    """
+    import numpy as np
+
+    vectorizer, estimator = pipeline.steps[0][1], pipeline.steps[-1][1]
+    if not hasattr(estimator, 'partial_fit') or not hasattr(estimator, 'feature_count_'):
+        raise ValueError(f"{type(estimator).__name__} cannot be updated incrementally")
+
+    rows = [(row, -row['weight']) for _, row in retract] + [(row, row['weight']) for _, row in add]
+    if not rows:
+        return 0
+    classes = {str(c): c for c in estimator.classes_}
+    missing = [l for l in LABEL_CLASSES.values() if str(l) not in classes]
+    if missing:
+        raise ValueError(f"Model classes {list(estimator.classes_)} do not cover labels {missing}")
+
+    features = vectorizer.transform([row['text'] for row, _ in rows])
+    labels = [classes[str(LABEL_CLASSES[row['label']])] for row, _ in rows]
+    estimator.partial_fit(features, labels, sample_weight=np.array([w for _, w in rows]))
+
+    if estimator.feature_count_.min() < -1e-9 or estimator.class_count_.min() < -1e-9:
+        raise ValueError("Retraction left negative counts; the ledger does not match this model")
+    return len(rows)
+
+
+def accuracy(pipeline, rows):
+    """Share of rows whose prediction equals their override label."""
+    if not rows:
+        return None
+    predicted = pipeline.predict([row['text'] for row in rows])
+    expected = [LABEL_CLASSES[row['label']] for row in rows]
+    return sum(str(p) == str(e) for p, e in zip(predicted, expected)) / len(rows)
+
+
+def labelled_accuracy(pipeline, corpus_path, skip, limit=5000):
+    """Accuracy on corpus 'label's outside the override set (drift check)."""
+    from email_corpus import read_jsonl, record_text, record_label
+
+    texts, labels = [], []
+    for record in read_jsonl(corpus_path):
+        if record_label(record) is None or record.get('id') in skip:
+            continue
+        texts.append(record_text(record))
+        labels.append(record_label(record))
+        if len(texts) >= limit:
+            break
+    if not texts:
+        return None
+    predicted = pipeline.predict(texts)
+    return sum(str(p) == str(l) for p, l in zip(predicted, labels)) / len(texts)
+
+
+def retrain(pkl_path, out_path, export_paths, corpus_path, weight=1.0,
+            domain_weight=DEFAULT_DOMAIN_WEIGHT, dry_run=False):
+    """
+    Bring the model in line with the exported overrides.
+    Returns a report dict.
+    """
+    import copy
+    import joblib
+    from conversion_cache import file_sha256
+
+    timings = {}
+    start = time.perf_counter()
+    records = [r for path in export_paths for r in read_export(path)]
+    messages, domains = effective_overrides(records)
+    wanted = training_rows(corpus_path, messages, domains, weight, domain_weight)
+    timings['read_s'] = time.perf_counter() - start
+
+    ledger_path = str(out_path) + LEDGER_SUFFIX
+    applied, model_path, input_hash, discarded = load_ledger(ledger_path, pkl_path, out_path)
+    retract, add = plan_updates(applied, wanted)
+
+    start = time.perf_counter()
+    pipeline = joblib.load(model_path)
+    before = copy.deepcopy(pipeline)
+    timings['load_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    touched = apply_updates(pipeline, retract, add)
+    timings['update_s'] = time.perf_counter() - start
+
+    override_rows = list(wanted.values())
+    report = {
+        'overrides': {'messages': len(messages), 'domains': len(domains),
+                      'matched_emails': len(wanted),
+                      'domain_emails': sum(r['source'] == 'domain' for r in wanted.values()),
+                      'unmatched_messages': len(set(messages) - set(wanted))},
+        'ledger_discarded': discarded,
+        'updated_from': str(model_path),
+        'retracted': len(retract),
+        'added': len(add),
+        'rows_updated': touched,
+        'override_accuracy': {'before': accuracy(before, override_rows),
+                              'after': accuracy(pipeline, override_rows)},
+        'corpus_accuracy': {'before': labelled_accuracy(before, corpus_path, wanted),
+                            'after': labelled_accuracy(pipeline, corpus_path, wanted)},
+        'output': str(out_path),
+        'written': False,
+    }
+
+    if touched and not dry_run:
+        start = time.perf_counter()
+        tmp = Path(str(out_path) + '.tmp')
+        joblib.dump(pipeline, tmp)
+        tmp.replace(out_path)
+        ledger = {'version': LEDGER_VERSION, 'input_sha256': input_hash,
+                  'model_sha256': file_sha256(out_path), 'applied': wanted}
+        Path(ledger_path).write_text(json.dumps(ledger, ensure_ascii=False), encoding='utf-8')
+        timings['save_s'] = time.perf_counter() - start
+        report['written'] = True
+
+    report['timings'] = {k: round(v, 4) for k, v in timings.items()}
+    return report
+
+
+def _pct(value):
+    return 'n/a' if value is None else f"{value:.1%}"
+
+
+def main():
+    """Apply exported overrides to the pickle and optionally re-convert it."""
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(description='Incrementally retrain the classifier from app overrides')
+    parser.add_argument('--overrides', action='append', required=True,
+                        help='PriorityStore export (JSON or JSONL), repeatable')
+    parser.add_argument('--corpus', required=True, help='JSONL emails to look override ids up in')
+    parser.add_argument('--input', default='priority_classifier.pkl',
+                        help='Model to update (default: priority_classifier.pkl)')
+    parser.add_argument('--output', help='Where to write the updated model (default: --input)')
+    parser.add_argument('--weight', type=float, default=1.0,
+                        help='Sample weight of each corrected message (default: 1.0)')
+    parser.add_argument('--domain-weight', type=float, default=DEFAULT_DOMAIN_WEIGHT,
+                        help='Sample weight of each email labelled by a domain override, 0 to skip '
+                             f"(default: {DEFAULT_DOMAIN_WEIGHT})")
+    parser.add_argument('--dry-run', action='store_true', help='Report the effect without writing')
+    parser.add_argument('--convert', action='store_true',
+                        help='Run convert_model.py on the updated model afterwards')
+    parser.add_argument('--report', help='Write the JSON report here')
+
+    args = parser.parse_args()
+    output = args.output or args.input
+
+    for path in [args.input, args.corpus] + args.overrides:
+        if not Path(path).exists():
+            print(f"✗ File not found: {path}", file=sys.stderr)
+            return 1
+    if args.weight <= 0 or args.domain_weight < 0:
+        parser.error('--weight must be positive and --domain-weight non-negative')
+
+    try:
+        report = retrain(args.input, output, args.overrides, args.corpus, args.weight,
+                         args.domain_weight, args.dry_run)
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+
+    if report['ledger_discarded']:
+        print(f"⚠ Ledger for {output} does not match {args.input}; re-applied every override",
+              file=sys.stderr)
+    overrides = report['overrides']
+    print(f"  {overrides['messages']} message / {overrides['domains']} domain overrides → "
+          f"{overrides['matched_emails']} corpus emails ({overrides['domain_emails']} via domain, "
+          f"{overrides['unmatched_messages']} message ids not in the corpus)", file=sys.stderr)
+    print(f"  retracted {report['retracted']}, added {report['added']} in "
+          f"{report['timings']['update_s'] * 1000:.1f} ms", file=sys.stderr)
+    print(f"  override accuracy {_pct(report['override_accuracy']['before'])} → "
+          f"{_pct(report['override_accuracy']['after'])}, other labelled emails "
+          f"{_pct(report['corpus_accuracy']['before'])} → {_pct(report['corpus_accuracy']['after'])}",
+          file=sys.stderr)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2), encoding='utf-8')
+
+    if not report['rows_updated']:
+        print('✓ Model already up to date with these overrides', file=sys.stderr)
+        return 0
+    if not report['written']:
+        print('✓ Dry run: model not written', file=sys.stderr)
+        return 0
+    print(f"✓ Updated model written to {output}", file=sys.stderr)
+
+    if args.convert:
+        converter = Path(__file__).resolve().parent / 'convert_model.py'
+        return subprocess.run([sys.executable, str(converter), '--input', output]).returncode
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Rule Scorer
+
+Offline batch version of PriorityClassifier's fallback rule engine
+(lib/core/priority_classifier.dart). Produces the same 0-100 score, label and
+explainPrediction() reasons as the app, for whole mailbox exports.
+
+All keyword lists are compiled once into a single multi-pattern matcher, so
+each email is scanned once instead of once per keyword. The Dart code uses
+substring semantics everywhere ('by' matches "baby", 'edu' matches any domain
+containing "edu"), and so does the matcher: a regex over the keyword trie
+(see keyword_regex), or an Aho-Corasick automaton when the optional
+pyahocorasick package is installed.
+
+Input is a JSONL export (EmailMetadata.toJson() records, see email_corpus.py)
+or an mbox file (Google Takeout: labels come from X-Gmail-Labels). Records
+are scored in chunks across a process pool and written as JSONL:
+
+    {"id": "...", "score": 85, "label": "High", "reasons": [...]}
+
+Usage:
+    python3 rule_scorer.py --input mail.jsonl [--output scores.jsonl]
+                           [--workers N] [--chunk-size 1000]
+    python3 rule_scorer.py --check-golden test/golden/priority_classifier.jsonl
+    python3 rule_scorer.py --input cases.jsonl --write-golden <file>
+
+The golden file is also read by test/priority_classifier_golden_test.dart, so
+both implementations are checked against the same expectations.
+"""
+
+import re
+import sys
+import json
+from pathlib import Path
+
+from dart_text import dart_lower
+
+
+# Keep in sync with lib/core/priority_classifier.dart
+HIGH_PRIORITY_KEYWORDS = [
+    'deadline', 'due', 'submit', 'by', 'important', 'urgent', 'asap',
+    'immediately', 'now', 'critical', 'high priority',
+    'interview', 'offer', 'job', 'contract', 'agreement', 'approved',
+    'rejected', 'confirmation', 'alert', 'action required',
+    'call', 'meeting', 'scheduled', 'appointment', 'conference', 'presentation',
+    'invoice', 'receipt', 'payment', 'refund', 'transaction', 'amount', 'bill',
+    'salary', 'bonus', 'promotion',
+    'emergency', 'urgent help needed', 'important news',
+]
+
+LOW_PRIORITY_KEYWORDS = [
+    'newsletter', 'unsubscribe', 'promotional', 'sale', 'discount', 'coupon',
+    'deal', 'limited time', 'click here', 'offer ends', 'special offer',
+    'save now', 'exclusive offer',
+    'follow us', 'like us', 'share this', 'viral', 'trending', 'check this out',
+    'notification', 'you have', 'new message', 'friend request',
+    'comment on your', 'liked your',
+    'mass email', 'sent to many', 'batch', 'bulk',
+]
+
+TRUSTED_DOMAINS = [
+    'gmail.com', 'outlook.com', 'company.com', 'corporate.com',
+    'edu', 'university.edu', 'college.edu', 'school.edu',
+    'gov', 'government', 'official',
+    'google.com', 'microsoft.com', 'apple.com', 'amazon.com', 'facebook.com',
+    'linkedin.com',
+    'bank.com', 'icici.com', 'hdfc.com', 'sbi.co.in', 'axis.com',
+]
+
+IMPORTANT_LABELS = ('IMPORTANT', 'STARRED')
+
+# Dart's \d is ASCII-only
+DATE_PATTERN = re.compile(r'\d{1,2}[/-]\d{1,2}', re.ASCII)
+RELATIVE_DATE_PATTERN = re.compile(r'tomorrow|today|next week')
+
+SNIPPET_LENGTH = 200
+
+
+def keyword_regex(keywords):
+    """
+    One regex that finds every keyword starting at each position of a text.
+    The keywords form a trie; a lookahead walks it, and an empty group after
+    each keyword's last character records that the keyword matched. Keywords
+    that start at the same position are prefixes of one another, so they lie
+    on one path and each longer one is an optional extension of the shorter.
+    Returns (compiled pattern, keyword of each group in group order).
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = keyword
+    groups = []
+
+    def below(node):
+        branches = []
+        for char in sorted(c for c in node if c):
+            child = node[char]
+            branch = re.escape(char)
+            if '' in child:
+                groups.append(child[''])
+                branch += '()'
+            rest = below(child)
+            if rest:
+                branch += f"(?:{rest})?" if '' in child else f"(?:{rest})"
+            branches.append(branch)
+        return '|'.join(branches)
+
+    body = below(trie)
+    return re.compile(f"(?=(?:{body}))" if body else r'(?!)'), groups
+
+
+class KeywordMatcher:
+    """
+    Finds which of a fixed list of substrings occur in a text, in one scan.
+    Uses a pyahocorasick automaton when that package is installed, otherwise
+    the trie regex from keyword_regex(); both give the same results.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        try:
+            import ahocorasick
+        except ImportError:
+            self._automaton = None
+            indices = {}
+            for index, keyword in enumerate(self.keywords):
+                indices.setdefault(keyword, []).append(index)
+            self._regex, groups = keyword_regex(indices)
+            # A match's last group is its longest keyword; the shorter ones
+            # found at the same position are exactly its keyword prefixes
+            self._chains = [frozenset()] + [
+                frozenset(i for keyword in indices if longest.startswith(keyword)
+                          for i in indices[keyword])
+                for longest in groups
+            ]
+        else:
+            automaton = ahocorasick.Automaton()
+            for index, keyword in enumerate(self.keywords):
+                automaton.add_word(keyword, index)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def find(self, text):
+        """Indices of the keywords present in text, in list order."""
+        if self._automaton is not None:
+            return sorted({index for _, index in self._automaton.iter(text)})
+        chains = self._chains
+        return sorted(set().union(*[chains[match.lastindex] for match in self._regex.finditer(text)]))
+
+    def any(self, text):
+        """True if any keyword occurs in text."""
+        if self._automaton is not None:
+            for _ in self._automaton.iter(text):
+                return True
+            return False
+        return self._regex.search(text) is not None
+
+
+def extract_domain(sender):
+    """Same as PriorityClassifier._extractDomain."""
+    if '@' not in sender:
+        return ''
+    return sender.split('@')[1].split('>')[0].lower()
+
+
+def predict_label(score):
+    """Same cutoffs as PriorityClassifier.predictLabel."""
+    if score >= 70:
+        return 'High'
+    if score >= 40:
+        return 'Medium'
+    return 'Low'
+
+
+class RuleScorer:
+    """PriorityClassifier._fallbackClassifier and explainPrediction in one pass."""
+
+    def __init__(self):
+        self.keywords = KeywordMatcher(HIGH_PRIORITY_KEYWORDS + LOW_PRIORITY_KEYWORDS)
+        self.trusted = KeywordMatcher(TRUSTED_DOMAINS)
+        self._n_high = len(HIGH_PRIORITY_KEYWORDS)
+
+    def explain(self, record):
+        """
+        Score one email record.
+        Returns {'score': int, 'label': str, 'reasons': [str, ...]}.
+        """
+        score = 50
+        reasons = []
+        text = dart_lower(f"{record.get('subject') or ''} {record.get('snippet') or ''}")
+
+        labels = record.get('labels') or []
+        if any(str(label).upper() in IMPORTANT_LABELS for label in labels):
+            score += 35
+            reasons.append('Marked as IMPORTANT or STARRED (+35)')
+
+        domain = extract_domain(record.get('from') or '')
+        if self.trusted.any(domain):
+            score += 20
+            reasons.append(f'From trusted domain: {domain} (+20)')
+
+        for index in self.keywords.find(text):
+            keyword = self.keywords.keywords[index]
+            if index < self._n_high:
+                score += 20
+                reasons.append(f'Contains "{keyword}" (+20)')
+            else:
+                score -= 15
+                reasons.append(f'Contains promotional keyword "{keyword}" (-15)')
+
+        if DATE_PATTERN.search(text) or RELATIVE_DATE_PATTERN.search(text):
+            score += 15
+            reasons.append('Contains date/time reference (+15)')
+
+        if not reasons:
+            reasons.append('Standard email')
+
+        score = min(max(score, 0), 100)
+        return {'score': score, 'label': predict_label(score), 'reasons': reasons}
+
+    def score(self, record):
+        """0-100 priority score for one email record."""
+        return self.explain(record)['score']
+
+
+def _message_text(message):
+    """First text/plain body of an email.message.Message, whitespace-collapsed."""
+    part = message
+    if message.is_multipart():
+        part = next(
+            (p for p in message.walk() if p.get_content_type() == 'text/plain'), None
+        )
+        if part is None:
+            return ''
+    payload = part.get_payload(decode=True) or b''
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        text = payload.decode(charset, errors='replace')
+    except LookupError:
+        text = payload.decode('utf-8', errors='replace')
+    return ' '.join(text.split())
+
+
+def read_mbox(path):
+    """Yield EmailMetadata-shaped dicts from an mbox file."""
+    import mailbox
+    from email.header import decode_header, make_header
+
+    def header(message, name):
+        value = message.get(name)
+        if value is None:
+            return ''
+        try:
+            return str(make_header(decode_header(value)))
+        except Exception:
+            return str(value)
+
+    for key, message in mailbox.mbox(path).iteritems():
+        labels = [l.strip() for l in header(message, 'X-Gmail-Labels').split(',') if l.strip()]
+        yield {
+            'id': header(message, 'Message-ID') or str(key),
+            'subject': header(message, 'Subject'),
+            'from': header(message, 'From'),
+            'snippet': _message_text(message)[:SNIPPET_LENGTH],
+            'labels': labels,
+        }
+
+
+def iter_records(path):
+    """Email records from a .jsonl or .mbox file, or a snapshot store directory."""
+    if str(path).endswith('.mbox'):
+        return read_mbox(path)
+    from email_corpus import read_records
+    return read_records(path)
+
+
+def iter_chunks(records, chunk_size):
+    """Group an iterable into lists of at most chunk_size."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_worker_scorer = None
+
+
+def _init_worker():
+    global _worker_scorer
+    _worker_scorer = RuleScorer()
+
+
+def _score_chunk(chunk):
+    return [
+        {'id': record.get('id'), **_worker_scorer.explain(record)}
+        for record in chunk
+    ]
+
+
+def score_stream(records, workers=None, chunk_size=1000):
+    """
+    Score records across a process pool, preserving input order.
+    Yields one result dict per record.
+    """
+    if workers == 1:
+        _init_worker()
+        for chunk in iter_chunks(records, chunk_size):
+            yield from _score_chunk(chunk)
+        return
+
+    import multiprocessing
+
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for results in pool.imap(_score_chunk, iter_chunks(records, chunk_size)):
+            yield from results
+
+
+def write_golden(records, path):
+    """Write records with their expected explainPrediction() output."""
+    scorer = RuleScorer()
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            email = {k: record.get(k, '') for k in ('id', 'subject', 'from', 'snippet')}
+            email['labels'] = record.get('labels') or []
+            f.write(json.dumps({'email': email, 'expected': scorer.explain(email)},
+                               ensure_ascii=False) + '\n')
+
+
+def check_golden(path):
+    """
+    Compare the scorer against a golden file.
+    Returns a list of mismatch descriptions (empty when everything matches).
+    """
+    from email_corpus import read_jsonl
+
+    scorer = RuleScorer()
+    mismatches = []
+    for line_no, case in enumerate(read_jsonl(path), 1):
+        actual = scorer.explain(case['email'])
+        if actual != case['expected']:
+            mismatches.append(f"line {line_no} ({case['email'].get('id')}): "
+                              f"expected {case['expected']}, got {actual}")
+    return mismatches
+
+
+def main():
+    """Score a mailbox export or check the golden file."""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Batch-score emails with the app rule engine')
+    parser.add_argument('--input', help='JSONL or .mbox export to score')
+    parser.add_argument('--output', help='Write JSONL results here (default: stdout)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Records per task (default: 1000)')
+    parser.add_argument('--check-golden', help='Verify results against a golden JSONL file')
+    parser.add_argument('--write-golden', help='Write --input records with expected results')
+
+    args = parser.parse_args()
+
+    if args.check_golden:
+        mismatches = check_golden(args.check_golden)
+        for mismatch in mismatches:
+            print(f"✗ {mismatch}")
+        if mismatches:
+            return 1
+        print(f"✓ All cases in {args.check_golden} match")
+        return 0
+
+    if not args.input:
+        parser.error('--input is required unless --check-golden is given')
+    if not Path(args.input).exists():
+        print(f"✗ Input file not found: {args.input}", file=sys.stderr)
+        return 1
+
+    if args.write_golden:
+        write_golden(iter_records(args.input), args.write_golden)
+        print(f"✓ Golden file written to {args.write_golden}", file=sys.stderr)
+        return 0
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    count = 0
+    try:
+        for result in score_stream(iter_records(args.input), args.workers, max(args.chunk_size, 1)):
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            count += 1
+    finally:
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"✓ Scored {count} emails in {elapsed:.2f}s ({rate:,.0f} emails/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
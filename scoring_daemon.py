@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Scoring Daemon
+
+Long-lived local scoring service. The model is loaded and warmed once (any
+benchmark_backends.py backend: pickle, onnx, ort, tflite or numpy), and every
+request is scored against it, so callers skip the interpreter start-up and
+allocate_tensors() cost.
+
+Concurrent requests are grouped into micro-batches: the batcher waits up to
+--window-ms after the first queued request (or until --max-batch emails are
+queued) and scores everything in one call. Each caller gets its own rows
+back.
+
+HTTP endpoints (TCP on localhost or a Unix socket):
+
+    POST /score     {"texts": ["...", ...]}  or  {"emails": [{...}, ...]}
+                    → {"classes": [...], "probabilities": [[...], ...],
+                       "predictions": [...]}
+    GET  /metrics   queue depth, batch-size histogram, queue-wait and
+                    inference latency percentiles, request / row / error counts
+    GET  /healthz   {"ok": true, "backend": ...}
+
+Usage:
+    python3 scoring_daemon.py [--backend pickle] [--artifact <path>]
+                              [--listen 127.0.0.1:8765 | --listen unix:/tmp/mailmind.sock]
+                              [--window-ms 5] [--max-batch 256]
+
+    python3 scoring_daemon.py --bench emails.jsonl [--listen ...]
+                              [--concurrency 16] [--per-request 1]
+        (load-test a running daemon and print its metrics)
+"""
+
+import sys
+import json
+import time
+import queue
+import threading
+from pathlib import Path
+
+
+DEFAULT_LISTEN = '127.0.0.1:8765'
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 256
+REQUEST_TIMEOUT_S = 30.0
+
+# Latency samples kept for the percentiles in /metrics
+LATENCY_WINDOW = 2048
+
+
+def parse_listen(value):
+    """'host:port' or 'unix:/path' → ('tcp', (host, port)) or ('unix', path)."""
+    if value.startswith('unix:'):
+        return 'unix', value[len('unix:'):]
+    host, _, port = value.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Expected host:port or unix:/path, got {value!r}")
+    return 'tcp', (host, int(port))
+
+
+class Metrics:
+    """Counters and latency samples shared by the batcher and the handlers."""
+
+    def __init__(self):
+        from collections import deque
+
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = {}
+        self.wait_ms = deque(maxlen=LATENCY_WINDOW)
+        self.infer_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def record_batch(self, requests, rows, depth, waits, infer_ms):
+        bucket = 1
+        while bucket < rows:
+            bucket *= 2
+        with self.lock:
+            self.requests += requests
+            self.rows += rows
+            self.batches += 1
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+            self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+            self.wait_ms.extend(waits)
+            self.infer_ms.append(infer_ms)
+
+    def record_error(self, requests):
+        with self.lock:
+            self.errors += requests
+
+    def snapshot(self, queue_depth):
+        """JSON-serializable view for /metrics."""
+        import numpy as np
+
+        def percentiles(samples):
+            if not samples:
+                return None
+            p50, p95, p99 = np.percentile(np.fromiter(samples, dtype=np.float64), [50, 95, 99])
+            return {'p50': round(float(p50), 3), 'p95': round(float(p95), 3),
+                    'p99': round(float(p99), 3)}
+
+        with self.lock:
+            return {
+                'uptime_s': round(time.time() - self.started, 1),
+                'queue_depth': queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'requests': self.requests,
+                'rows': self.rows,
+                'batches': self.batches,
+                'errors': self.errors,
+                'mean_batch_rows': round(self.rows / self.batches, 2) if self.batches else None,
+                'batch_rows_histogram': {f'<={k}': v for k, v in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': percentiles(self.wait_ms),
+                'inference_ms': percentiles(self.infer_ms),
+            }
+
+
+class _Pending:
+    __slots__ = ('texts', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Single scoring thread that drains the queue in latency-bounded batches."""
+
+    def __init__(self, score, metrics, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.score = score
+        self.metrics = metrics
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name='micro-batcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self.queue.put(None)
+        self._thread.join(timeout=5)
+
+    def submit(self, texts, timeout=REQUEST_TIMEOUT_S):
+        """Score texts in the next batch; returns their probability rows."""
+        pending = _Pending(list(texts))
+        self.queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError(f"Scoring did not finish within {timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        """First queued request, then whatever arrives within the window."""
+        first = self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        rows = len(first.texts)
+        deadline = time.perf_counter() + self.window_s
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopping = True
+                break
+            batch.append(item)
+            rows += len(item.texts)
+        return batch
+
+    def _loop(self):
+        while not self._stopping:
+            batch = self._collect()
+            if not batch:
+                continue
+            depth = self.queue.qsize() + len(batch)
+            texts = [text for pending in batch for text in pending.texts]
+            start = time.perf_counter()
+            try:
+                proba = self.score(texts) if texts else None
+            except Exception as e:
+                self.metrics.record_error(len(batch))
+                for pending in batch:
+                    pending.error = e
+                    pending.done.set()
+                continue
+            infer_ms = (time.perf_counter() - start) * 1000.0
+            waits = [(start - pending.enqueued) * 1000.0 for pending in batch]
+            offset = 0
+            for pending in batch:
+                n = len(pending.texts)
+                pending.result = proba[offset:offset + n] if n else []
+                offset += n
+                pending.done.set()
+            self.metrics.record_batch(len(batch), len(texts), depth, waits, infer_ms)
+
+
+def load_scorer(backend, artifact, pkl_path):
+    """
+    Load and warm one backend.
+    Returns (score(texts) -> ndarray [n, k], class names).
+    """
+    import joblib
+    from benchmark_backends import load_backend
+
+    pipeline = joblib.load(pkl_path)
+    score = load_backend(backend, artifact, pipeline)
+    # First call allocates tensors / builds sessions outside any request
+    score(['warm up'])
+    return score, [c.item() if hasattr(c, 'item') else c for c in pipeline.classes_]
+
+
+def make_handler(batcher, metrics, classes, backend):
+    """BaseHTTPRequestHandler bound to one batcher."""
+    from http.server import BaseHTTPRequestHandler
+    from email_corpus import record_text
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def address_string(self):
+            # Unix socket peers have no (host, port)
+            return self.client_address[0] if self.client_address else 'unix'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send(200, metrics.snapshot(batcher.queue.qsize()))
+            elif self.path == '/healthz':
+                self._send(200, {'ok': True, 'backend': backend})
+            else:
+                self._send(404, {'error': f'unknown path {self.path}'})
+
+        def do_POST(self):
+            if self.path != '/score':
+                self._send(404, {'error': f'unknown path {self.path}'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                if 'emails' in payload:
+                    texts = [record_text(record) for record in payload['emails']]
+                else:
+                    texts = [str(text) for text in payload['texts']]
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {'error': f'bad request: {e}'})
+                return
+            try:
+                proba = batcher.submit(texts)
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+                return
+            rows = [[round(float(p), 6) for p in row] for row in proba]
+            self._send(200, {
+                'classes': classes,
+                'probabilities': rows,
+                'predictions': [classes[max(range(len(row)), key=row.__getitem__)] for row in rows],
+            })
+
+    return ScoringHandler
+
+
+def make_server(listen, handler):
+    """Threading HTTP server on localhost TCP or a Unix socket."""
+    import os
+    import socketserver
+    from http.server import ThreadingHTTPServer
+
+    kind, address = parse_listen(listen)
+    if kind == 'tcp':
+        return ThreadingHTTPServer(address, handler)
+
+    class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(address):
+        os.unlink(address)
+    return UnixHTTPServer(address, handler)
+
+
+def request(listen, method, path, payload=None, timeout=REQUEST_TIMEOUT_S):
+    """One HTTP request to a daemon; returns the decoded JSON response."""
+    import socket
+    import http.client
+
+    kind, address = parse_listen(listen)
+    if kind == 'tcp':
+        conn = http.client.HTTPConnection(*address, timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection('localhost', timeout=timeout)
+        conn.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # A blocking connect waits for backlog space; with a timeout set first,
+        # a busy Unix socket fails at once with EAGAIN
+        conn.sock.connect(address)
+        conn.sock.settimeout(timeout)
+    try:
+        body = None if payload is None else json.dumps(payload).encode('utf-8')
+        headers = {} if body is None else {'Content-Type': 'application/json'}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = json.loads(response.read() or b'{}')
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path} → {response.status}: {data.get('error')}")
+        return data
+    finally:
+        conn.close()
+
+
+def bench(listen, corpus, concurrency=16, per_request=1, limit=5000):
+    """
+    Fire corpus emails at a running daemon from concurrent clients.
+    Returns (emails/sec, client latency p50 ms, daemon metrics).
+    """
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+    from email_corpus import load_texts
+
+    texts = load_texts(corpus, limit=limit)[0]
+    chunks = [texts[i:i + per_request] for i in range(0, len(texts), per_request)]
+
+    def send(chunk):
+        start = time.perf_counter()
+        request(listen, 'POST', '/score', {'texts': chunk})
+        return (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(send, chunks))
+    elapsed = time.perf_counter() - start
+    return len(texts) / elapsed, float(np.percentile(latencies, 50)), request(listen, 'GET', '/metrics')
+
+
+def main():
+    """Run the daemon, or load-test one with --bench."""
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(description='Warm-model scoring daemon with micro-batching')
+    parser.add_argument('--backend', default='pickle',
+                        choices=['pickle', 'onnx', 'ort', 'tflite', 'numpy'],
+                        help='Scoring backend (default: pickle)')
+    parser.add_argument('--artifact', help='Model file for the backend (default: its usual path)')
+    parser.add_argument('--pickle', default='priority_classifier.pkl',
+                        help='Pickled pipeline: class names and TF-IDF features for dense models')
+    parser.add_argument('--listen', default=DEFAULT_LISTEN,
+                        help=f'host:port or unix:/path (default: {DEFAULT_LISTEN})')
+    parser.add_argument('--window-ms', type=float, default=DEFAULT_WINDOW_MS,
+                        help=f'Max wait after the first queued request (default: {DEFAULT_WINDOW_MS:g})')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help=f'Max emails per batch (default: {DEFAULT_MAX_BATCH})')
+    parser.add_argument('--bench', metavar='CORPUS', help='Load-test a running daemon with a JSONL corpus')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients for --bench')
+    parser.add_argument('--per-request', type=int, default=1, help='Emails per request for --bench')
+
+    args = parser.parse_args()
+
+    try:
+        parse_listen(args.listen)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.bench:
+        rate, p50, daemon = bench(args.listen, args.bench, max(args.concurrency, 1),
+                                  max(args.per_request, 1))
+        print(f"✓ {rate:,.0f} emails/s, client p50 {p50:.2f} ms")
+        print(json.dumps(daemon, indent=2))
+        return 0
+
+    from benchmark_backends import DEFAULT_ARTIFACTS
+
+    artifact = args.artifact or (args.pickle if args.backend == 'pickle' else DEFAULT_ARTIFACTS[args.backend])
+    for path in (args.pickle, artifact):
+        if not Path(path).exists():
+            print(f"✗ File not found: {path}", file=sys.stderr)
+            return 1
+
+    start = time.perf_counter()
+    try:
+        score, classes = load_scorer(args.backend, artifact, args.pickle)
+    except Exception as e:
+        print(f"✗ Could not load the {args.backend} backend from {artifact}: {e}", file=sys.stderr)
+        return 1
+    print(f"✓ {args.backend} model loaded from {artifact} in {time.perf_counter() - start:.2f}s",
+          file=sys.stderr)
+
+    metrics = Metrics()
+    batcher = MicroBatcher(score, metrics, args.window_ms, max(args.max_batch, 1))
+    batcher.start()
+    server = make_server(args.listen, make_handler(batcher, metrics, classes, args.backend))
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"✓ Listening on {args.listen} (window {args.window_ms:g} ms, max batch {args.max_batch})",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+        kind, address = parse_listen(args.listen)
+        if kind == 'unix':
+            Path(address).unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,884 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Snapshot Store
+
+Incremental mailbox snapshots for the offline tools. EmailLocalStorage.saveEmails
+clears its Hive box and rewrites every message on each sync, and JSONL exports
+do the same; here a refresh only writes what changed:
+
+    <store>/MANIFEST.json          segment order, index and journal names
+    <store>/seg-000001.log ...     append-only record log (puts and tombstones)
+    <store>/index-000001.bin       id → (segment, offset, length, digest)
+                                   checkpoint, memory-mapped, sorted by id hash
+    <store>/journal-000001.log     index changes since that checkpoint
+
+Every log record and journal entry carries a CRC32, so a torn tail from a
+crash is detected and dropped on open. Segment data is flushed before the
+journal entries that point at it. The manifest is replaced atomically.
+
+merge() compares each incoming record's digest with the index (a binary
+search in the mapped checkpoint, or the journal) and appends only new or
+changed records; deletes append tombstones. Unchanged records cost a lookup,
+so a refresh costs O(changed) I/O. The journal is folded into a new
+checkpoint once it reaches a quarter of the store, which keeps that amortized.
+
+compact() seals the active segment, copies live records from the sealed
+segments into new ones without holding the store lock (writers keep
+appending meanwhile), then installs the copies except for ids written in
+the meantime. Segments are read through mmap.
+
+One process writes a store at a time; threads within it are fine.
+
+rule_scorer.iter_records() (and so every --input flag that uses it) and
+email_corpus.iter_batches() / load_texts() accept a store directory, and
+gmail_ingest.py --store merges fetched messages into one.
+
+Usage:
+    python3 snapshot_store.py --store mail.store --merge export.jsonl [--replace]
+    python3 snapshot_store.py --store mail.store --delete ids.txt
+    python3 snapshot_store.py --store mail.store --export mail.jsonl
+    python3 snapshot_store.py --store mail.store --compact
+    python3 snapshot_store.py --store mail.store --stats [--verify]
+    python3 snapshot_store.py --bench [--bench-records 100000] [--bench-changed 0.01]
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import struct
+import hashlib
+import threading
+from pathlib import Path
+
+
+MANIFEST_NAME = 'MANIFEST.json'
+FORMAT_VERSION = 1
+SEGMENT_BYTES = 64 << 20
+# Fold the journal into a new checkpoint once it holds this share of the store
+CHECKPOINT_RATIO = 0.25
+CHECKPOINT_MIN_ENTRIES = 10000
+# compact_if_needed() threshold: share of segment bytes no longer live
+COMPACT_DEAD_RATIO = 0.5
+
+PUT, TOMBSTONE = 0, 1
+RECORD_HEADER = struct.Struct('<IBHI')      # crc32, kind, id length, payload length
+JOURNAL_ENTRY = struct.Struct('<IBHIQIQ')   # crc32, kind, id length, segment, offset, length, digest
+INDEX_MAGIC = b'MMSI'
+INDEX_HEADER = struct.Struct('<4sIQQ')      # magic, version, entries, id blob bytes
+
+
+class StoreError(Exception):
+    """The store on disk is missing, from another version or inconsistent."""
+
+
+def id_hash(key):
+    """64-bit hash of an id (bytes), the checkpoint's sort key."""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+_CANONICAL = json.JSONEncoder(ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def encode_payload(record):
+    """Canonical JSON bytes of a record, so equal records have equal digests."""
+    return _CANONICAL.encode(record).encode('utf-8')
+
+
+def payload_digest(payload):
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), 'little')
+
+
+def encode_record(kind, key, payload=b''):
+    body = RECORD_HEADER.pack(0, kind, len(key), len(payload))[4:] + key + payload
+    return struct.pack('<I', zlib.crc32(body)) + body
+
+
+def decode_record(buf, offset):
+    """(kind, key, payload, end) of the log record at offset, or None if torn or corrupt."""
+    if offset + RECORD_HEADER.size > len(buf):
+        return None
+    crc, kind, key_len, payload_len = RECORD_HEADER.unpack_from(buf, offset)
+    end = offset + RECORD_HEADER.size + key_len + payload_len
+    if end > len(buf) or zlib.crc32(buf[offset + 4:end]) != crc:
+        return None
+    key_start = offset + RECORD_HEADER.size
+    return kind, bytes(buf[key_start:key_start + key_len]), bytes(buf[key_start + key_len:end]), end
+
+
+def segment_name(segment):
+    return f"seg-{segment:06d}.log"
+
+
+class SegmentReader:
+    """Memory-mapped view of one segment, remapped when the file has grown."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._size = 0
+
+    def _view(self, end):
+        if end > self._size:
+            if self._file is None:
+                self._file = open(self.path, 'rb')
+            size = os.fstat(self._file.fileno()).st_size
+            if end > size:
+                raise StoreError(f"{self.path} ends at {size}, record ends at {end}")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._size = size
+        return self._map
+
+    def read(self, offset, length):
+        return self._view(offset + length)[offset:offset + length]
+
+    def scan(self):
+        """(offset, kind, key, payload) of every record up to a torn tail."""
+        size = os.path.getsize(self.path)
+        if not size:
+            return
+        view = self._view(size)
+        offset = 0
+        while True:
+            decoded = decode_record(view, offset)
+            if decoded is None:
+                return
+            kind, key, payload, end = decoded
+            yield offset, kind, key, payload
+            offset = end
+
+
+class Checkpoint:
+    """
+    Sorted, memory-mapped id index. Columns are stored back to back:
+    hash, digest, offset (uint64), id offsets (uint64, n + 1),
+    segment, length (uint32), then the id bytes.
+    """
+
+    def __init__(self, columns, ids):
+        self.columns = columns
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.columns['hash'])
+
+    @classmethod
+    def empty(cls):
+        import numpy as np
+
+        columns = {name: np.zeros(0, dtype=dtype) for name, dtype in CHECKPOINT_COLUMNS}
+        columns['id_offsets'] = np.zeros(1, dtype=np.uint64)
+        return cls(columns, b'')
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        with open(path, 'rb') as f:
+            magic, version, count, blob_size = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC or version != FORMAT_VERSION:
+            raise StoreError(f"{path} is not a version {FORMAT_VERSION} snapshot index")
+        if not count:
+            return cls.empty()
+        with open(path, 'rb') as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        columns, offset = {}, INDEX_HEADER.size
+        for name, dtype in CHECKPOINT_COLUMNS:
+            n = count + 1 if name == 'id_offsets' else count
+            columns[name] = np.frombuffer(view, dtype=dtype, count=n, offset=offset)
+            offset += n * np.dtype(dtype).itemsize
+        ids = memoryview(view)[offset:offset + blob_size]
+        return cls(columns, ids)
+
+    @staticmethod
+    def write(path, hashes, digests, offsets, segments, lengths, keys):
+        """Write a checkpoint from unsorted columns (keys: list of id bytes)."""
+        import numpy as np
+
+        hashes = np.array(hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind='stable')
+        keys = [keys[i] for i in order.tolist()]
+        id_offsets = np.zeros(len(keys) + 1, dtype=np.uint64)
+        np.cumsum([len(k) for k in keys], out=id_offsets[1:])
+        blob = b''.join(keys)
+        tmp = Path(str(path) + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, FORMAT_VERSION, len(keys), len(blob)))
+            for column, dtype in ((hashes, '<u8'), (digests, '<u8'), (offsets, '<u8'),
+                                  (None, '<u8'), (segments, '<u4'), (lengths, '<u4')):
+                data = id_offsets if column is None else np.array(column, dtype=dtype)[order]
+                f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def key(self, position):
+        offsets = self.columns['id_offsets']
+        return bytes(self.ids[int(offsets[position]):int(offsets[position + 1])])
+
+    def keys(self):
+        """Every id, in checkpoint order."""
+        blob, offsets = bytes(self.ids), self.columns['id_offsets'].tolist()
+        return [blob[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def positions(self, key_hashes):
+        """First candidate position for each hash (vectorized binary search)."""
+        import numpy as np
+
+        return np.searchsorted(self.columns['hash'], np.asarray(key_hashes, dtype=np.uint64))
+
+    def find(self, key, key_hash, start=None):
+        """Position of key, or None. start is a precomputed positions() result."""
+        hashes = self.columns['hash']
+        position = int(self.positions([key_hash])[0]) if start is None else start
+        while position < len(hashes) and int(hashes[position]) == key_hash:
+            if self.key(position) == key:
+                return position
+            position += 1
+        return None
+
+    def entry(self, position):
+        c = self.columns
+        return (int(c['segment'][position]), int(c['offset'][position]),
+                int(c['length'][position]), int(c['digest'][position]))
+
+
+CHECKPOINT_COLUMNS = [('hash', '<u8'), ('digest', '<u8'), ('offset', '<u8'),
+                      ('id_offsets', '<u8'), ('segment', '<u4'), ('length', '<u4')]
+
+
+class SnapshotStore:
+    """
+    Append-only store of records keyed by their 'id'. Entries are
+    (segment, offset, length, digest) locations of the latest put.
+    """
+
+    def __init__(self, path, create=True, fsync=True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._compaction = None
+        self._touched = None  # ids written while a compaction copies
+
+        manifest_path = self.path / MANIFEST_NAME
+        if not manifest_path.exists():
+            if not create:
+                raise StoreError(f"No snapshot store at {self.path}")
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.manifest = {'format': FORMAT_VERSION, 'segments': [1], 'next_segment': 2,
+                             'generation': 1, 'index': None, 'journal': 'journal-000001.log',
+                             'committed': {'segment': 1, 'end': 0}}
+            (self.path / segment_name(1)).touch()
+            (self.path / self.manifest['journal']).touch()
+            self._write_manifest()
+        else:
+            self.manifest = json.loads(manifest_path.read_text())
+            if self.manifest.get('format') != FORMAT_VERSION:
+                raise StoreError(f"{self.path} uses store format {self.manifest.get('format')}, "
+                                 f"expected {FORMAT_VERSION}")
+
+        self._readers = {s: SegmentReader(self.path / segment_name(s)) for s in self.manifest['segments']}
+        index = self.manifest['index']
+        self._checkpoint = Checkpoint.load(self.path / index) if index else Checkpoint.empty()
+        self._live = len(self._checkpoint)
+        self._live_bytes = int(self._checkpoint.columns['length'].sum(dtype='uint64'))
+        self._journal = {}
+        self._replay_journal()
+        self._open_writers()
+        self._remove_unreferenced()
+
+    # --- opening --------------------------------------------------------
+
+    def _write_manifest(self):
+        tmp = self.path / (MANIFEST_NAME + '.tmp')
+        tmp.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp, self.path / MANIFEST_NAME)
+
+    def _replay_journal(self):
+        path = self.path / self.manifest['journal']
+        data = path.read_bytes()
+        offset, ends = 0, {}
+        while offset + JOURNAL_ENTRY.size <= len(data):
+            crc, kind, key_len, segment, seg_offset, length, digest = \
+                JOURNAL_ENTRY.unpack_from(data, offset)
+            end = offset + JOURNAL_ENTRY.size + key_len
+            if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+                break
+            reader = self._readers.get(segment)
+            if reader is None or seg_offset + length > os.path.getsize(reader.path):
+                # The entry made it to disk but its record did not
+                break
+            key = data[offset + JOURNAL_ENTRY.size:end]
+            self._apply(key, (segment, seg_offset, length, digest) if kind == PUT else None)
+            ends[segment] = max(ends.get(segment, 0), seg_offset + length)
+            offset = end
+        if offset != len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        self._truncate_uncommitted(ends)
+
+    def _truncate_uncommitted(self, ends):
+        """
+        Cut records no journal entry points at (a crash between writing a
+        record and its journal entry) off the segments written since the
+        last checkpoint, so appends continue from committed data.
+        """
+        committed = self.manifest['committed']
+        segments = self.manifest['segments']
+        for segment in segments[segments.index(committed['segment']):]:
+            end = max(ends.get(segment, 0), committed['end'] if segment == committed['segment'] else 0)
+            path = self._readers[segment].path
+            if os.path.getsize(path) > end:
+                with open(path, 'r+b') as f:
+                    f.truncate(end)
+
+    def _open_writers(self):
+        active = self.manifest['segments'][-1]
+        self._segment_file = open(self.path / segment_name(active), 'ab')
+        self._segment_size = self._segment_file.tell()
+        self._journal_file = open(self.path / self.manifest['journal'], 'ab')
+
+    def _remove_unreferenced(self):
+        """Delete files left behind by a crash or a retired segment that was still mapped."""
+        keep = {MANIFEST_NAME, self.manifest['journal'], self.manifest['index']}
+        keep.update(segment_name(s) for s in self.manifest['segments'])
+        for path in self.path.iterdir():
+            if path.name not in keep and path.name.startswith(('seg-', 'index-', 'journal-')):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    # --- lookups --------------------------------------------------------
+
+    def _locate(self, key, key_hash=None, start=None):
+        """Current (segment, offset, length, digest) of key, or None."""
+        if key in self._journal:
+            return self._journal[key]
+        if not len(self._checkpoint):
+            return None
+        position = self._checkpoint.find(key, id_hash(key) if key_hash is None else key_hash, start)
+        return None if position is None else self._checkpoint.entry(position)
+
+    def _apply(self, key, entry):
+        """Point key at entry (None deletes it) and keep the counters right."""
+        previous = self._locate(key)
+        if previous is not None:
+            self._live -= 1
+            self._live_bytes -= previous[2]
+        if entry is not None:
+            self._live += 1
+            self._live_bytes += entry[2]
+        self._journal[key] = entry
+        if self._touched is not None:
+            self._touched.add(key)
+
+    def __len__(self):
+        return self._live
+
+    def __contains__(self, record_id):
+        with self._lock:
+            return self._locate(str(record_id).encode('utf-8')) is not None
+
+    def _read(self, entry):
+        segment, offset, length, _ = entry
+        decoded = decode_record(self._readers[segment].read(offset, length), 0)
+        if decoded is None:
+            raise StoreError(f"Corrupt record in {segment_name(segment)} at {offset}")
+        return decoded[2]
+
+    def get(self, record_id):
+        """The stored record, or None."""
+        with self._lock:
+            entry = self._locate(str(record_id).encode('utf-8'))
+            return None if entry is None else json.loads(self._read(entry))
+
+    def _entries(self):
+        """[(key, entry)] of every live record, in storage order."""
+        checkpoint = self._checkpoint
+        overridden = set()
+        if len(checkpoint) and self._journal:
+            keys = list(self._journal)
+            starts = checkpoint.positions([id_hash(k) for k in keys]).tolist()
+            for key, start in zip(keys, starts):
+                position = checkpoint.find(key, id_hash(key), start)
+                if position is not None:
+                    overridden.add(position)
+        c = checkpoint.columns
+        segments, offsets = c['segment'].tolist(), c['offset'].tolist()
+        lengths, digests = c['length'].tolist(), c['digest'].tolist()
+        entries = [(key, (segments[i], offsets[i], lengths[i], digests[i]))
+                   for i, key in enumerate(checkpoint.keys()) if i not in overridden]
+        entries.extend((k, e) for k, e in self._journal.items() if e is not None)
+        order = {s: i for i, s in enumerate(self.manifest['segments'])}
+        entries.sort(key=lambda item: (order[item[1][0]], item[1][1]))
+        return entries
+
+    def ids(self):
+        with self._lock:
+            return [key.decode('utf-8') for key, _ in self._entries()]
+
+    def iter_records(self, batch_size=1024):
+        """Every live record, in storage order (sequential reads)."""
+        with self._lock:
+            entries = self._entries()
+            readers = dict(self._readers)
+        for first in range(0, len(entries), batch_size):
+            batch = []
+            with self._lock:
+                for _, (segment, offset, length, _) in entries[first:first + batch_size]:
+                    decoded = decode_record(readers[segment].read(offset, length), 0)
+                    batch.append(json.loads(decoded[2]))
+            yield from batch
+
+    # --- writes ---------------------------------------------------------
+
+    def _append(self, kind, key, payload=b''):
+        """Append one log record; returns its (segment, offset, length)."""
+        data = encode_record(kind, key, payload)
+        if self._segment_size and self._segment_size + len(data) > SEGMENT_BYTES:
+            self._roll_segment()
+        offset = self._segment_size
+        self._segment_file.write(data)
+        self._segment_size += len(data)
+        return self.manifest['segments'][-1], offset, len(data)
+
+    def _roll_segment(self):
+        self._segment_file.flush()
+        if self.fsync:
+            os.fsync(self._segment_file.fileno())
+        self._segment_file.close()
+        segment = self.manifest['next_segment']
+        self.manifest['next_segment'] += 1
+        self.manifest['segments'].append(segment)
+        path = self.path / segment_name(segment)
+        path.touch()
+        self._readers[segment] = SegmentReader(path)
+        self._write_manifest()
+        self._segment_file = open(path, 'ab')
+        self._segment_size = 0
+
+    def _commit(self, journal):
+        """Make appended records durable, then the journal entries that point at them."""
+        if not journal:
+            return
+        self._segment_file.flush()
+        if self.fsync:
+            os.fsync(self._segment_file.fileno())
+        self._journal_file.write(b''.join(journal))
+        self._journal_file.flush()
+        if self.fsync:
+            os.fsync(self._journal_file.fileno())
+        if len(self._journal) >= max(CHECKPOINT_MIN_ENTRIES, CHECKPOINT_RATIO * self._live) \
+                and self._compaction is None:
+            self.checkpoint()
+
+    @staticmethod
+    def _journal_entry(kind, key, segment=0, offset=0, length=0, digest=0):
+        body = JOURNAL_ENTRY.pack(0, kind, len(key), segment, offset, length, digest)[4:] + key
+        return struct.pack('<I', zlib.crc32(body)) + body
+
+    def merge(self, records, deletes=()):
+        """
+        Upsert records by 'id' and delete the given ids. Unchanged records
+        are not written. Returns counts of added, updated, unchanged and
+        deleted records.
+        """
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        incoming = {}
+        for record in records:
+            if record.get('id') in (None, ''):
+                raise ValueError(f"Record without an id: {str(record)[:80]}")
+            incoming[str(record['id']).encode('utf-8')] = record
+        with self._lock:
+            keys = list(incoming)
+            hashes = [id_hash(k) for k in keys]
+            starts = self._checkpoint.positions(hashes).tolist() if len(self._checkpoint) \
+                else [None] * len(keys)
+            journal = []
+            for key, key_hash, start in zip(keys, hashes, starts):
+                payload = encode_payload(incoming[key])
+                digest = payload_digest(payload)
+                previous = self._locate(key, key_hash, start)
+                if previous is not None and previous[3] == digest:
+                    stats['unchanged'] += 1
+                    continue
+                segment, offset, length = self._append(PUT, key, payload)
+                self._apply(key, (segment, offset, length, digest))
+                journal.append(self._journal_entry(PUT, key, segment, offset, length, digest))
+                stats['added' if previous is None else 'updated'] += 1
+            for record_id in deletes:
+                key = str(record_id).encode('utf-8')
+                if key in incoming or self._locate(key) is None:
+                    continue
+                segment, offset, length = self._append(TOMBSTONE, key)
+                self._apply(key, None)
+                journal.append(self._journal_entry(TOMBSTONE, key, segment, offset, length))
+                stats['deleted'] += 1
+            self._commit(journal)
+        return stats
+
+    def delete(self, ids):
+        return self.merge((), ids)['deleted']
+
+    def replace(self, records):
+        """Make the store hold exactly these records, like EmailLocalStorage.saveEmails."""
+        records = list(records)
+        keep = {str(r.get('id')) for r in records}
+        with self._lock:
+            missing = [i for i in self.ids() if i not in keep]
+            return self.merge(records, missing)
+
+    # --- checkpoints and compaction -------------------------------------
+
+    def _install(self, hashes, digests, offsets, segments, lengths, keys, segment_order):
+        """Write a new checkpoint and an empty journal, then switch the manifest to them."""
+        generation = self.manifest['generation'] + 1
+        index = f"index-{generation:06d}.bin"
+        journal = f"journal-{generation:06d}.log"
+        Checkpoint.write(self.path / index, hashes, digests, offsets, segments, lengths, keys)
+        (self.path / journal).touch()
+
+        retired = [s for s in self.manifest['segments'] if s not in segment_order]
+        old_files = [self.manifest['journal'], self.manifest['index']]
+        self._segment_file.flush()
+        self.manifest.update(generation=generation, index=index, journal=journal,
+                             segments=segment_order,
+                             committed={'segment': segment_order[-1], 'end': self._segment_size})
+        self._write_manifest()
+
+        self._journal_file.close()
+        self._journal_file = open(self.path / journal, 'ab')
+        self._journal = {}
+        self._checkpoint = Checkpoint.load(self.path / index)
+        self._live = len(self._checkpoint)
+        self._live_bytes = int(self._checkpoint.columns['length'].sum(dtype='uint64'))
+        for segment in retired:
+            # Open iterators keep their own reader; the file goes once unmapped
+            self._readers.pop(segment, None)
+            old_files.append(segment_name(segment))
+        for name in old_files:
+            if name:
+                try:
+                    (self.path / name).unlink()
+                except OSError:
+                    pass  # still mapped (Windows); removed on the next open
+
+    def checkpoint(self):
+        """Fold the journal into a new memory-mapped checkpoint."""
+        with self._lock:
+            entries = self._entries()
+            self._install(*self._columns(entries), list(self.manifest['segments']))
+
+    @staticmethod
+    def _columns(entries):
+        keys = [key for key, _ in entries]
+        hashes = [id_hash(k) for k in keys]
+        segments, offsets, lengths, digests = (list(c) for c in zip(*[e for _, e in entries])) \
+            if entries else ([], [], [], [])
+        return hashes, digests, offsets, segments, lengths, keys
+
+    def compact(self, background=False):
+        """
+        Rewrite live records into fresh segments and drop the rest. With
+        background=True this runs in a thread (returned) while merges go on.
+        """
+        if background:
+            thread = threading.Thread(target=self.compact, name='snapshot-compaction')
+            thread.start()
+            return thread
+
+        with self._lock:
+            if self._compaction is not None:
+                return None
+            self._compaction = threading.current_thread()
+            self._roll_segment()
+            first_new = self.manifest['segments'][-1]
+            entries = [item for item in self._entries() if item[1][0] != first_new]
+            readers = dict(self._readers)
+            self._touched = set()
+        start = time.perf_counter()
+        try:
+            copied, out_segments = self._copy(entries, readers)
+            with self._lock:
+                touched = self._touched
+                kept = [(key, entry) for key, entry in copied if key not in touched]
+                kept.extend((key, self._journal[key]) for key in touched
+                            if self._journal.get(key) is not None)
+                newer = self.manifest['segments'][self.manifest['segments'].index(first_new):]
+                before = sum(os.path.getsize(self.path / segment_name(s))
+                             for s in self.manifest['segments'])
+                self._install(*self._columns(kept), out_segments + newer)
+                after = sum(os.path.getsize(self.path / segment_name(s))
+                            for s in self.manifest['segments'])
+        finally:
+            with self._lock:
+                self._touched = None
+                self._compaction = None
+        return {'records': len(entries), 'bytes_before': before, 'bytes_after': after,
+                'seconds': round(time.perf_counter() - start, 3)}
+
+    def _copy(self, entries, readers):
+        """Copy records into new segments; returns ([(key, new entry)], segment ids)."""
+        copied, out_segments = [], []
+        out, size = None, 0
+        try:
+            for key, (segment, offset, length, digest) in entries:
+                if out is None or size + length > SEGMENT_BYTES:
+                    if out is not None:
+                        out.flush()
+                        os.fsync(out.fileno())
+                        out.close()
+                    with self._lock:
+                        new = self.manifest['next_segment']
+                        self.manifest['next_segment'] += 1
+                        self._readers[new] = SegmentReader(self.path / segment_name(new))
+                    out_segments.append(new)
+                    out, size = open(self.path / segment_name(new), 'wb'), 0
+                out.write(readers[segment].read(offset, length))
+                copied.append((key, (out_segments[-1], size, length, digest)))
+                size += length
+        finally:
+            if out is not None:
+                out.flush()
+                os.fsync(out.fileno())
+                out.close()
+        return copied, out_segments
+
+    def compact_if_needed(self, ratio=COMPACT_DEAD_RATIO):
+        """Start a background compaction when more than `ratio` of segment bytes are dead."""
+        stats = self.stats()
+        if stats['segment_bytes'] and stats['dead_bytes'] > ratio * stats['segment_bytes']:
+            return self.compact(background=True)
+        return None
+
+    def wait(self):
+        """Wait for a background compaction to finish."""
+        thread = self._compaction
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def stats(self):
+        with self._lock:
+            segment_bytes = sum(os.path.getsize(r.path) for r in self._readers.values()
+                                if r.path.exists())
+            self._segment_file.flush()
+            return {'records': self._live, 'segments': len(self.manifest['segments']),
+                    'segment_bytes': segment_bytes, 'live_bytes': self._live_bytes,
+                    'dead_bytes': max(segment_bytes - self._live_bytes, 0),
+                    'checkpoint_entries': len(self._checkpoint),
+                    'journal_entries': len(self._journal)}
+
+    def verify(self):
+        """
+        Replay the segment logs alone and compare with the index.
+        Returns a list of problems (empty when consistent).
+        """
+        with self._lock:
+            replayed = {}
+            for segment in self.manifest['segments']:
+                for offset, kind, key, payload in self._readers[segment].scan():
+                    replayed[key] = (segment, offset, payload_digest(payload)) if kind == PUT else None
+            indexed = {key: (entry[0], entry[1], entry[3]) for key, entry in self._entries()}
+        live = {k: v for k, v in replayed.items() if v is not None}
+        problems = []
+        for key in live.keys() - indexed.keys():
+            problems.append(f"{key.decode()}: in the log but not the index")
+        for key in indexed.keys() - live.keys():
+            problems.append(f"{key.decode()}: in the index but deleted or missing in the log")
+        for key in live.keys() & indexed.keys():
+            if live[key] != indexed[key]:
+                problems.append(f"{key.decode()}: index points at {indexed[key][:2]}, "
+                                f"log's latest is {live[key][:2]}")
+        return problems
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            self._segment_file.flush()
+            self._segment_file.close()
+            self._journal_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def is_snapshot_store(path):
+    """True when `path` is a store directory."""
+    return (Path(path) / MANIFEST_NAME).is_file()
+
+
+def read_store(path):
+    """Yield the records of a store, for the corpus readers."""
+    store = SnapshotStore(path, create=False)
+    try:
+        yield from store.iter_records()
+    finally:
+        store.close()
+
+
+def _bench_records(n, seed=0, version=0):
+    import random
+
+    rng = random.Random(seed)
+    subjects = ['Q{n} report due by Friday', 'Weekly newsletter #{n}', 'Interview scheduled {n}/12',
+                'Invoice {n} payment received', 'Meeting notes {n}']
+    return [{'id': f"{i:016x}", 'subject': rng.choice(subjects).format(n=i % 97),
+             'from': f"sender{i % 311}@example.com", 'date': '2024-06-01T09:00:00.000',
+             'snippet': ' '.join(rng.choice(['please', 'review', 'the', 'attached', 'report',
+                                             'before', 'friday', 'thanks']) for _ in range(24)),
+             'labels': ['INBOX'], 'isRead': bool(i % 3), 'version': version}
+            for i in range(n)]
+
+
+def bench(path, n, changed):
+    """Full JSONL rewrite vs store merge when `changed` of n records change."""
+    import shutil
+
+    path = Path(path)
+    if path.exists():
+        shutil.rmtree(path)
+    path.mkdir(parents=True)
+    records = _bench_records(n)
+    n_changed = max(int(n * changed), 1)
+    refreshed = [dict(r, isRead=not r['isRead'], version=1) if i % (n // n_changed) == 0 else r
+                 for i, r in enumerate(records)][:n]
+    deleted = [r['id'] for r in records[1:n_changed * 2:2]]
+    refreshed = [r for r in refreshed if r['id'] not in set(deleted)]
+    rows = []
+
+    def timed(name, fn, written):
+        start = time.perf_counter()
+        result = fn()
+        rows.append({'step': name, 'seconds': round(time.perf_counter() - start, 4),
+                     'bytes_written': written() if callable(written) else written})
+        return result
+
+    jsonl = path / 'export.jsonl'
+
+    def rewrite(rows_):
+        with open(jsonl, 'w', encoding='utf-8') as f:
+            for r in rows_:
+                f.write(json.dumps(r, ensure_ascii=False) + '\n')
+
+    timed('jsonl: initial export', lambda: rewrite(records), lambda: jsonl.stat().st_size)
+    timed('jsonl: refresh (rewrite all)', lambda: rewrite(refreshed), lambda: jsonl.stat().st_size)
+
+    store = SnapshotStore(path / 'mail.store')
+    size = lambda: store.stats()['segment_bytes']
+    timed('store: initial merge', lambda: store.merge(records), size)
+    before = size()
+    stats = timed('store: refresh (replace, full export in)', lambda: store.replace(refreshed),
+                  lambda: size() - before)
+    before = size()
+    delta = [dict(r, isRead=not r['isRead']) for r in refreshed[:n_changed]]
+    timed('store: refresh (delta only in)', lambda: store.merge(delta), lambda: size() - before)
+    timed('store: compact', store.compact, lambda: size())
+    store.close()
+    timed('store: reopen', lambda: SnapshotStore(path / 'mail.store').close(), 0)
+    store = SnapshotStore(path / 'mail.store')
+    count = timed('store: read all (mmap)', lambda: sum(1 for _ in store.iter_records()), 0)
+    problems = store.verify()
+    store.close()
+    return {'records': n, 'changed': n_changed, 'deleted': len(deleted), 'refresh': stats,
+            'read_back': count, 'verify_problems': len(problems), 'steps': rows}
+
+
+def main():
+    """Maintain a mailbox snapshot store."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Append-only mailbox snapshot store')
+    parser.add_argument('--store', help='Store directory (created on first --merge)')
+    parser.add_argument('--merge', action='append', default=[],
+                        help='JSONL or .mbox export to merge by id (repeatable)')
+    parser.add_argument('--replace', action='store_true',
+                        help='Also delete ids missing from the --merge exports')
+    parser.add_argument('--delete', help='File of ids to delete, one per line')
+    parser.add_argument('--export', help='Write every live record here as JSONL')
+    parser.add_argument('--compact', action='store_true', help='Rewrite live records, drop the rest')
+    parser.add_argument('--stats', action='store_true', help='Print store statistics')
+    parser.add_argument('--verify', action='store_true', help='Check the index against the logs')
+    parser.add_argument('--no-fsync', action='store_true', help='Skip fsync on commit (faster, less durable)')
+    parser.add_argument('--bench', action='store_true', help='Benchmark JSONL rewrites against the store')
+    parser.add_argument('--bench-records', type=int, default=100000, help='Records for --bench (default: 100000)')
+    parser.add_argument('--bench-changed', type=float, default=0.01,
+                        help='Share of records changed per refresh in --bench (default: 0.01)')
+    parser.add_argument('--bench-dir', default='.snapshot_bench', help='Scratch directory for --bench')
+
+    args = parser.parse_args()
+
+    if args.bench:
+        report = bench(args.bench_dir, max(args.bench_records, 2), args.bench_changed)
+        for row in report['steps']:
+            print(f"  {row['step']:<42} {row['seconds']:>8.3f}s {row['bytes_written'] / 1e6:>9.2f} MB",
+                  file=sys.stderr)
+        print(json.dumps(report, indent=2))
+        return 1 if report['verify_problems'] else 0
+
+    if not args.store:
+        parser.error('--store is required unless --bench is given')
+    from rule_scorer import iter_records
+
+    for source in args.merge:
+        if not Path(source).exists():
+            print(f"✗ Input file not found: {source}", file=sys.stderr)
+            return 1
+    if not args.merge and not is_snapshot_store(args.store):
+        print(f"✗ No snapshot store at {args.store}", file=sys.stderr)
+        return 1
+
+    try:
+        store = SnapshotStore(args.store, fsync=not args.no_fsync)
+    except StoreError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+    with store:
+        if args.merge:
+            start = time.perf_counter()
+            records = [r for source in args.merge for r in iter_records(source)]
+            stats = store.replace(records) if args.replace else store.merge(records)
+            print(f"✓ Merged {len(records)} records in {time.perf_counter() - start:.2f}s: "
+                  f"{stats['added']} added, {stats['updated']} updated, "
+                  f"{stats['unchanged']} unchanged, {stats['deleted']} deleted", file=sys.stderr)
+        if args.delete:
+            ids = [line.strip() for line in open(args.delete, encoding='utf-8') if line.strip()]
+            print(f"✓ Deleted {store.delete(ids)} of {len(ids)} ids", file=sys.stderr)
+        if args.compact:
+            result = store.compact()
+            if result:
+                print(f"✓ Compacted {result['records']} records: {result['bytes_before'] / 1e6:.2f} MB → "
+                      f"{result['bytes_after'] / 1e6:.2f} MB in {result['seconds']:.2f}s", file=sys.stderr)
+        elif args.merge and store.compact_if_needed():
+            print('→ Compacting in the background (more than half the log is dead)', file=sys.stderr)
+        if args.export:
+            count = 0
+            with open(args.export, 'w', encoding='utf-8') as out:
+                for record in store.iter_records():
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    count += 1
+            print(f"✓ Exported {count} records to {args.export}", file=sys.stderr)
+        if args.verify:
+            problems = store.verify()
+            for problem in problems[:20]:
+                print(f"✗ {problem}", file=sys.stderr)
+            if problems:
+                print(f"✗ {len(problems)} index problems", file=sys.stderr)
+                return 1
+            print('✓ Index matches the segment logs', file=sys.stderr)
+        if args.stats or not (args.merge or args.delete or args.compact or args.export or args.verify):
+            store.wait()
+            print(json.dumps(store.stats(), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
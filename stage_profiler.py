@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Stage Profiler
+
+Records wall time, CPU time, RSS and the tracemalloc peak for each named
+stage of convert_model.py (joblib.load, convert_sklearn, export_graph,
+TFLiteConverter.convert, ...). Stages nest, so every sub-step appears under
+the stage that ran it.
+
+Two files are written:
+    <name>.json          per-stage summary (one row per stage, in start order)
+    <name>.trace.json    Chrome trace events: open in chrome://tracing or
+                         https://ui.perfetto.dev
+
+Timestamps are epoch microseconds, so stages recorded in --parallel worker
+processes line up with the parent's on the same timeline (one row per pid).
+
+The tracemalloc figure is the peak Python allocation above the level at the
+start of the stage. tracemalloc only sees Python allocations, so memory
+allocated natively by TensorFlow shows up in RSS but not there.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+
+
+def current_rss_mb():
+    """Current resident set size in MB, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    if sys.platform == 'darwin':
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._exit(self, exc_type)
+        return False
+
+
+class StageProfiler:
+    """Nested stage timer; a disabled profiler's stages cost nothing."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = []
+        self._stack = []
+        self._tracing = False
+
+    def start(self):
+        """Enable recording and start tracemalloc."""
+        import tracemalloc
+
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def stop(self):
+        """Stop tracemalloc if this profiler started it."""
+        import tracemalloc
+
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def stage(self, name, **args):
+        """Context manager timing one stage; extra kwargs go into the trace."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, args)
+
+    def _enter(self, stage):
+        import tracemalloc
+
+        if self._stack and tracemalloc.is_tracing():
+            # reset_peak() below would lose the parent's peak so far
+            parent = self._stack[-1]
+            parent.py_peak = max(parent.py_peak, tracemalloc.get_traced_memory()[1])
+        stage.path = '/'.join([s.name for s in self._stack] + [stage.name])
+        stage.depth = len(self._stack)
+        stage.py_peak = 0
+        stage.py_start = 0
+        if tracemalloc.is_tracing():
+            stage.py_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        stage.ts_us = time.time_ns() // 1000
+        stage.wall = time.perf_counter()
+        stage.cpu = time.process_time()
+        self._stack.append(stage)
+
+    def _exit(self, stage, exc_type):
+        import tracemalloc
+
+        wall = time.perf_counter() - stage.wall
+        cpu = time.process_time() - stage.cpu
+        if tracemalloc.is_tracing():
+            stage.py_peak = max(stage.py_peak, tracemalloc.get_traced_memory()[1])
+        self._stack.pop()
+        if self._stack:
+            parent = self._stack[-1]
+            parent.py_peak = max(parent.py_peak, stage.py_peak)
+
+        self.records.append({
+            'name': stage.name,
+            'path': stage.path,
+            'depth': stage.depth,
+            'status': 'error' if exc_type else 'ok',
+            'ts_us': stage.ts_us,
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'rss_mb': current_rss_mb(),
+            'peak_rss_mb': peak_rss_mb(),
+            'tracemalloc_peak_mb': round(max(stage.py_peak - stage.py_start, 0) / (1024 * 1024), 3),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': stage.args,
+        })
+
+    def annotate(self, **args):
+        """Attach extra trace args to the innermost open stage."""
+        if self._stack:
+            self._stack[-1].args.update(args)
+
+    def merge(self, records):
+        """Add records collected in another process (e.g. a race worker)."""
+        self.records.extend(records)
+
+    def summary(self):
+        """Stage rows in start order, grouped by process."""
+        first_seen = {}
+        for r in self.records:
+            first_seen[r['pid']] = min(first_seen.get(r['pid'], r['ts_us']), r['ts_us'])
+        return sorted(self.records, key=lambda r: (first_seen[r['pid']], r['pid'], r['ts_us'], r['depth']))
+
+    def chrome_trace(self):
+        """Chrome trace-event JSON object (complete 'X' events)."""
+        events = []
+        for pid in sorted({r['pid'] for r in self.records}):
+            label = 'convert_model' if pid == os.getpid() else f'worker {pid}'
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                           'args': {'name': label}})
+        for r in self.summary():
+            events.append({
+                'name': r['name'],
+                'cat': r['path'].split('/')[0],
+                'ph': 'X',
+                'ts': r['ts_us'],
+                'dur': max(int(r['wall_s'] * 1e6), 1),
+                'pid': r['pid'],
+                'tid': r['tid'],
+                'args': {
+                    'cpu_s': r['cpu_s'],
+                    'rss_mb': r['rss_mb'],
+                    'peak_rss_mb': r['peak_rss_mb'],
+                    'tracemalloc_peak_mb': r['tracemalloc_peak_mb'],
+                    'status': r['status'],
+                    **r['args'],
+                },
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, summary_path):
+        """
+        Write <summary_path> and its .trace.json sibling.
+        Returns (summary_path, trace_path).
+        """
+        summary_path = Path(summary_path)
+        trace_path = summary_path.with_name(summary_path.stem + '.trace.json')
+        summary_path.write_text(json.dumps({
+            'argv': sys.argv,
+            'python': sys.version.split()[0],
+            'stages': self.summary(),
+        }, indent=2, default=str))
+        trace_path.write_text(json.dumps(self.chrome_trace(), default=str))
+        return summary_path, trace_path
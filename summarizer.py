@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Summarizer
+
+Offline batch version of Summarizer.summarize (lib/core/summarizer.dart) for
+precomputing summaries over archived mail. Each record's
+'{subject} {snippet}' text (what EmailDetailModal summarizes) gets the same
+extractive summary as in the app:
+
+    {"id": "...", "summary": "Payment of $120 is due by Friday. ..."}
+
+The Dart code splits sentences with a regex, then checks every keyword with
+contains() on every sentence, compiles RegExp(r'\\d') per sentence and
+restores the original order with a List.contains() loop (O(n²)). This engine
+lowercases a whole batch of documents once and classifies every character
+in one NumPy pass: sentence terminators ([.!?] runs), document separators,
+whitespace, digits and keyword starts (a bigram lookup table, then the
+remaining characters). Overlapping keywords ("asapproved") are all seen.
+Trim bounds, lengths, space and digit counts and distinct keywords per
+sentence are then computed for all sentences at once. The top sentences of
+every document come from max_sentences rounds of a per-document maximum
+(np.maximum.reduceat) over (score, position), linear in the number of
+sentences, so the per-document Python work is only joining the selected
+sentences.
+
+Dart semantics kept here (the string helpers are in dart_text.py):
+    - lengths and the 200-unit fallback prefix count UTF-16 code units
+    - trim() strips Unicode White_Space and the BOM (not U+001C-U+001F)
+    - toLowerCase() on the VM is the simple case mapping ('İ' → 'i')
+    - \\d is ASCII only
+    - equal scores keep their original order: List.sort is an insertion
+      sort up to 33 elements. Longer lists use an unstable quicksort in
+      Dart, so which of several equally scored sentences wins may differ
+      there. Subject + snippet never gets that long.
+    - every occurrence of a selected sentence's text is kept when restoring
+      the original order, as the contains() loop does
+
+--verify runs a literal port of the Dart code next to the batch engine,
+checks that the two agree and reports docs/s for both.
+
+Usage:
+    python3 summarizer.py --input mail.jsonl [--output summaries.jsonl]
+                          [--max-sentences 2] [--batch-size 4096]
+    python3 summarizer.py --input mail.jsonl --verify
+    python3 summarizer.py --check-golden test/golden/summarizer.jsonl
+    python3 summarizer.py --input cases.jsonl --write-golden <file>
+
+The golden file is also read by test/summarizer_golden_test.dart, so both
+implementations are checked against the same expectations.
+"""
+
+import re
+import sys
+import json
+import time
+from pathlib import Path
+
+from dart_text import DART_WHITESPACE, dart_lower, dart_substring, utf16_len
+
+
+# Keep in sync with Summarizer._importantKeywords
+IMPORTANT_KEYWORDS = [
+    'deadline', 'due', 'submit', 'by', 'important', 'urgent', 'asap', 'action',
+    'required', 'approved', 'rejected', 'confirmation', 'alert', 'meeting',
+    'call', 'interview', 'offer', 'amount', 'total', 'price',
+]
+
+DEFAULT_MAX_SENTENCES = 2
+DEFAULT_BATCH_SIZE = 4096
+MIN_SENTENCE_LENGTH = 5     # sentences must be longer than this
+LONG_SENTENCE_SPACES = 10   # split(' ').length > 10
+FALLBACK_LENGTH = 200
+
+SENTENCE_END = re.compile(r'[.!?]+')
+DIGIT = re.compile(r'[0-9]')
+SEPARATOR = '\x00'
+
+# BatchSummarizer character classes; content characters are below WHITESPACE
+DIGIT_CLASS = 1
+WHITESPACE = 2
+TERMINATOR = 4
+BOUNDARY = 8
+
+
+def _fallback(text):
+    """text.substring(0, 200.clamp(0, text.length)) with Dart's UTF-16 indices."""
+    if text.isascii():
+        return text[:FALLBACK_LENGTH]
+    return dart_substring(text, 0, FALLBACK_LENGTH)
+
+
+def _score_sentence(sentence):
+    """Same as Summarizer._scoreSentence."""
+    score = 0.0
+    lower = dart_lower(sentence)
+    for keyword in IMPORTANT_KEYWORDS:
+        if keyword in lower:
+            score += 1.0
+    if len(sentence.split(' ')) > 10:
+        score += 0.5
+    if DIGIT.search(sentence):
+        score += 0.5
+    return score
+
+
+def reference_summarize(text, max_sentences=DEFAULT_MAX_SENTENCES):
+    """Literal port of Summarizer.summarize, for --verify."""
+    if not text:
+        return ''
+    sentences = [s.strip(DART_WHITESPACE) for s in SENTENCE_END.split(text)]
+    sentences = [s for s in sentences if s and utf16_len(s) > MIN_SENTENCE_LENGTH]
+    if not sentences:
+        return _fallback(text)
+
+    scored = [(sentence, _score_sentence(sentence)) for sentence in sentences]
+    scored.sort(key=lambda e: -e[1])
+    if max_sentences < 0:
+        # Iterable.take throws, which summarize catches
+        return _fallback(text)
+    top = [sentence for sentence, _ in scored[:max_sentences]]
+
+    result = [sentence for sentence in sentences if sentence in top]
+    return ' '.join(result).strip(DART_WHITESPACE)
+
+
+class BatchSummarizer:
+    """Summarizer.summarize over many documents with one vectorized pass per batch."""
+
+    def __init__(self, keywords=IMPORTANT_KEYWORDS):
+        import numpy as np
+
+        self.keywords = list(keywords)
+        self.max_len = max(len(k) for k in self.keywords)
+        # Characters are clipped to 255 before the lookups; nothing above 127 matters
+        self.bigram_first = np.zeros(1 << 16, dtype=bool)
+        self.codes = []
+        for keyword in self.keywords:
+            codes = [ord(c) for c in keyword]
+            self.bigram_first[codes[0] << 8 | codes[1]] = True
+            self.codes.append((codes[0] << 8 | codes[1], codes[2:]))
+
+        # Character classes, one lookup per character
+        self.classes = np.zeros(256, dtype=np.uint8)
+        self.classes[[ord(c) for c in '.!?']] = TERMINATOR
+        self.classes[0] = BOUNDARY  # SEPARATOR
+        self.classes[ord('0'):ord('9') + 1] = DIGIT_CLASS
+        self.classes[[ord(c) for c in DART_WHITESPACE if ord(c) < 256]] = WHITESPACE
+        self.wide_whitespace = np.array([ord(c) for c in DART_WHITESPACE if ord(c) >= 256],
+                                        dtype=np.uint32)
+
+    def summarize(self, text, max_sentences=DEFAULT_MAX_SENTENCES):
+        return self.summarize_batch([text], max_sentences)[0]
+
+    def summarize_batch(self, texts, max_sentences=DEFAULT_MAX_SENTENCES):
+        """One summary per text, in order."""
+        import numpy as np
+
+        texts = list(texts)
+        if max_sentences < 0:
+            # Iterable.take throws, which summarize catches
+            return [_fallback(t) if t else '' for t in texts]
+        joined = SEPARATOR.join(texts)
+        if not joined:
+            return [''] * len(texts)
+        if joined.count(SEPARATOR) != len(texts) - 1:
+            # A text contains the separator itself; take those one by one
+            return [reference_summarize(t, max_sentences) if SEPARATOR in t
+                    else self.summarize(t, max_sentences) for t in texts]
+
+        # One code per character (same length as joined, see dart_lower)
+        lowered = dart_lower(joined)
+        if lowered.isascii():
+            chars = np.frombuffer(lowered.encode('ascii'), dtype=np.uint8)
+            wide = None
+        else:
+            wide = np.frombuffer(lowered.encode('utf-32-le'), dtype=np.uint32)
+            chars = np.minimum(wide, 255).astype(np.uint8)
+        n = len(chars)
+
+        classes = self.classes[chars]
+        if wide is not None and len(self.wide_whitespace):
+            classes[np.isin(wide, self.wide_whitespace)] = WHITESPACE
+
+        # Boundaries: runs of [.!?] (one split point each) and document separators
+        boundaries = np.flatnonzero(classes & (TERMINATOR | BOUNDARY))
+        after = classes[np.minimum(boundaries + 1, n - 1)] & TERMINATOR
+        after[boundaries == n - 1] = 0
+        before = classes[boundaries - 1] & TERMINATOR
+        before[boundaries == 0] = 0
+        in_run = classes[boundaries] & TERMINATOR
+        run_starts = boundaries[(before & in_run) == 0]
+        run_ends = boundaries[(after & in_run) == 0] + 1
+        seg_start = np.concatenate(([0], run_ends))
+        seg_end = np.append(run_starts, n)
+        seg_doc = np.concatenate(([0], np.cumsum(chars[run_starts] == 0, dtype=np.int32)))
+
+        # Trim: first and last non-whitespace character of each segment
+        content = np.flatnonzero(classes < WHITESPACE)
+        head = np.searchsorted(content, seg_start)
+        tail = np.searchsorted(content, seg_end) - 1
+        segs = np.flatnonzero(tail >= head)
+        first = content[head[segs]]
+        last = content[tail[segs]] + 1
+
+        # Dart lengths are UTF-16 code units
+        length = last - first
+        if wide is not None:
+            astral = np.flatnonzero(wide > 0xFFFF)
+            length = length + np.searchsorted(astral, last) - np.searchsorted(astral, first)
+        kept = length > MIN_SENTENCE_LENGTH
+        segs, first, last = segs[kept], first[kept], last[kept]
+
+        spaces = np.flatnonzero(chars == 32)
+        digits = np.flatnonzero(classes == DIGIT_CLASS)
+        long_sentence = (np.searchsorted(spaces, last) - np.searchsorted(spaces, first)
+                         >= LONG_SENTENCE_SPACES)
+        has_digit = np.searchsorted(digits, last) > np.searchsorted(digits, first)
+
+        # Keywords: bigram lookup for candidate starts, then the remaining characters
+        padded = np.concatenate((chars, np.zeros(self.max_len, dtype=np.uint8)))
+        bigrams = (padded[:n].astype(np.uint16) << 8) | padded[1:n + 1]
+        candidates = np.flatnonzero(self.bigram_first[bigrams])
+        candidate_bigrams = bigrams[candidates]
+        hit_keys = []
+        for index, (bigram, rest) in enumerate(self.codes):
+            positions = candidates[candidate_bigrams == bigram]
+            for offset, code in enumerate(rest, 2):
+                positions = positions[padded[positions + offset] == code]
+            if len(positions):
+                seg = np.searchsorted(run_starts, positions, side='right')
+                hit_keys.append(seg * len(self.codes) + index)
+        keyword_count = np.zeros(len(seg_doc), dtype=np.int64)
+        if hit_keys:
+            distinct = np.unique(np.concatenate(hit_keys)) // len(self.codes)
+            keyword_count += np.bincount(distinct, minlength=len(seg_doc))
+
+        # Doubled, so the half points stay integers
+        score = 2 * keyword_count[segs] + has_digit + long_sentence
+        doc = seg_doc[segs]
+
+        # Top max_sentences per document: one per-document maximum per round,
+        # O(max_sentences * n) rather than a sort. Sentences of a document are
+        # contiguous and in order, so key = score * m + (m - 1 - i) is unique
+        # and prefers the earliest sentence on equal scores
+        selected = self._top_sentences(np, score, doc, max_sentences)
+        included = self._with_duplicates(joined, doc, first, last, selected)
+
+        summaries = [''] * len(texts)
+        has_sentences = np.zeros(len(texts), dtype=bool)
+        has_sentences[doc] = True
+        for d in np.flatnonzero(~has_sentences).tolist():
+            summaries[d] = _fallback(texts[d])
+        current, sentences = -1, []
+        for d, a, b in zip(doc[included].tolist(), first[included].tolist(), last[included].tolist()):
+            if d != current:
+                if sentences:
+                    summaries[current] = ' '.join(sentences)
+                current, sentences = d, []
+            sentences.append(joined[a:b])
+        if sentences:
+            summaries[current] = ' '.join(sentences)
+        return summaries
+
+    @staticmethod
+    def _top_sentences(np, score, doc, max_sentences):
+        """Boolean mask of the max_sentences best sentences of every document."""
+        m = len(score)
+        selected = np.zeros(m, dtype=bool)
+        if not m:
+            return selected
+        starts = np.flatnonzero(np.concatenate(([True], doc[1:] != doc[:-1])))
+        key = score.astype(np.int64) * m + np.arange(m - 1, -1, -1)
+        for _ in range(max_sentences):
+            best = np.maximum.reduceat(key, starts)
+            best = best[best >= 0]
+            if not len(best):
+                break
+            winners = m - 1 - best % m
+            selected[winners] = True
+            key[winners] = -1
+        return selected
+
+    @staticmethod
+    def _with_duplicates(joined, doc, first, last, selected):
+        """The contains() loop keeps every sentence equal to a selected one."""
+        import numpy as np
+
+        key = doc.astype(np.int64) << 32 | (last - first)
+        maybe = np.flatnonzero(~selected & np.isin(key, key[selected]))
+        if not len(maybe):
+            return selected
+        chosen = {}
+        for i in np.flatnonzero(selected).tolist():
+            chosen.setdefault(int(doc[i]), set()).add(joined[first[i]:last[i]])
+        included = selected.copy()
+        for i in maybe.tolist():
+            if joined[first[i]:last[i]] in chosen[int(doc[i])]:
+                included[i] = True
+        return included
+
+
+def record_text(record):
+    """Text the app summarizes: '{subject} {snippet}'."""
+    return f"{record.get('subject') or ''} {record.get('snippet') or ''}"
+
+
+def iter_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_golden(records, path):
+    """Write records with their expected summaries."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            email = {k: record.get(k, '') for k in ('id', 'subject', 'snippet')}
+            max_sentences = record.get('maxSentences', DEFAULT_MAX_SENTENCES)
+            f.write(json.dumps({'email': email, 'maxSentences': max_sentences,
+                                'expected': reference_summarize(record_text(email), max_sentences)},
+                               ensure_ascii=False) + '\n')
+
+
+def check_golden(path):
+    """
+    Compare both engines against a golden file.
+    Returns a list of mismatch descriptions (empty when everything matches).
+    """
+    from email_corpus import read_jsonl
+
+    engine = BatchSummarizer()
+    mismatches = []
+    for line_no, case in enumerate(read_jsonl(path), 1):
+        text = record_text(case['email'])
+        for name, actual in (('reference', reference_summarize(text, case['maxSentences'])),
+                             ('batch', engine.summarize(text, case['maxSentences']))):
+            if actual != case['expected']:
+                mismatches.append(f"line {line_no} ({case['email'].get('id')}, {name}): "
+                                  f"expected {case['expected']!r}, got {actual!r}")
+    return mismatches
+
+
+def verify(texts, max_sentences, batch_size):
+    """
+    Compare the batch engine with the reference port on a list of texts.
+    Returns (mismatches, reference_s, batch_s); mismatches lists
+    (index, reference, batch) tuples.
+    """
+    start = time.perf_counter()
+    expected = [reference_summarize(text, max_sentences) for text in texts]
+    reference_s = time.perf_counter() - start
+
+    engine = BatchSummarizer()
+    start = time.perf_counter()
+    actual = []
+    for batch in iter_batches(texts, batch_size):
+        actual.extend(engine.summarize_batch(batch, max_sentences))
+    batch_s = time.perf_counter() - start
+
+    mismatches = [(i, e, a) for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+    return mismatches, reference_s, batch_s
+
+
+def main():
+    """Precompute summaries for a mailbox export, or check the golden file."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Batch extractive summaries matching the app summarizer')
+    parser.add_argument('--input', help='JSONL or .mbox export to summarize')
+    parser.add_argument('--output', help='Write JSONL results here (default: stdout)')
+    parser.add_argument('--max-sentences', type=int, default=DEFAULT_MAX_SENTENCES,
+                        help=f"Sentences per summary (default: {DEFAULT_MAX_SENTENCES})")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Documents per scan (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--verify', action='store_true',
+                        help='Check the batch engine against the reference port and time both')
+    parser.add_argument('--check-golden', help='Verify results against a golden JSONL file')
+    parser.add_argument('--write-golden', help='Write --input records with expected summaries')
+
+    args = parser.parse_args()
+
+    if args.check_golden:
+        mismatches = check_golden(args.check_golden)
+        for mismatch in mismatches:
+            print(f"✗ {mismatch}")
+        if mismatches:
+            return 1
+        print(f"✓ All cases in {args.check_golden} match")
+        return 0
+
+    if not args.input:
+        parser.error('--input is required unless --check-golden is given')
+    if not Path(args.input).exists():
+        print(f"✗ Input file not found: {args.input}", file=sys.stderr)
+        return 1
+
+    from rule_scorer import iter_records
+
+    if args.write_golden:
+        write_golden(iter_records(args.input), args.write_golden)
+        print(f"✓ Golden file written to {args.write_golden}", file=sys.stderr)
+        return 0
+
+    batch_size = max(args.batch_size, 1)
+    if args.verify:
+        texts = [record_text(r) for r in iter_records(args.input)]
+        mismatches, reference_s, batch_s = verify(texts, args.max_sentences, batch_size)
+        for index, expected, actual in mismatches[:10]:
+            print(f"✗ record {index}: reference {expected!r}, batch {actual!r}")
+        print(f"→ Reference: {len(texts) / max(reference_s, 1e-9):,.0f} docs/s, "
+              f"batch: {len(texts) / max(batch_s, 1e-9):,.0f} docs/s "
+              f"({reference_s / max(batch_s, 1e-9):.2f}x)")
+        if mismatches:
+            print(f"✗ {len(mismatches)} of {len(texts)} summaries differ")
+            return 1
+        print(f"✓ All {len(texts)} summaries match")
+        return 0
+
+    engine = BatchSummarizer()
+    # A fallback prefix can end in half a surrogate pair, as in Dart; write it as a JSON escape
+    out = (open(args.output, 'w', encoding='utf-8', errors='backslashreplace') if args.output
+           else sys.stdout)
+    start = time.perf_counter()
+    count = 0
+    try:
+        for batch in iter_batches(iter_records(args.input), batch_size):
+            summaries = engine.summarize_batch([record_text(r) for r in batch], args.max_sentences)
+            for record, summary in zip(batch, summaries):
+                out.write(json.dumps({'id': record.get('id'), 'summary': summary},
+                                     ensure_ascii=False) + '\n')
+            count += len(batch)
+    finally:
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"✓ Summarized {count} emails in {elapsed:.2f}s ({rate:,.0f} emails/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+// Checks PriorityClassifier's fallback rules against the golden cases shared
+// with the Python batch scorer (rule_scorer.py --check-golden), so the two
+// implementations cannot drift apart.
+
+import 'dart:convert';
+import 'dart:io';
+
+import 'package:flutter_test/flutter_test.dart';
+
+import 'package:mail_mind/core/email_metadata.dart';
+import 'package:mail_mind/core/priority_classifier.dart';
+
+void main() {
+  final lines = File('test/golden/priority_classifier.jsonl')
+      .readAsLinesSync()
+      .where((line) => line.trim().isNotEmpty);
+  final classifier = PriorityClassifier();
+
+  for (final line in lines) {
+    final golden = jsonDecode(line) as Map<String, dynamic>;
+    final email = golden['email'] as Map<String, dynamic>;
+    final expected = golden['expected'] as Map<String, dynamic>;
+
+    test('explainPrediction matches golden case ${email['id']}', () {
+      final actual = classifier.explainPrediction(EmailMetadata.fromJson(email));
+      expect(actual['score'], expected['score']);
+      expect(actual['label'], expected['label']);
+      expect(actual['reasons'], expected['reasons']);
+    });
+  }
+}
@@ -0,0 +1,30 @@
+// Checks Summarizer.summarize against the golden cases shared with the
+// Python batch summarizer (summarizer.py --check-golden), so the two
+// implementations cannot drift apart.
+
+import 'dart:convert';
+import 'dart:io';
+
+import 'package:flutter_test/flutter_test.dart';
+
+import 'package:mail_mind/core/summarizer.dart';
+
+void main() {
+  final lines = File('test/golden/summarizer.jsonl')
+      .readAsLinesSync()
+      .where((line) => line.trim().isNotEmpty);
+
+  for (final line in lines) {
+    final golden = jsonDecode(line) as Map<String, dynamic>;
+    final email = golden['email'] as Map<String, dynamic>;
+
+    test('summarize matches golden case ${email['id']}', () {
+      // Same text as EmailDetailModal
+      final summary = Summarizer.summarize(
+        '${email['subject']} ${email['snippet']}',
+        maxSentences: golden['maxSentences'] as int,
+      );
+      expect(summary, golden['expected']);
+    });
+  }
+}
@@ -6,14 +6,139 @@ Quick test to verify that the converted TFLite model works correctly.
 Tests model loading and inference without requiring the full Flutter app.
 
 Usage:
-    python3 test_tflite.py [--model <path>]
+    python3 test_tflite.py [--model <path>] [--runtime auto|ai_edge_litert|tflite_runtime|tensorflow]
+    python3 test_tflite.py --benchmark [--batch-sizes 1,8,32,128] [--threads 1,2,4]
+                           [--warmup 10] [--iterations 100] [--output <json>]
 
 Default model path: assets/models/priority_classifier.tflite
+
+Benchmark mode resizes the input tensor to each batch size, sweeps the
+interpreter thread count and reports latency percentiles, rows/sec and
+peak RSS as JSON.
+
+The interpreter comes from the lightest installed runtime (ai_edge_litert,
+tflite_runtime, then TensorFlow; see lite_runtime.py), whose import time and
+RSS are printed first. --runtime forces one.
+
+Sparse models (convert_model.py --target sparse) take token_ids + weights
+instead of a dense feature row; for them "batch size" is the number of
+tokens in one email.
 """
 
 import sys
+import json
+import time
 from pathlib import Path
 
+from convert_model import find_sparse_inputs
+from lite_runtime import RUNTIME_CHOICES, load_runtime, open_interpreter
+from stage_profiler import peak_rss_mb
+
+
+def parse_int_list(value):
+    """Parse a comma-separated list of positive integers."""
+    items = [int(v) for v in value.split(',') if v.strip()]
+    if not items or any(v <= 0 for v in items):
+        raise ValueError(f"Expected comma-separated positive integers, got {value!r}")
+    return items
+
+
+def sparse_vocab_size(model_path):
+    """Vocabulary size from the sidecar .vocab.json, or a safe minimum."""
+    vocab_path = model_path.with_suffix('.vocab.json')
+    if vocab_path.exists():
+        return len(json.loads(vocab_path.read_text())['vocabulary'])
+    return 4
+
+
+def feed_inputs(np, interpreter, model_path, batch_size):
+    """
+    Resize and fill the model inputs for one invocation.
+    Dense models get [batch_size, n_features] random rows; sparse models get
+    batch_size random token ids with unit counts.
+    Returns the dense input shape, or the token count for sparse models.
+    """
+    input_details = interpreter.get_input_details()
+    sparse = find_sparse_inputs(input_details)
+    if sparse:
+        ids_detail, weights_detail = sparse
+        n_terms = sparse_vocab_size(model_path)
+        token_ids = np.random.randint(0, n_terms, size=batch_size).astype(np.int32)
+        weights = np.ones(batch_size, dtype=np.float32)
+        interpreter.resize_tensor_input(ids_detail['index'], [batch_size])
+        interpreter.resize_tensor_input(weights_detail['index'], [batch_size])
+        interpreter.allocate_tensors()
+        interpreter.set_tensor(ids_detail['index'], token_ids)
+        interpreter.set_tensor(weights_detail['index'], weights)
+        return (batch_size,)
+
+    n_features = int(input_details[0]['shape'][1])
+    interpreter.resize_tensor_input(input_details[0]['index'], [batch_size, n_features])
+    interpreter.allocate_tensors()
+    batch = np.random.randn(batch_size, n_features).astype(np.float32)
+    interpreter.set_tensor(input_details[0]['index'], batch)
+    return batch.shape
+
+
+def benchmark(runtime, np, model_path, batch_sizes, threads, warmup, iterations):
+    """
+    Time interpreter.invoke() for every (num_threads, batch_size) pair.
+    Returns a JSON-serializable dict of results.
+    """
+    results = []
+    for num_threads in threads:
+        interpreter = runtime.interpreter(model_path, num_threads=num_threads)
+        output_details = interpreter.get_output_details()
+        # A sparse model scores one email per invoke; batch_size is its token count
+        sparse = find_sparse_inputs(interpreter.get_input_details()) is not None
+
+        for batch_size in batch_sizes:
+            feed_inputs(np, interpreter, model_path, batch_size)
+
+            for _ in range(warmup):
+                interpreter.invoke()
+
+            timings = np.empty(iterations, dtype=np.float64)
+            for i in range(iterations):
+                start = time.perf_counter()
+                interpreter.invoke()
+                timings[i] = time.perf_counter() - start
+            interpreter.get_tensor(output_details[0]['index'])
+
+            p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000.0
+            mean_s = float(timings.mean())
+            rows = 1 if sparse else batch_size
+            row = {
+                'input': 'sparse' if sparse else 'dense',
+                'num_threads': num_threads,
+                'batch_size': batch_size,
+                'p50_ms': round(float(p50), 4),
+                'p95_ms': round(float(p95), 4),
+                'p99_ms': round(float(p99), 4),
+                'rows_per_sec': round(rows / mean_s, 1) if mean_s > 0 else None,
+                'peak_rss_mb': peak_rss_mb(),
+            }
+            results.append(row)
+            print(f"  threads={num_threads:<3} batch={batch_size:<5} "
+                  f"p50={row['p50_ms']:.3f}ms p99={row['p99_ms']:.3f}ms "
+                  f"rows/s={row['rows_per_sec']}", file=sys.stderr)
+
+    best = max(results, key=lambda r: r['rows_per_sec'] or 0)
+    return {
+        'model': str(model_path),
+        'runtime': runtime.as_dict(),
+        'model_size_mb': model_path.stat().st_size / (1024 * 1024),
+        'warmup': warmup,
+        'iterations': iterations,
+        'results': results,
+        'best_throughput': {
+            'num_threads': best['num_threads'],
+            'batch_size': best['batch_size'],
+            'rows_per_sec': best['rows_per_sec'],
+        },
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
 
 def main():
     """Test TFLite model."""
@@ -25,10 +150,51 @@ def main():
         default='assets/models/priority_classifier.tflite',
         help='Path to TFLite model file',
     )
+    parser.add_argument(
+        '--runtime',
+        choices=RUNTIME_CHOICES,
+        help='Interpreter package (default: $MAIL_MIND_TFLITE_RUNTIME or auto, lightest installed)',
+    )
+    parser.add_argument(
+        '--benchmark',
+        action='store_true',
+        help='Run the batch-size / thread-count latency sweep and print JSON',
+    )
+    parser.add_argument(
+        '--batch-sizes',
+        type=parse_int_list,
+        default=[1, 8, 32, 128],
+        help='Comma-separated batch sizes to benchmark (default: 1,8,32,128)',
+    )
+    parser.add_argument(
+        '--threads',
+        type=parse_int_list,
+        default=[1, 2, 4],
+        help='Comma-separated num_threads values to benchmark (default: 1,2,4)',
+    )
+    parser.add_argument(
+        '--warmup',
+        type=int,
+        default=10,
+        help='Warmup invocations per configuration (default: 10)',
+    )
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=100,
+        help='Timed invocations per configuration (default: 100)',
+    )
+    parser.add_argument(
+        '--output',
+        help='Write benchmark JSON to this file instead of stdout',
+    )
     
     args = parser.parse_args()
     model_path = Path(args.model)
     
+    if args.benchmark:
+        return run_benchmark(args, model_path)
+    
     print(f"\n{'='*60}")
     print(f"  Mail Mind TFLite Model Test")
     print(f"{'='*60}\n")
@@ -42,12 +208,10 @@ def main():
     print(f"  Size: {model_path.stat().st_size / (1024*1024):.2f} MB\n")
     
     try:
-        import tensorflow as tf
-        import numpy as np
-        
         print("[1/3] Loading TFLite interpreter...")
-        interpreter = tf.lite.Interpreter(model_path=str(model_path))
-        interpreter.allocate_tensors()
+        runtime, interpreter = open_interpreter(model_path, args.runtime)
+        print(f"✓ Runtime {runtime.summary()}")
+        import numpy as np
         print("✓ Interpreter loaded\n")
         
         print("[2/3] Inspecting model...")
@@ -64,18 +228,15 @@ def main():
         print()
         
         print("[3/3] Running inference...")
-        input_shape = input_details[0]['shape']
-        n_features = input_shape[1]
-        
-        # Create test input
-        test_input = np.random.randn(1, n_features).astype(np.float32)
         
-        interpreter.set_tensor(input_details[0]['index'], test_input)
+        # Create test input (16 token ids for sparse models, one row otherwise)
+        sparse = find_sparse_inputs(input_details) is not None
+        input_shape = feed_inputs(np, interpreter, model_path, 16 if sparse else 1)
         interpreter.invoke()
         output = interpreter.get_tensor(output_details[0]['index'])
         
         print(f"✓ Inference successful")
-        print(f"  Input shape:  {test_input.shape}")
+        print(f"  Input shape:  {input_shape}{' (token ids)' if sparse else ''}")
         print(f"  Output shape: {output.shape}")
         print(f"  Output value: {output.flatten()[0]:.4f}")
         print()
@@ -85,14 +246,47 @@ def main():
         print("="*60 + "\n")
         return 0
         
-    except ImportError:
-        print("✗ TensorFlow not installed")
-        print("  Install with: pip install tensorflow\n")
+    except ImportError as e:
+        print(f"✗ {e}\n")
         return 1
     except Exception as e:
         print(f"✗ Error: {e}\n")
         return 1
 
 
+def run_benchmark(args, model_path):
+    """Benchmark mode entry point. Progress goes to stderr, JSON to stdout."""
+    if not model_path.exists():
+        print(f"✗ Model file not found: {model_path}", file=sys.stderr)
+        return 1
+    
+    try:
+        runtime = load_runtime(args.runtime)
+        import numpy as np
+    except ImportError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+    
+    print(f"✓ Runtime {runtime.summary()}", file=sys.stderr)
+    print(f"Benchmarking {model_path} ...", file=sys.stderr)
+    try:
+        report = benchmark(
+            runtime, np, model_path,
+            args.batch_sizes, args.threads,
+            args.warmup, max(args.iterations, 1),
+        )
+    except Exception as e:
+        print(f"✗ Benchmark failed: {e}", file=sys.stderr)
+        return 1
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+        print(f"✓ Benchmark written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Mail Mind TF-IDF Scoring Artifact
+
+Exports the pickled TfidfVectorizer → linear-classifier pipeline into one
+flat, memory-mappable binary file and scores emails from it with NumPy only.
+No scikit-learn or TensorFlow import is needed at scoring time.
+
+File layout (all arrays little-endian, 64-byte aligned):
+    magic  b'MMTFIDF1'
+    uint32 header length
+    JSON header (analyzer settings, classes, array offsets)
+    vocab       S<w>  [V]     sorted, fixed-width UTF-8 terms
+    idf         f32   [V]     idf weight per term (vocab order)
+    coef        f32   [V, C]  per-term weight for every class (vocab order)
+    intercept   f32   [C]
+    stop_words  S<w>  [S]     sorted stop-word list
+
+Usage:
+    python3 tfidf_artifact.py --artifact <file> "email text" ["email text" ...]
+
+Default artifact path: assets/models/priority_classifier.tfidf
+"""
+
+import sys
+import json
+import struct
+from pathlib import Path
+
+
+MAGIC = b'MMTFIDF1'
+ALIGN = 64
+DEFAULT_ARTIFACT = 'assets/models/priority_classifier.tfidf'
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _fixed_width(terms):
+    """Encode terms as a sorted fixed-width bytes array."""
+    import numpy as np
+
+    encoded = sorted(t.encode('utf-8') for t in terms)
+    width = max((len(t) for t in encoded), default=1) or 1
+    return np.array(encoded, dtype=f'S{width}'), width
+
+
+def extract_linear_head(estimator):
+    """
+    Reduce the final pipeline step to per-term weights and an intercept.
+    Returns (coef [C, V], intercept [C], link) where link is 'softmax' or
+    'logistic'.
+    """
+    import numpy as np
+
+    # MultinomialNB / ComplementNB: joint log-likelihood is linear in X
+    if hasattr(estimator, 'feature_log_prob_') and hasattr(estimator, 'class_log_prior_'):
+        return (
+            np.asarray(estimator.feature_log_prob_, dtype=np.float64),
+            np.asarray(estimator.class_log_prior_, dtype=np.float64),
+            'softmax',
+        )
+
+    # LogisticRegression / SGDClassifier / LinearSVC style heads
+    if hasattr(estimator, 'coef_') and hasattr(estimator, 'intercept_'):
+        coef = np.atleast_2d(np.asarray(estimator.coef_, dtype=np.float64))
+        intercept = np.atleast_1d(np.asarray(estimator.intercept_, dtype=np.float64))
+        link = 'logistic' if coef.shape[0] == 1 else 'softmax'
+        return coef, intercept, link
+
+    raise ValueError(
+        f"Unsupported final estimator {type(estimator).__name__} "
+        "(needs feature_log_prob_ or coef_/intercept_)"
+    )
+
+
+def split_pipeline(model):
+    """
+    Split a fitted pipeline into (vectorizer, estimator).
+    Raises ValueError if the model is not a TfidfVectorizer pipeline.
+    """
+    steps = getattr(model, 'steps', None)
+    if not steps or len(steps) != 2:
+        raise ValueError(f"Expected a 2-step Pipeline, got {type(model).__name__}")
+
+    vectorizer = steps[0][1]
+    estimator = steps[-1][1]
+    if not hasattr(vectorizer, 'vocabulary_') or not hasattr(vectorizer, 'idf_'):
+        raise ValueError(f"First step is not a fitted TfidfVectorizer ({type(vectorizer).__name__})")
+    if vectorizer.analyzer != 'word':
+        raise ValueError(f"Only analyzer='word' is supported (got {vectorizer.analyzer!r})")
+    if vectorizer.strip_accents is not None or vectorizer.preprocessor is not None \
+            or vectorizer.tokenizer is not None:
+        raise ValueError("Custom strip_accents/preprocessor/tokenizer cannot be exported")
+    return vectorizer, estimator
+
+
+def export_artifact(model, out_path):
+    """
+    Write the fitted pipeline to a memory-mappable scoring artifact.
+    Returns the number of bytes written.
+    """
+    import numpy as np
+
+    vectorizer, estimator = split_pipeline(model)
+    coef, intercept, link = extract_linear_head(estimator)
+
+    vocab_terms = list(vectorizer.vocabulary_.keys())
+    vocab, vocab_width = _fixed_width(vocab_terms)
+
+    # Reorder every per-term array into sorted-vocab order so that the
+    # searchsorted position of a term *is* its column.
+    order = np.array(
+        [vectorizer.vocabulary_[t.decode('utf-8')] for t in vocab], dtype=np.int64
+    )
+    idf = np.asarray(vectorizer.idf_, dtype=np.float32)[order]
+    coef_t = np.ascontiguousarray(coef.T[order], dtype=np.float32)
+    intercept = np.asarray(intercept, dtype=np.float32)
+
+    stop_words, stop_width = _fixed_width(vectorizer.get_stop_words() or ())
+
+    arrays = [
+        ('vocab', vocab),
+        ('idf', idf),
+        ('coef', coef_t),
+        ('intercept', intercept),
+        ('stop_words', stop_words),
+    ]
+
+    header = {
+        'version': 1,
+        'token_pattern': vectorizer.token_pattern,
+        'lowercase': bool(vectorizer.lowercase),
+        'ngram_range': list(vectorizer.ngram_range),
+        'sublinear_tf': bool(vectorizer.sublinear_tf),
+        'binary': bool(vectorizer.binary),
+        'use_idf': bool(vectorizer.use_idf),
+        'norm': vectorizer.norm,
+        'link': link,
+        'classes': [c.item() if hasattr(c, 'item') else c for c in estimator.classes_],
+        'n_terms': int(len(vocab)),
+        'vocab_width': vocab_width,
+        'stop_width': stop_width,
+        'arrays': {},
+    }
+
+    # Offsets depend on the header length, which depends on the offsets;
+    # reserve a fixed-size slot and pad the JSON into it.
+    body_start = _align(len(MAGIC) + 4 + 4096)
+    offset = body_start
+    for name, arr in arrays:
+        header['arrays'][name] = {
+            'offset': offset,
+            'dtype': arr.dtype.str,
+            'shape': list(arr.shape),
+        }
+        offset = _align(offset + arr.nbytes)
+
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+    if len(MAGIC) + 4 + len(header_bytes) > body_start:
+        raise ValueError("Artifact header too large")
+
+    with open(out_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in arrays:
+            f.seek(header['arrays'][name]['offset'])
+            f.write(arr.tobytes())
+        f.truncate(offset)
+
+    return offset
+
+
+class TfidfArtifactScorer:
+    """
+    Batched NumPy scorer over a memory-mapped TF-IDF artifact.
+
+    All model arrays are read-only views into the mapped file; nothing is
+    copied at load time, so cold start is one mmap plus a JSON parse.
+    """
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.path = str(path)
+        self._buf = np.memmap(self.path, dtype=np.uint8, mode='r')
+        if bytes(self._buf[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Not a Mail Mind TF-IDF artifact: {self.path}")
+
+        (header_len,) = struct.unpack('<I', bytes(self._buf[len(MAGIC):len(MAGIC) + 4]))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._buf[start:start + header_len]).decode('utf-8'))
+
+        for name, spec in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'])) if spec['shape'] else 0
+            arr = np.frombuffer(self._buf, dtype=dtype, count=count, offset=spec['offset'])
+            setattr(self, name, arr.reshape(spec['shape']))
+
+        self.classes = np.array(self.header['classes'])
+        self.n_terms = self.header['n_terms']
+        self._lowercase = self.header['lowercase']
+        self._min_n, self._max_n = self.header['ngram_range']
+        self._stop = frozenset(t.decode('utf-8') for t in self.stop_words.tolist())
+        self._fast = None
+
+    def transform(self, texts):
+        """
+        Vectorize a batch into sparse COO form.
+        Returns (rows, cols, values) with one entry per distinct (doc, term).
+        """
+        import numpy as np
+        from fast_analyzer import FastAnalyzer
+
+        if self._fast is None:
+            vocabulary = {t.decode('utf-8'): i for i, t in enumerate(self.vocab.tolist())}
+            self._fast = FastAnalyzer(vocabulary, self.header['token_pattern'], self._lowercase,
+                                      self._stop, (self._min_n, self._max_n))
+
+        # In-vocabulary n-grams straight from token ids (see fast_analyzer.py)
+        rows, cols = self._fast.analyze(list(texts))
+        if not rows.size:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float32)
+
+        # Collapse duplicates into term frequencies
+        key = rows * self.n_terms + cols
+        uniq_key, tf = np.unique(key, return_counts=True)
+        rows = uniq_key // self.n_terms
+        cols = uniq_key % self.n_terms
+        values = tf.astype(np.float32)
+
+        if self.header['binary']:
+            values = np.ones_like(values)
+        elif self.header['sublinear_tf']:
+            values = 1.0 + np.log(values)
+        if self.header['use_idf']:
+            values = values * self.idf[cols]
+
+        norm = self.header['norm']
+        if norm:
+            if norm == 'l2':
+                sums = np.bincount(rows, weights=values * values, minlength=len(texts))
+                scale = np.sqrt(sums)
+            else:
+                scale = np.bincount(rows, weights=np.abs(values), minlength=len(texts))
+            scale[scale == 0] = 1.0
+            values = values / scale[rows]
+
+        return rows, cols, values.astype(np.float32)
+
+    def decision_function(self, texts):
+        """Raw per-class scores [n_docs, n_classes] for a batch of texts."""
+        import numpy as np
+
+        rows, cols, values = self.transform(texts)
+        scores = np.zeros((len(texts), self.coef.shape[1]), dtype=np.float64)
+        np.add.at(scores, rows, self.coef[cols] * values[:, None])
+        scores += self.intercept
+        return scores
+
+    def predict_proba(self, texts, batch_size=1024):
+        """Class probabilities [n_docs, n_classes], scored batch by batch."""
+        import numpy as np
+
+        texts = list(texts)
+        out = []
+        for start in range(0, len(texts), batch_size):
+            scores = self.decision_function(texts[start:start + batch_size])
+            if self.header['link'] == 'logistic':
+                pos = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+                out.append(np.stack([1.0 - pos, pos], axis=1))
+            else:
+                scores -= scores.max(axis=1, keepdims=True)
+                np.exp(scores, out=scores)
+                scores /= scores.sum(axis=1, keepdims=True)
+                out.append(scores)
+        if not out:
+            return np.zeros((0, len(self.classes)))
+        return np.concatenate(out)
+
+    def predict(self, texts, batch_size=1024):
+        """Predicted class label for each text."""
+        return self.classes[self.predict_proba(texts, batch_size).argmax(axis=1)]
+
+
+def main():
+    """Score texts from the command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Score emails with a TF-IDF artifact')
+    parser.add_argument(
+        '--artifact',
+        default=DEFAULT_ARTIFACT,
+        help=f'Path to artifact file (default: {DEFAULT_ARTIFACT})',
+    )
+    parser.add_argument('texts', nargs='+', help='Email text(s) to score')
+
+    args = parser.parse_args()
+    if not Path(args.artifact).exists():
+        print(f"✗ Artifact not found: {args.artifact}")
+        return 1
+
+    scorer = TfidfArtifactScorer(args.artifact)
+    proba = scorer.predict_proba(args.texts)
+    for text, row in zip(args.texts, proba):
+        label = scorer.classes[row.argmax()]
+        print(f"{label}\t{' '.join(f'{p:.4f}' for p in row)}\t{text[:60]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Mail Mind TFLite Fuzzer
+
+Large-batch validation for dense TFLite models. The interpreter is resized
+to a large batch and fed generated inputs until a row count or a time budget
+runs out. Every batch is checked with vectorized NumPy:
+
+    zeros     all-zero rows (an empty email)
+    tfidf     sparse non-negative L2-normalized rows, like TfidfVectorizer output
+    one_hot   a single active feature per row, cycling through every feature
+    normal    standard normal noise
+    huge      normal noise scaled by 1e3 .. 1e12
+    tiny      normal noise scaled by 1e-30 (denormals)
+
+Every kind gets at least one batch, however small --rows is. Invariants
+(any violation fails the run):
+
+    coverage      every input kind above was scored
+    finite        no NaN or Inf in any output
+    range         probability outputs stay within [0, 1]
+    sum           multi-class probability rows sum to 1
+    responsive    outputs vary across tfidf / normal rows (not a constant model)
+    batch         rows scored one at a time match the same rows in a batch
+    monotonic     along each feature's ray t * e_i the winning class's
+                  probability never drops as t grows (checked when the caller
+                  says the model is linear in its inputs, e.g. a converted
+                  TF-IDF + Naive Bayes pipeline)
+
+Per-kind NaN / Inf counts, min / max and a 10-bin output histogram go into
+the report.
+
+Usage:
+    python3 tflite_fuzz.py [--model <path>] [--rows 200000] [--budget 30]
+                           [--monotonic] [--output report.json] [--runtime auto]
+
+    python3 convert_model.py --fuzz     (runs it inside validate_tflite)
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+
+from lite_runtime import RUNTIME_CHOICES, load_runtime
+
+
+KINDS = ['zeros', 'tfidf', 'one_hot', 'normal', 'huge', 'tiny']
+
+DEFAULT_ROWS = 200_000
+DEFAULT_BUDGET_S = 30.0
+BATCH_SIZE = 4096
+# Rows every kind gets even when --rows is smaller than a batch per kind
+MIN_KIND_ROWS = 256
+
+# Ray scales for the monotonicity check
+RAY_SCALES = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0]
+
+
+def generate(np, rng, kind, n, width, offset=0):
+    """n rows of one input kind, float32 [n, width]."""
+    if kind == 'zeros':
+        return np.zeros((n, width), dtype=np.float32)
+    if kind == 'one_hot':
+        rows = np.zeros((n, width), dtype=np.float32)
+        rows[np.arange(n), (offset + np.arange(n)) % width] = 1.0
+        return rows
+    if kind == 'tfidf':
+        active = min(width, 16)
+        rows = np.zeros((n, width), dtype=np.float32)
+        cols = rng.integers(0, width, size=(n, active))
+        np.put_along_axis(rows, cols, rng.random((n, active), dtype=np.float32), axis=1)
+        # Drop a random share of the picks so emails differ in length
+        rows *= rng.random((n, width), dtype=np.float32) < 0.5
+        norms = np.sqrt(np.einsum('ij,ij->i', rows, rows))
+        rows /= np.maximum(norms, 1e-12)[:, None]
+        return rows
+    rows = rng.standard_normal((n, width), dtype=np.float32)
+    if kind == 'huge':
+        rows *= (10.0 ** rng.uniform(3, 12, size=(n, 1))).astype(np.float32)
+    elif kind == 'tiny':
+        rows *= np.float32(1e-30)
+    return rows
+
+
+def is_quantized(np, interpreter):
+    """True when any tensor is stored as an integer type (quantized model)."""
+    return any(
+        d['dtype'] in (np.int8, np.uint8, np.int16) for d in interpreter.get_tensor_details()
+    )
+
+
+class _Runner:
+    """Dense interpreter resized once to a fixed batch."""
+
+    def __init__(self, runtime, np, model_path, batch_size):
+        from convert_model import find_sparse_inputs
+
+        self.np = np
+        self.interpreter = runtime.interpreter(model_path)
+        if find_sparse_inputs(self.interpreter.get_input_details()) is not None:
+            raise ValueError(f"{model_path} is a sparse model (token_ids, weights inputs); "
+                             f"fuzzing not supported")
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.width = int(self.input['shape'][-1])
+        self.batch_size = batch_size
+        self.interpreter.resize_tensor_input(self.input['index'], [batch_size, self.width])
+        self.interpreter.allocate_tensors()
+
+    def run(self, rows):
+        """Outputs float32 [n, k] for up to batch_size rows (padded internally)."""
+        np = self.np
+        n = len(rows)
+        if n < self.batch_size:
+            padded = np.zeros((self.batch_size, self.width), dtype=np.float32)
+            padded[:n] = rows
+            rows = padded
+        self.interpreter.set_tensor(self.input['index'], rows.astype(self.input['dtype'], copy=False))
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self.output['index'])
+        if out.dtype != np.float32:
+            scale, zero_point = self.output['quantization']
+            out = (out.astype(np.float32) - zero_point) * (scale or 1.0)
+        return out.reshape(self.batch_size, -1)[:n].copy()
+
+
+class _KindStats:
+    def __init__(self, np):
+        self.np = np
+        self.rows = 0
+        self.nan = 0
+        self.inf = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.histogram = np.zeros(10, dtype=np.int64)
+
+    def add(self, out, bins):
+        np = self.np
+        self.rows += len(out)
+        self.nan += int(np.isnan(out).sum())
+        self.inf += int(np.isinf(out).sum())
+        finite = out[np.isfinite(out)]
+        if finite.size:
+            self.min = min(self.min, float(finite.min()))
+            self.max = max(self.max, float(finite.max()))
+            self.histogram += np.histogram(np.clip(finite, bins[0], bins[-1]), bins=bins)[0]
+
+    def as_dict(self, bins):
+        return {
+            'rows': self.rows,
+            'nan': self.nan,
+            'inf': self.inf,
+            'min': None if self.rows == 0 or self.min == float('inf') else self.min,
+            'max': None if self.rows == 0 or self.max == float('-inf') else self.max,
+            'histogram': {
+                'edges': [round(float(e), 6) for e in bins],
+                'counts': self.histogram.tolist(),
+            },
+        }
+
+
+def fuzz_dense(runtime, np, model_path, rows=DEFAULT_ROWS, budget_s=DEFAULT_BUDGET_S,
+               monotonic=False, batch_size=BATCH_SIZE, seed=0):
+    """
+    Stream generated batches through a dense TFLite model and check invariants.
+    runtime is a lite_runtime.Runtime.
+    Returns a report dict; report['failures'] lists every broken invariant.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    runner = _Runner(runtime, np, model_path, batch_size)
+    width = runner.width
+    quantized = is_quantized(np, runner.interpreter)
+    tolerance = 2e-2 if quantized else 1e-5
+
+    # Probability outputs are recognised on realistic rows, then enforced everywhere
+    probe = runner.run(generate(np, rng, 'tfidf', batch_size, width))
+    n_outputs = probe.shape[1]
+    finite_probe = probe[np.isfinite(probe)]
+    probabilistic = bool(finite_probe.size) and bool(
+        finite_probe.min() >= -tolerance and finite_probe.max() <= 1 + tolerance
+    )
+    if probabilistic and n_outputs > 1:
+        probabilistic = bool(np.abs(probe.sum(axis=1) - 1).max() <= max(tolerance, 1e-4) * n_outputs)
+    bins = np.linspace(0.0, 1.0, 11) if probabilistic else np.linspace(
+        float(finite_probe.min()) if finite_probe.size else 0.0,
+        float(finite_probe.max()) if finite_probe.size else 1.0, 11,
+    )
+
+    stats = {kind: _KindStats(np) for kind in KINDS}
+    counts = {'range': 0, 'sum': 0}
+    spread = []
+
+    def check(kind, out):
+        stats[kind].add(out, bins)
+        if probabilistic:
+            finite = np.where(np.isfinite(out), out, 0.5)
+            counts['range'] += int(((finite < -tolerance) | (finite > 1 + tolerance)).sum())
+            if n_outputs > 1:
+                sums = np.abs(out.sum(axis=1) - 1)
+                counts['sum'] += int((np.isfinite(sums) & (sums > max(tolerance, 1e-4) * n_outputs)).sum())
+        if kind in ('tfidf', 'normal'):
+            finite = np.where(np.isfinite(out), out, np.nan)
+            if np.isfinite(finite).any(axis=0).all():
+                spread.append(float(np.nanstd(finite, axis=0).max()))
+
+    check('tfidf', probe)
+
+    def score(kind, n):
+        check(kind, runner.run(generate(np, rng, kind, n, width, offset=stats['one_hot'].rows)))
+        return n
+
+    # Every kind at least once, whatever --rows and the budget say: the rows
+    # left are split between the kinds not yet run (MIN_KIND_ROWS at least).
+    # Then round-robin until the row count or the budget runs out
+    total = len(probe)
+    first = [kind for kind in KINDS if not stats[kind].rows]
+    for i, kind in enumerate(first):
+        share = (rows - total) // (len(first) - i)
+        total += score(kind, min(batch_size, max(MIN_KIND_ROWS, share)))
+    batch_index = 0
+    while total < rows and time.perf_counter() - start <= budget_s:
+        kind = KINDS[batch_index % len(KINDS)]
+        total += score(kind, min(batch_size, rows - total))
+        batch_index += 1
+
+    checks = {}
+    skipped = [kind for kind, s in stats.items() if not s.rows]
+    checks['coverage'] = (not skipped, f"{len(KINDS) - len(skipped)} of {len(KINDS)} input kinds run"
+                          + (f" (no rows: {', '.join(skipped)})" if skipped else ''))
+    nan = sum(s.nan for s in stats.values())
+    inf = sum(s.inf for s in stats.values())
+    checks['finite'] = (nan == 0 and inf == 0, f"{nan} NaN, {inf} Inf")
+    if probabilistic:
+        checks['range'] = (counts['range'] == 0, f"{counts['range']} outputs outside [0, 1]")
+        if n_outputs > 1:
+            checks['sum'] = (counts['sum'] == 0, f"{counts['sum']} rows not summing to 1")
+    checks['responsive'] = (
+        max(spread, default=0.0) > 1e-6, f"max output std {max(spread, default=0.0):.2e}",
+    )
+
+    # Batch invariance: the same rows scored alone must match the batch
+    sample = generate(np, rng, 'tfidf', 64, width)
+    batched = runner.run(sample)
+    single = _Runner(runtime, np, model_path, 1)
+    alone = np.concatenate([single.run(row[None, :]) for row in sample])
+    batch_diff = float(np.nanmax(np.abs(batched - alone)))
+    checks['batch'] = (batch_diff <= tolerance, f"max diff {batch_diff:.2e} (tolerance {tolerance:g})")
+
+    if monotonic:
+        # Feature i at increasing scales: [width * len(RAY_SCALES), width]
+        features = np.repeat(np.arange(width), len(RAY_SCALES))
+        ray_rows = np.zeros((len(features), width), dtype=np.float32)
+        ray_rows[np.arange(len(features)), features] = np.tile(RAY_SCALES, width)
+        outs = np.concatenate([
+            runner.run(ray_rows[i:i + batch_size]) for i in range(0, len(ray_rows), batch_size)
+        ]).reshape(width, len(RAY_SCALES), n_outputs)
+        if n_outputs > 1:
+            winner = outs[:, -1, :].argmax(axis=1)
+            path = np.take_along_axis(outs, winner[:, None, None], axis=2)[:, :, 0]
+            broken = (np.diff(path, axis=1) < -tolerance).any(axis=1)
+        else:
+            steps = np.diff(outs[:, :, 0], axis=1)
+            broken = (steps < -tolerance).any(axis=1) & (steps > tolerance).any(axis=1)
+        checks['monotonic'] = (
+            not broken.any(), f"{int(broken.sum())} of {width} feature rays not monotonic",
+        )
+
+    total += len(sample) * 2
+    elapsed = time.perf_counter() - start
+    return {
+        'model': str(model_path),
+        'width': width,
+        'outputs': n_outputs,
+        'quantized': quantized,
+        'probabilistic': probabilistic,
+        'rows': total,
+        'elapsed_s': round(elapsed, 3),
+        'rows_per_sec': round(total / elapsed, 1) if elapsed > 0 else None,
+        'budget_s': budget_s,
+        'kinds': {kind: s.as_dict(bins) for kind, s in stats.items()},
+        'checks': {name: {'ok': bool(ok), 'detail': detail} for name, (ok, detail) in checks.items()},
+        'failures': [f"{name}: {detail}" for name, (ok, detail) in checks.items() if not ok],
+    }
+
+
+def print_report(report, out=sys.stdout, indent=''):
+    """Per-kind table and invariant results."""
+    lines = [
+        f"→ {report['rows']:,} rows in {report['elapsed_s']:.2f}s "
+        f"({report['rows_per_sec']:,.0f} rows/s), width {report['width']}, "
+        f"{'quantized' if report['quantized'] else 'float'}",
+        f"→ {'kind':<8} {'rows':>9} {'NaN':>6} {'Inf':>6} {'min':>10} {'max':>10}",
+    ]
+    for kind, s in report['kinds'].items():
+        low = '' if s['min'] is None else f"{s['min']:.4g}"
+        high = '' if s['max'] is None else f"{s['max']:.4g}"
+        lines.append(f"→ {kind:<8} {s['rows']:>9,} {s['nan']:>6} {s['inf']:>6} {low:>10} {high:>10}")
+    for name, check in report['checks'].items():
+        lines.append(f"{'✓' if check['ok'] else '✗'} {name}: {check['detail']}")
+    for line in lines:
+        print(indent + line, file=out)
+
+
+def main():
+    """Fuzz a dense TFLite model and exit non-zero on any broken invariant."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Large-batch fuzzing of a dense TFLite model')
+    parser.add_argument('--model', default='assets/models/priority_classifier.tflite',
+                        help='TFLite model (default: assets/models/priority_classifier.tflite)')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS,
+                        help=f'Generated rows to score (default: {DEFAULT_ROWS})')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_S,
+                        help=f'Stop streaming after this many seconds (default: {DEFAULT_BUDGET_S:g})')
+    parser.add_argument('--monotonic', action='store_true',
+                        help='Also require monotonic outputs along one-hot rays (linear models)')
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--runtime', choices=RUNTIME_CHOICES,
+                        help='Interpreter package (default: $MAIL_MIND_TFLITE_RUNTIME or auto)')
+
+    args = parser.parse_args()
+
+    if not Path(args.model).exists():
+        print(f"✗ Model not found: {args.model}", file=sys.stderr)
+        return 1
+
+    try:
+        runtime = load_runtime(args.runtime)
+    except ImportError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+    print(f"✓ Runtime {runtime.summary()}", file=sys.stderr)
+
+    import numpy as np
+
+    try:
+        report = fuzz_dense(runtime, np, args.model, rows=args.rows, budget_s=args.budget,
+                            monotonic=args.monotonic)
+    except ValueError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    return 1 if report['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Mail Mind Vocabulary Pruning
+
+Shrinks the pickled TfidfVectorizer → linear-classifier pipeline by keeping
+only the terms that move the decision. A term's importance is the spread of
+its weight across classes (max - min of feature_log_prob_ / coef_ column),
+or |coef| for a binary linear model: terms weighted equally for every class
+cannot change the prediction.
+
+Terms are kept either as the top K by importance (--top-k) or as the
+smallest set covering a fraction of the total importance (--fraction). The
+pipeline is rewritten with a reindexed vocabulary, idf vector and classifier
+weights, so it loads and predicts exactly like the original.
+
+--sweep K,... scores a corpus with the unpruned and each pruned pipeline and
+reports terms kept, pickle/artifact size, vectorization cost and agreement.
+
+Usage:
+    python3 vocab_pruning.py --top-k 200 --output priority_classifier.pruned.pkl
+    python3 vocab_pruning.py --corpus emails.jsonl --sweep 50,100,200,400 \\
+        [--report pruning_report.json]
+
+convert_model.py --prune-top-k / --prune-fraction runs the same stage before
+conversion.
+"""
+
+import io
+import sys
+import copy
+import json
+import time
+from pathlib import Path
+
+
+def term_importance(estimator):
+    """Per-term importance [V] from the classifier's weights."""
+    import numpy as np
+    from tfidf_artifact import extract_linear_head
+
+    coef, _, _ = extract_linear_head(estimator)
+    if coef.shape[0] == 1:
+        return np.abs(coef[0])
+    return coef.max(axis=0) - coef.min(axis=0)
+
+
+def select_terms(importance, top_k=None, fraction=None):
+    """
+    Column indices to keep, in original column order.
+    Exactly one of top_k / fraction must be given.
+    """
+    import numpy as np
+
+    if (top_k is None) == (fraction is None):
+        raise ValueError("Pass exactly one of top_k or fraction")
+
+    order = np.argsort(-importance, kind='stable')
+    if top_k is not None:
+        keep = order[:max(int(top_k), 1)]
+    else:
+        if not 0 < fraction <= 1:
+            raise ValueError(f"fraction must be in (0, 1], got {fraction}")
+        cumulative = np.cumsum(importance[order])
+        total = cumulative[-1] if len(cumulative) else 0.0
+        count = int(np.searchsorted(cumulative, fraction * total) + 1) if total > 0 else len(order)
+        keep = order[:min(count, len(order))]
+    return np.sort(keep)
+
+
+def prune_pipeline(model, keep):
+    """
+    Copy of the fitted pipeline restricted to the columns in `keep`.
+    The original model is not modified.
+    """
+    import numpy as np
+    from sklearn.base import clone
+    from tfidf_artifact import split_pipeline
+
+    vectorizer, estimator = split_pipeline(model)
+    n_terms = len(vectorizer.vocabulary_)
+    keep = np.asarray(keep)
+
+    by_column = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    kept_terms = [by_column[i] for i in keep]
+
+    # Fit on a fixed vocabulary to get a consistent fitted object, then
+    # install the original idf values for the kept terms.
+    pruned_vectorizer = clone(vectorizer).set_params(vocabulary=kept_terms)
+    pruned_vectorizer.fit(kept_terms)
+    if vectorizer.use_idf:
+        pruned_vectorizer.idf_ = np.asarray(vectorizer.idf_)[keep]
+    pruned_vectorizer.set_params(vocabulary=None)
+
+    pruned_estimator = copy.deepcopy(estimator)
+    for name, value in list(vars(pruned_estimator).items()):
+        if isinstance(value, np.ndarray) and value.ndim == 2 and value.shape[1] == n_terms:
+            setattr(pruned_estimator, name, value[:, keep])
+        elif isinstance(value, np.ndarray) and value.ndim == 1 and len(value) == n_terms \
+                and name != 'classes_':
+            setattr(pruned_estimator, name, value[keep])
+    if hasattr(pruned_estimator, 'n_features_in_'):
+        pruned_estimator.n_features_in_ = len(keep)
+
+    pruned = copy.copy(model)
+    pruned.steps = [
+        (model.steps[0][0], pruned_vectorizer),
+        (model.steps[-1][0], pruned_estimator),
+    ]
+    return pruned
+
+
+def prune(model, top_k=None, fraction=None):
+    """Prune a pipeline by top-K or cumulative-importance fraction."""
+    from tfidf_artifact import split_pipeline
+
+    _, estimator = split_pipeline(model)
+    keep = select_terms(term_importance(estimator), top_k=top_k, fraction=fraction)
+    return prune_pipeline(model, keep)
+
+
+def _pickle_size(model):
+    """Size in bytes of the model as joblib would write it."""
+    import joblib
+
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    return buf.tell()
+
+
+def _artifact_size(model):
+    """Size in bytes of the memory-mapped TF-IDF artifact for the model."""
+    import tempfile
+    from tfidf_artifact import export_artifact
+
+    with tempfile.TemporaryDirectory() as tmp:
+        return export_artifact(model, str(Path(tmp) / 'model.tfidf'))
+
+
+def evaluate(model, texts, labels, reference=None):
+    """
+    Size, vectorization cost and agreement of one pipeline on a corpus.
+    reference is the unpruned model's predict_proba output.
+    """
+    import numpy as np
+
+    vectorizer = model.steps[0][1]
+    start = time.perf_counter()
+    features = vectorizer.transform(texts)
+    vectorize_s = time.perf_counter() - start
+    proba = model.steps[-1][1].predict_proba(features)
+
+    row = {
+        'terms': len(vectorizer.vocabulary_),
+        'pickle_bytes': _pickle_size(model),
+        'artifact_bytes': _artifact_size(model),
+        'vectorize_us_per_doc': round(vectorize_s / max(len(texts), 1) * 1e6, 2),
+    }
+    if reference is not None:
+        row['agreement'] = round(float((proba.argmax(1) == reference.argmax(1)).mean()), 4)
+        row['max_abs_diff'] = round(float(np.abs(proba - reference).max()), 6)
+
+    labelled = [i for i, label in enumerate(labels) if label is not None]
+    if labelled:
+        classes = np.array([str(c) for c in model.classes_])
+        truth = np.array([str(labels[i]) for i in labelled])
+        row['accuracy'] = round(float((classes[proba[labelled].argmax(1)] == truth).mean()), 4)
+    return row, proba
+
+
+def sweep(model, texts, labels, top_ks):
+    """Evaluate the unpruned model and one pruned copy per K."""
+    baseline, reference = evaluate(model, texts, labels)
+    baseline.update(k='all', agreement=1.0, max_abs_diff=0.0)
+    rows = [baseline]
+    n_terms = baseline['terms']
+    for k in top_ks:
+        if k >= n_terms:
+            continue
+        row, _ = evaluate(prune(model, top_k=k), texts, labels, reference)
+        row['k'] = k
+        rows.append(row)
+    return rows
+
+
+def main():
+    """Prune a pickle or sweep K on a corpus."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Prune the TF-IDF vocabulary by classifier weight')
+    parser.add_argument(
+        '--input',
+        default='priority_classifier.pkl',
+        help='Path to pickle model (default: priority_classifier.pkl)',
+    )
+    parser.add_argument('--top-k', type=int, help='Keep the K most important terms')
+    parser.add_argument('--fraction', type=float, help='Keep terms covering this share of total importance')
+    parser.add_argument('--output', help='Where to write the pruned pickle')
+    parser.add_argument('--corpus', help='Email corpus (JSONL) for --sweep')
+    parser.add_argument('--sweep', help='Comma-separated K values to compare, e.g. 50,100,200')
+    parser.add_argument('--report', help='Write the sweep table as JSON')
+
+    args = parser.parse_args()
+
+    import warnings
+    import joblib
+
+    if not Path(args.input).exists():
+        print(f"✗ Input file not found: {args.input}")
+        return 1
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = joblib.load(args.input)
+
+    if args.sweep:
+        if not args.corpus:
+            print("✗ --sweep needs --corpus")
+            return 1
+        from email_corpus import load_texts
+
+        texts, labels = load_texts(args.corpus)
+        top_ks = sorted({int(k) for k in args.sweep.split(',') if k.strip()}, reverse=True)
+        rows = sweep(model, texts, labels, top_ks)
+
+        print(f"{'K':>6} {'terms':>6} {'pickle KB':>10} {'artifact KB':>12} "
+              f"{'µs/doc':>8} {'agree':>7} {'accuracy':>9}")
+        for row in rows:
+            accuracy = row.get('accuracy')
+            print(f"{row['k']:>6} {row['terms']:>6} {row['pickle_bytes'] / 1024:>10.1f} "
+                  f"{row['artifact_bytes'] / 1024:>12.1f} {row['vectorize_us_per_doc']:>8} "
+                  f"{row['agreement']:>7.4f} {'' if accuracy is None else accuracy:>9}")
+        if args.report:
+            Path(args.report).write_text(json.dumps({'corpus': args.corpus, 'rows': rows}, indent=2))
+            print(f"✓ Report written to {args.report}")
+
+    if args.top_k is not None or args.fraction is not None:
+        pruned = prune(model, top_k=args.top_k, fraction=args.fraction)
+        output = args.output or str(Path(args.input).with_suffix('.pruned.pkl'))
+        joblib.dump(pruned, output)
+        n_before = len(model.steps[0][1].vocabulary_)
+        n_after = len(pruned.steps[0][1].vocabulary_)
+        print(f"✓ Pruned {n_before} → {n_after} terms: {output}")
+    elif not args.sweep:
+        print("✗ Nothing to do: pass --top-k/--fraction and/or --sweep")
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())